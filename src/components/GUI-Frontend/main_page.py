@@ -4,8 +4,17 @@ TicketAssist - Main Application
 This is the main entry point for the TicketAssist application, providing
 authentication and core UI functionality.
 """
+from utils import import_profile
+
+# Time the imports below when TICKETASSIST_IMPORT_PROFILE is set
+import_profile.install_from_env()
+
 import streamlit as st
 from utils.auth import Authenticator, SessionManager
+from utils.summaries import start_summary_worker
+from utils.warmup import start_model_warmer
+
+import_profile.log_report()
 
 
 def configure_page() -> None:
@@ -54,6 +63,12 @@ def main() -> None:
     
     Handles authentication and displays the main page content when authenticated.
     """
+    # Load the chat models in the background while users log in
+    start_model_warmer()
+    
+    # Summarize tickets in the background during off-peak hours
+    start_summary_worker()
+    
     # Initialize authentication
     auth = Authenticator()
     session = SessionManager()
@@ -63,6 +78,10 @@ def main() -> None:
         configure_page()
         display_welcome_content()
         
+        if st.sidebar.button("Log out"):
+            auth.sign_out()
+            st.rerun()
+        
         # Future implementation:
         # if st.session_state.logged_in:
         #     pg = st.navigation(
@@ -4,15 +4,91 @@ TicketAssist Chatbot Page
 This module provides the chat interface for the TicketAssist application,
 allowing users to interact with a Language Model for ticket assistance.
 """
+from utils import import_profile
+
+# Time the imports below when TICKETASSIST_IMPORT_PROFILE is set
+import_profile.install_from_env()
+
 from typing import Dict, List, Any, Optional
+from contextlib import ExitStack
 import streamlit as st
-from streamlit_float import float_init
-import extra_streamlit_components as stx
 from streamlit_feedback import streamlit_feedback
 
 # Import custom utilities
-from utils.chat import ChatHistory, LlmService
-from utils.config import config
+from utils.async_stream import stream_stats
+from utils.auth import restore_session
+from utils.chat import ChatHistory, LlmService, coalesce_stream, get_history_queue
+from utils.config import config, DEFAULT_LLM_MODEL_OPTIONS, DEFAULT_LLM_MODEL_MAPPING
+from utils.context import ContextWindow
+from utils.feedback import FeedbackStore
+from utils.metrics import get_llm_metrics
+from utils.response_cache import get_response_cache
+from utils.retrieval import TicketRetriever
+from utils.scheduler import QueueFullError, get_scheduler
+from utils.ticket import get_ticket_store
+from utils.warmup import start_model_warmer
+
+import_profile.log_report()
+
+
+@st.cache_resource
+def get_context_window() -> ContextWindow:
+    """
+    Get the context window shared by all chat sessions.
+    
+    The token budget follows configuration changes.
+    
+    Returns:
+        The process-wide context window with its rolling summaries
+    """
+    summarizer = LlmService(model=config.get("LLM_SUMMARY_MODEL") or None)
+    
+    def summarize(messages: List[Dict[str, str]], previous: str) -> str:
+        # Rolling summaries queue behind chat turns for a backend slot
+        with get_scheduler().slot("background:context-summary", low_priority=True):
+            return summarizer.summarize(messages, previous, int(config.get("LLM_SUMMARY_TOKEN_BUDGET", 256)))
+            
+    window = ContextWindow(
+        summarizer=summarize,
+        token_budget=int(config.get("LLM_CONTEXT_TOKEN_BUDGET", 2048)),
+        low_water=float(config.get("LLM_CONTEXT_LOW_WATER", 0.6))
+    )
+    
+    def reconfigure(changed: Dict[str, Any]) -> None:
+        window.token_budget = int(config.get("LLM_CONTEXT_TOKEN_BUDGET", 2048))
+        window.low_water = float(config.get("LLM_CONTEXT_LOW_WATER", 0.6))
+        
+    config.subscribe(reconfigure, ("LLM_CONTEXT_TOKEN_BUDGET", "LLM_CONTEXT_LOW_WATER"))
+    return window
+
+
+@st.cache_resource
+def get_feedback_store() -> FeedbackStore:
+    """
+    Get the feedback store shared by all chat sessions.
+    
+    Returns:
+        The process-wide feedback store
+    """
+    return FeedbackStore(
+        flush_interval=float(config.get("CHAT_FLUSH_INTERVAL_SECONDS", 1.0)),
+        max_pending=int(config.get("CHAT_FLUSH_MAX_PENDING", 64))
+    )
+
+
+@st.cache_resource
+def get_ticket_retriever() -> TicketRetriever:
+    """
+    Get the ticket retriever shared by all chat sessions.
+    
+    Returns:
+        The process-wide BM25 retriever over the ticket store
+    """
+    return TicketRetriever(
+        get_ticket_store(),
+        top_k=int(config.get("RETRIEVAL_TOP_K", 3)),
+        token_budget=int(config.get("RETRIEVAL_TOKEN_BUDGET", 512))
+    )
 
 
 class ChatbotUI:
@@ -29,20 +105,48 @@ class ChatbotUI:
     def __init__(self) -> None:
         """Initialize the chatbot UI components and services."""
         self.configure_page()
-        self.chat_history = ChatHistory()
-        self.llm_service = LlmService()
+        start_model_warmer()
+        
+        # A reconnect straight to this page logs in from the session cookie
+        restore_session()
         
-        # Initialize float feature for UI enhancements
-        float_init()
+        # Per-session services survive reruns; the sidebar re-applies the
+        # user's settings to the LLM service on every run
+        username = st.session_state.get("username", "anonymous")
+        chat_history = st.session_state.get("chat_history")
+        if chat_history is None or chat_history.user_id != username:
+            if chat_history is not None:
+                # Another user logged in; start from their own latest conversation
+                for key in ("conversation_id", "messages", "visible_messages"):
+                    st.session_state.pop(key, None)
+            chat_history = ChatHistory(
+                user_id=username,
+                conversation_id=st.session_state.get("conversation_id")
+            )
+            st.session_state.chat_history = chat_history
+        if "llm_service" not in st.session_state:
+            st.session_state.llm_service = LlmService()
+        self.chat_history = chat_history
+        self.llm_service = st.session_state.llm_service
+        st.session_state.conversation_id = self.chat_history.conversation_id
         
-        # Setup cookie manager
-        self.cookie_manager = stx.CookieManager(key="cookie_manager")
+        # Process-wide resources shared by every session
+        self.context_window = get_context_window()
+        self.feedback_store = get_feedback_store()
+        self.scheduler = get_scheduler()
+        self.retriever = get_ticket_retriever()
         
         # Initialize or load chat history
         if "messages" not in st.session_state:
-            st.session_state.messages = self.chat_history.load()
+            st.session_state.messages = self.chat_history.load(
+                limit=int(config.get("CHAT_HISTORY_LOAD_LIMIT", 200))
+            )
             if not st.session_state.messages:
                 st.session_state.messages = [{"role": "assistant", "content": "How can I help you?"}]
+        
+        # Transcript paging state: older pages are display-only and never sent to the LLM
+        if "visible_messages" not in st.session_state:
+            self._reset_transcript_paging()
     
     def configure_page(self) -> None:
         """Configure the Streamlit page settings for the chatbot."""
@@ -82,13 +186,9 @@ class ChatbotUI:
             # Model selection
             st.subheader('Models and Parameters')
             
-            # Fetch model options and default model dynamically from config or fallback to defaults
-            model_options = config.get("LLM_MODEL_OPTIONS", ['Llama3-8B', 'Llama2-13B', 'Llama3.2-3B'])
-            model_mapping = config.get("LLM_MODEL_MAPPING", {
-                'Llama3-8B': 'llama3.1:8b',
-                'Llama2-13B': 'llama2.1:13b',
-                'Llama3.2-3B': 'llama3.2'
-            })
+            # Fetch model options and default model from config; they can change while the app runs
+            model_options = config.get("LLM_MODEL_OPTIONS", DEFAULT_LLM_MODEL_OPTIONS)
+            model_mapping = config.get("LLM_MODEL_MAPPING", DEFAULT_LLM_MODEL_MAPPING)
             default_model_key = config.get("LLM_DEFAULT_MODEL", 'Llama3-8B')
             
             # Ensure default model exists in options
@@ -104,13 +204,14 @@ class ChatbotUI:
             )
             
             # Map selected model to its corresponding identifier
-            model = model_mapping.get(selected_model, model_mapping[default_model_key])
+            model = model_mapping.get(selected_model) or model_mapping.get(default_model_key) or config.get("LLM_MODEL")
             self.llm_service.model = model
             
             # Model parameters - initialized from config but can be adjusted in UI
+            # 0.0 selects greedy decoding, whose answers are cached
             temperature = st.sidebar.slider(
                 'temperature', 
-                min_value=0.01, 
+                min_value=0.0, 
                 max_value=5.0, 
                 value=float(config.get("LLM_TEMPERATURE", 0.1)),
                 step=0.01
@@ -135,19 +236,56 @@ class ChatbotUI:
             )
             self.llm_service.max_tokens = max_length
             
+            # No seed by default so answers are sampled normally; a fixed seed makes them repeatable
             seed = st.number_input(
                 'Seed', 
                 min_value=0, 
                 max_value=10000, 
-                value=101, 
-                step=1
+                value=None, 
+                step=1,
+                placeholder='Random',
+                key='seed'
             )
+            self.llm_service.seed = seed
             
             st.markdown('📖 Learn more [here]()!')
             
             # Clear history button
             st.button('Clear Chat History', on_click=self.clear_chat_history)
             
+            if config.get("DEBUG_MODE", False):
+                with st.expander("Persistence metrics"):
+                    st.json({
+                        "chat_history": get_history_queue().metrics(),
+                        "feedback": self.feedback_store.metrics(),
+                    })
+                with st.expander("Response cache"):
+                    st.json(get_response_cache().metrics())
+                with st.expander("Ollama health"):
+                    st.json(self.llm_service.router.status())
+                with st.expander("LLM streams"):
+                    st.json(stream_stats())
+                with st.expander("Request scheduler"):
+                    st.json(self.scheduler.metrics())
+                with st.expander("Ticket retrieval"):
+                    st.json(st.session_state.get("retrieval_stats", {}))
+                with st.expander("Prompt prefill"):
+                    st.json(st.session_state.get("prefill_stats", {}))
+                with st.expander("Context window"):
+                    st.json({
+                        "last_turn": st.session_state.get("context_stats", {}),
+                        "all_sessions": get_llm_metrics().context_summary(),
+                    })
+                with st.expander("LLM performance"):
+                    st.dataframe(get_llm_metrics().summary(), hide_index=True)
+                with st.expander("Latency SLO"):
+                    st.dataframe(self.llm_service.slo.status(), hide_index=True)
+                if import_profile.report():
+                    with st.expander("Import times"):
+                        st.dataframe(import_profile.report(), hide_index=True)
+                with st.expander("Feedback by model"):
+                    st.dataframe(self.feedback_store.feedback_rate("model"), hide_index=True)
+            
             return {
                 "api_token": replicate_api,
                 "model": model,
@@ -160,12 +298,56 @@ class ChatbotUI:
     def clear_chat_history(self) -> None:
         """Clear the chat history and reset the conversation."""
         st.session_state.messages = self.chat_history.clear()
+        self._reset_transcript_paging()
+    
+    def _reset_transcript_paging(self) -> None:
+        """Show only the most recent page of the transcript."""
+        st.session_state.visible_messages = int(config.get("CHAT_RENDER_PAGE_SIZE", 20))
+        st.session_state.earlier_messages = []
+        st.session_state.history_exhausted = False
+    
+    def load_earlier_messages(self) -> None:
+        """Reveal the previous page of the transcript, reading it from the store if needed."""
+        page_size = int(config.get("CHAT_RENDER_PAGE_SIZE", 20))
+        st.session_state.visible_messages += page_size
+        
+        transcript = st.session_state.earlier_messages + st.session_state.messages
+        missing = st.session_state.visible_messages - len(transcript)
+        oldest_id = transcript[0].get("id") if transcript else None
+        if missing > 0 and oldest_id is not None and not st.session_state.history_exhausted:
+            earlier = self.chat_history.load_before(oldest_id, missing)
+            st.session_state.earlier_messages = earlier + st.session_state.earlier_messages
+            st.session_state.history_exhausted = len(earlier) < missing
     
     def display_chat_messages(self) -> None:
-        """Display the chat message history in the UI."""
-        for message in st.session_state.messages:
+        """Display the most recent page of the chat history in the UI."""
+        transcript = st.session_state.earlier_messages + st.session_state.messages
+        visible = st.session_state.visible_messages
+        
+        has_hidden = len(transcript) > visible
+        may_have_stored = bool(transcript) and "id" in transcript[0] and not st.session_state.history_exhausted
+        if has_hidden or may_have_stored:
+            st.button("Load earlier messages", icon=":material/history:", on_click=self.load_earlier_messages)
+        
+        for message in transcript[-visible:]:
             avatar = self.USER_AVATAR if message["role"] == "user" else self.BOT_AVATAR
-            st.chat_message(message["role"], avatar=avatar).write(message["content"])
+            container = st.chat_message(message["role"], avatar=avatar)
+            container.write(message["content"])
+            if message.get("answered_by"):
+                container.caption(self.fallback_note(message["answered_by"]))
+    
+    @staticmethod
+    def fallback_note(model: str) -> str:
+        """
+        Get the note shown under an answer from the fallback model.
+        
+        Args:
+            model: Model that answered
+            
+        Returns:
+            Caption text for the answer
+        """
+        return f"⚡ Answered by {model} because the selected model is busy right now."
     
     def handle_user_input(self, api_token: str) -> None:
         """
@@ -176,41 +358,122 @@ class ChatbotUI:
         """
         if prompt := st.chat_input("Ask anything", max_chars=150, disabled=not api_token):
             # Add user message to history
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            user_message = {"role": "user", "content": prompt}
+            st.session_state.messages.append(user_message)
             st.chat_message("user", avatar=self.USER_AVATAR).write(prompt)
             
-            # Generate assistant response
-            with st.spinner("Thinking..."):
-                st.session_state["full_message"] = ""
+            # Ground the answer in the most relevant tickets; the context stays
+            # on this message so later turns re-send the same prompt prefix
+            if config.get("RETRIEVAL_ENABLED", True):
+                ticket_context, retrieval_stats = self.retriever.build_context(prompt)
+                if ticket_context:
+                    user_message["ticket_context"] = ticket_context
+                st.session_state["retrieval_stats"] = retrieval_stats
                 
-                # Stream the response
-                st.chat_message("assistant", avatar=self.BOT_AVATAR).write_stream(
-                    self.llm_service.generate_response(st.session_state.messages)
-                )
-                
-                # Add complete response to history
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": st.session_state["full_message"]
-                })
+            # Keep the prompt within the token budget
+            prompt_messages, context_stats = self.context_window.build(
+                st.session_state.conversation_id, st.session_state.messages
+            )
+            st.session_state["context_stats"] = context_stats
+            get_llm_metrics().record_context(context_stats)
             
-            # Save chat history
-            self.chat_history.save(st.session_state.messages)
+            # Replay a cached answer right away; otherwise wait for a generation slot on the shared backend
+            queue_status = st.empty()
+            try:
+                with ExitStack() as stack:
+                    stream = self.llm_service.cached_response(prompt_messages)
+                    if stream is None:
+                        slot = stack.enter_context(self.scheduler.slot(
+                            self.chat_history.user_id,
+                            on_wait=lambda position: queue_status.info(
+                                f"The assistant is busy. You are #{position} in the queue.", icon="⏳"
+                            )
+                        ))
+                        queue_status.empty()
+                        stream = self.llm_service.generate_response(
+                            prompt_messages,
+                            st.session_state.conversation_id,
+                            queue_wait=slot.wait_seconds
+                        )
+                        
+                    # Generate assistant response
+                    with st.spinner("Thinking..."):
+                        st.session_state["full_message"] = []
+                        
+                        # Stream the response in coalesced chunks to cut websocket deltas
+                        assistant = st.chat_message("assistant", avatar=self.BOT_AVATAR)
+                        assistant.write_stream(
+                            coalesce_stream(
+                                stream,
+                                interval=float(config.get("CHAT_STREAM_FLUSH_INTERVAL_SECONDS", 0.05)),
+                                max_chars=int(config.get("CHAT_STREAM_FLUSH_CHARS", 64))
+                            )
+                        )
+                        
+                        # Add complete response to history, noting a downgrade to the fallback model
+                        answer = {
+                            "role": "assistant", 
+                            "content": "".join(st.session_state["full_message"])
+                        }
+                        if self.llm_service.last_model != self.llm_service.model:
+                            answer["answered_by"] = self.llm_service.last_model
+                            assistant.caption(self.fallback_note(self.llm_service.last_model))
+                        st.session_state.messages.append(answer)
+                        
+                        # Remember how the answer was generated for feedback
+                        st.session_state["last_generation"] = {
+                            "model": self.llm_service.last_model,
+                            "temperature": self.llm_service.temperature,
+                            "top_p": self.llm_service.top_p,
+                            "max_length": self.llm_service.max_tokens,
+                            "seed": st.session_state.get("seed"),
+                        }
+                        st.session_state["prefill_stats"] = self.llm_service.last_prefill
+            except QueueFullError:
+                queue_status.empty()
+                st.session_state.messages.pop()
+                st.warning("The assistant is at capacity right now. Please try again in a moment.", icon="🚦")
+                return
+                
+            # Save chat history in the background
+            self.chat_history.save_async(st.session_state.messages)
     
+    @st.fragment
     def display_feedback_widget(self) -> None:
-        """Display the feedback widget for the last assistant message."""
+        """
+        Display the feedback widget for the last assistant message.
+        
+        Runs as a fragment so a feedback click reruns only the widget
+        instead of re-rendering the whole transcript. The widget returns
+        its last value on every rerun, so each answer's feedback is only
+        recorded the first time.
+        """
         if st.session_state.messages and len(st.session_state.messages) > 1:
+            key = f"feedback_{self.chat_history.conversation_id}_{len(st.session_state.messages)}"
             feedback = streamlit_feedback(
                 feedback_type="faces",
                 optional_text_label="[Optional] Please provide an explanation",
-                key=f"feedback_{len(st.session_state.messages)}",
+                key=key,
             )
             
-            if feedback:
-                st.toast("Feedback recorded!", icon="📝")
-                # Log the feedback
-                feedback_type = "positive" if feedback.get("score", 0) > 0 else "negative"
-                self.chat_history.log_feedback(feedback_type)
+            recorded_keys = st.session_state.setdefault("recorded_feedback", set())
+            if feedback and key not in recorded_keys:
+                rated = st.session_state.messages[-2:]
+                if any("id" not in message for message in rated):
+                    # The answer may still be waiting in the write-behind queue
+                    get_history_queue().flush()
+                
+                recorded = self.feedback_store.record(
+                    user_id=self.chat_history.user_id,
+                    conversation_id=self.chat_history.conversation_id,
+                    message_ids=[message.get("id") for message in rated],
+                    score=feedback.get("score"),
+                    text=feedback.get("text"),
+                    params=st.session_state.get("last_generation", {"model": self.llm_service.model})
+                )
+                if recorded:
+                    recorded_keys.add(key)
+                    st.toast("Thanks for your feedback!", icon="👌")
     
     def run(self) -> None:
         """
@@ -3,20 +3,28 @@ TicketAssist - 5G Ticket Management Page
 
 This module provides a UI for viewing, filtering, and analyzing 5G-related tickets.
 """
+from utils import import_profile
+
+# Time the imports below when TICKETASSIST_IMPORT_PROFILE is set
+import_profile.install_from_env()
+
 from typing import Dict, List, Any, Optional, Tuple, Set
+import html
 import random
 import uuid
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import streamlit as st
-import pandas as pd
 from unidecode import unidecode
 
 # Import custom modules
-from utils.ticket import TicketGenerator, TicketDisplay, TicketExporter
+from utils.summaries import get_summary_store
+from utils.ticket import TicketDisplay, TicketExporter, get_ticket_store
 from utils.styles import load_ticket_css, load_card_interactions_js, dark_mode_toggle
 
+import_profile.log_report()
+
 
 class TicketPageUI:
     """
@@ -48,22 +56,33 @@ class TicketPageUI:
             st.session_state.selectbox_priority_key = 20
             st.session_state.selectbox_status_key = 30
     
-    def setup_sidebar(self, tickets_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def setup_ticket_count(self, max_count: int) -> int:
         """
-        Setup the sidebar with filtering and export options.
+        Setup the data options section with the ticket count slider.
         
         Args:
-            tickets_list: List of ticket dictionaries to filter
+            max_count: Number of tickets available in the dataset
             
         Returns:
-            Dictionary containing filter settings
+            Number of tickets to display
         """
         # Data options section
         st.sidebar.markdown("## Data Options")
         
         # Number of tickets to display
-        ticket_count = st.sidebar.slider("Number of tickets to display", 5, 50, 20, 5)
+        max_count = max(max_count, 5)
+        return st.sidebar.slider("Number of tickets to display", 5, max_count, min(20, max_count), 5)
+    
+    def setup_sidebar(self, tickets_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Setup the sidebar with filtering and export options.
         
+        Args:
+            tickets_list: List of ticket dictionaries to filter
+            
+        Returns:
+            Dictionary containing filter settings
+        """
         # Export data option
         export_format = st.sidebar.selectbox("Export Format", ["CSV", "JSON", "Excel"])
         if st.sidebar.button("Export Data"):
@@ -121,7 +140,6 @@ class TicketPageUI:
         dark_mode_status = dark_mode_toggle()
         
         return {
-            'ticket_count': ticket_count,
             'selected_projects': selected_projects,
             'selected_priorities': selected_priorities,
             'selected_statuses': selected_statuses,
@@ -241,7 +259,7 @@ class TicketPageUI:
                 if date_option != "All Dates":
                     date_range = st.date_input(
                         "Select date range",
-                        value=(datetime.now() - pd.Timedelta(days=30), datetime.now()),
+                        value=(datetime.now() - timedelta(days=30), datetime.now()),
                         key="date_filter"
                     )
                 else:
@@ -264,14 +282,17 @@ class TicketPageUI:
                 "categories": selected_categories
             }
     
-    def render_ticket_cards(self, tickets_list: List[Dict[str, Any]], view_details: bool) -> None:
+    def render_ticket_cards(self, tickets_list: List[Dict[str, Any]], view_details: bool,
+                            summaries: Optional[Dict[str, str]] = None) -> None:
         """
         Render the ticket cards with details.
         
         Args:
             tickets_list: List of filtered ticket dictionaries to display
             view_details: Whether to show detailed view or compact view
+            summaries: Precomputed LLM summaries by ticket key
         """
+        summaries = summaries or {}
         # Determine CSS classes based on details toggle
         if view_details:
             details_class = ""
@@ -317,6 +338,14 @@ class TicketPageUI:
                 "Minor": '#0288d1'
             }.get(ticket["priority_name"], '#0288d1')
             
+            # Summary from the offline summary job, if it has reached this ticket yet
+            summary_html = ""
+            if ticket["key"] in summaries:
+                summary_html = (
+                    '<div class="meta"><i class="align left icon"></i> <b>Summary:</b> '
+                    f'{html.escape(summaries[ticket["key"]])}</div>'
+                )
+            
             # Create the card HTML with enhanced UI features
             ticket_scorecard += f"""
                 <div class="{card_class}" id="{ticket_id}" data-url="{ticket['url']}">            
@@ -344,6 +373,7 @@ class TicketPageUI:
                     </div>
                 </div>
                 <div class="extra content">
+                    {summary_html}
                     <div class="meta"><i class="tag icon"></i> <b>Category:</b> {ticket["Answer"]["answer_category"]}</div>
                     <div class="meta"><i class="code branch icon"></i> <b>Build:</b> {ticket["Answer"]["included_build"]}</div>
                     <div class="meta"><i class="calendar alternate outline icon"></i> <b>Created:</b> {created_date}</div>
@@ -497,22 +527,14 @@ def main() -> None:
     # Initialize UI
     ui = TicketPageUI()
     
-    # Generate or load ticket data
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def get_tickets(count: int = 20) -> List[Dict[str, Any]]:
-        tickets_dict = TicketGenerator.generate_fake_5g_tickets(count)
-        return [ticket for _, ticket in tickets_dict.items()]
-
-    # Start with default ticket count
-    tickets_list = get_tickets(20)
+    # Slice the displayed tickets out of the shared dataset
+    ticket_store = get_ticket_store()
+    ticket_count = ui.setup_ticket_count(len(ticket_store))
+    tickets_list = ticket_store.slice(ticket_count)
     
     # Setup sidebar and get filter settings
     filters = ui.setup_sidebar(tickets_list)
     
-    # Update tickets if count changed
-    if filters['ticket_count'] != len(tickets_list):
-        tickets_list = get_tickets(filters['ticket_count'])
-    
     # Setup search bar
     text_search = ui.setup_search_bar()
     
@@ -544,8 +566,9 @@ def main() -> None:
     # Calculate statistics
     stats = TicketManager.calculate_statistics(sorted_tickets)
     
-    # Display tickets
-    ui.render_ticket_cards(sorted_tickets, filters['view_details'])
+    # Display tickets with their precomputed summaries
+    summaries = get_summary_store().get_many(sorted_tickets)
+    ui.render_ticket_cards(sorted_tickets, filters['view_details'], summaries)
 
 
 if __name__ == "__main__":
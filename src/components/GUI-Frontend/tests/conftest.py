@@ -0,0 +1,12 @@
+"""
+Shared test setup for the TicketAssist application.
+
+Makes the application packages importable when pytest is run from the
+repository root or from this directory.
+"""
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1]
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
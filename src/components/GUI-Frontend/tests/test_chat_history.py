@@ -0,0 +1,118 @@
+"""
+Stress tests for the chat history store.
+
+Several processes append to one SQLite database at once, the way
+Streamlit worker processes do, and the stored history is checked for
+lost or interleaved messages.
+"""
+import logging
+import multiprocessing
+import sqlite3
+from contextlib import closing
+from typing import List
+
+import pytest
+
+from utils.chat import ChatHistory
+from utils.persistence import WriteBehindQueue
+
+WRITERS = 6
+TURNS = 40
+
+
+def _write_turns(data_path: str, legacy_path: str, writer: int, turns: int) -> None:
+    """Append question/answer pairs one turn at a time; exit non-zero on any logged error."""
+    errors: List[str] = []
+    
+    class Collect(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            errors.append(record.getMessage())
+            
+    logging.getLogger().addHandler(Collect(level=logging.ERROR))
+    history = ChatHistory(user_id="stress", conversation_id="shared",
+                          data_path=data_path, legacy_path=legacy_path)
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"{writer}:{turn}:q"})
+        messages.append({"role": "assistant", "content": f"{writer}:{turn}:a"})
+        history.save(messages)
+    if errors:
+        raise SystemExit("\n".join(errors))
+
+
+def test_concurrent_writers_lose_and_interleave_nothing(tmp_path):
+    data_path = str(tmp_path / "chat_history.sqlite3")
+    legacy_path = str(tmp_path / "missing_legacy")
+    context = multiprocessing.get_context("spawn")
+    writers = [
+        context.Process(target=_write_turns, args=(data_path, legacy_path, writer, TURNS))
+        for writer in range(WRITERS)
+    ]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(120)
+        
+    # A non-zero exit means a save logged an error such as "database is locked"
+    assert [process.exitcode for process in writers] == [0] * WRITERS
+    
+    with closing(sqlite3.connect(data_path)) as conn:
+        rows = conn.execute(
+            "SELECT id, role, content FROM messages WHERE user_id = 'stress' ORDER BY id"
+        ).fetchall()
+    assert len(rows) == WRITERS * TURNS * 2
+    assert len({content for _, _, content in rows}) == len(rows)
+    
+    for index in range(0, len(rows), 2):
+        # Each turn is saved in one transaction, so its question and answer are adjacent
+        (question_id, question_role, question), (answer_id, answer_role, answer) = rows[index:index + 2]
+        assert (question_role, answer_role) == ("user", "assistant")
+        assert answer_id == question_id + 1
+        assert question.rsplit(":", 1)[0] == answer.rsplit(":", 1)[0]
+        
+    for writer in range(WRITERS):
+        turns = [int(content.split(":")[1]) for _, role, content in rows
+                 if role == "user" and content.startswith(f"{writer}:")]
+        assert turns == list(range(TURNS))
+
+
+def test_history_reloads_in_order(tmp_path):
+    history = ChatHistory(user_id="alice", conversation_id="c1",
+                          data_path=str(tmp_path / "chat_history.sqlite3"),
+                          legacy_path=str(tmp_path / "missing_legacy"))
+    messages = [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi"}]
+    history.save(messages)
+    history.save(messages)
+    
+    assert [message["content"] for message in history.load()] == ["hello", "hi"]
+    assert all("id" in message for message in messages)
+
+
+def test_failed_write_is_requeued_and_retried(tmp_path, monkeypatch):
+    history = ChatHistory(user_id="alice", conversation_id="c1",
+                          data_path=str(tmp_path / "chat_history.sqlite3"),
+                          legacy_path=str(tmp_path / "missing_legacy"))
+    connect = ChatHistory._connect
+    
+    def locked(self):
+        conn = connect(self)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+        
+    queue = WriteBehindQueue("test_history", ChatHistory.save_batch, flush_interval=3600)
+    messages = [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi"}]
+    monkeypatch.setattr(ChatHistory, "_connect", locked)
+    with pytest.raises(sqlite3.Error):
+        history.save(messages)
+    assert not any("id" in message for message in messages)
+    
+    queue.submit("c1", (history, messages))
+    queue.flush()
+    assert queue.metrics()["errors"] == 1
+    assert queue.metrics()["queue_depth"] == 1
+    
+    monkeypatch.setattr(ChatHistory, "_connect", connect)
+    queue.flush()
+    queue.close()
+    assert queue.metrics()["queue_depth"] == 0
+    assert [message["content"] for message in history.load()] == ["hello", "hi"]
@@ -0,0 +1,26 @@
+"""
+Tests for the context window's per-conversation state and its metrics.
+"""
+from utils.context import ContextWindow
+from utils.metrics import LlmMetrics
+
+
+def test_per_conversation_state_is_bounded():
+    window = ContextWindow(lambda messages, previous: "summary", token_budget=50, max_conversations=3)
+    messages = [{"role": "user", "content": "x" * 100} for _ in range(5)]
+    for i in range(10):
+        window.build(f"c{i}", messages)
+    window._executor.shutdown(wait=True)
+    
+    assert list(window._cuts) == ["c7", "c8", "c9"]
+    assert list(window._summaries) == ["c7", "c8", "c9"]
+
+
+def test_saved_tokens_are_exported():
+    window = ContextWindow(lambda messages, previous: "summary", token_budget=50)
+    _, stats = window.build("c1", [{"role": "user", "content": "x" * 100} for _ in range(5)])
+    metrics = LlmMetrics()
+    metrics.record_context(stats)
+    
+    assert metrics.context_summary()["saved_tokens"] == stats["saved_tokens"] > 0
+    assert f"ticketassist_llm_context_saved_tokens_total {stats['saved_tokens']}" in metrics.prometheus_text()
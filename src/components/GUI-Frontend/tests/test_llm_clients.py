@@ -0,0 +1,23 @@
+"""
+Tests for retiring pooled Ollama clients when their settings change.
+"""
+import time
+
+from utils import llm_clients
+
+
+def test_reconfigured_clients_are_closed_after_the_grace_period(monkeypatch):
+    monkeypatch.setattr(llm_clients, "_retire_grace", lambda: 0.1)
+    host = "http://127.0.0.1:9"
+    client = llm_clients.get_ollama_client(host)
+    async_client = llm_clients.get_async_ollama_client(host)
+    llm_clients.get_http_session(host)
+    
+    llm_clients._reset_clients({"OLLAMA_POOL_SIZE": 4})
+    assert llm_clients.get_ollama_client(host) is not client
+    # Still usable by requests that were running during the change
+    assert not client._client.is_closed
+    
+    time.sleep(0.5)
+    assert client._client.is_closed
+    assert async_client._client.is_closed
@@ -0,0 +1,38 @@
+"""
+Tests for the write-behind queue's behavior when its storage keeps failing.
+"""
+import time
+from typing import Any, Hashable, List, Tuple
+
+from utils.persistence import WriteBehindQueue
+
+
+def test_failing_flushes_back_off_instead_of_spinning():
+    attempts: List[float] = []
+    
+    def failing(items: List[Tuple[Hashable, Any]]) -> None:
+        attempts.append(time.monotonic())
+        raise OSError("disk full")
+        
+    queue = WriteBehindQueue("test_backoff", failing, flush_interval=0.05, max_pending=1,
+                             max_retry_interval=0.2)
+    for i in range(5):
+        queue.submit(i, "payload")
+    time.sleep(0.6)
+    
+    # A busy loop would retry thousands of times; backing off allows a handful
+    assert 2 <= len(attempts) <= 8
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    assert min(gaps) >= 0.04
+    assert queue.metrics()["queue_depth"] == 5
+    queue.close()
+
+
+def test_late_write_error_is_logged_not_raised():
+    def failing(items: List[Tuple[Hashable, Any]]) -> None:
+        raise OSError("read-only file system")
+        
+    queue = WriteBehindQueue("test_closed", failing, flush_interval=3600)
+    queue.close()
+    queue.submit("late", "payload")
+    assert queue.metrics()["errors"] == 1
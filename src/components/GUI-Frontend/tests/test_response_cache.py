@@ -0,0 +1,34 @@
+"""
+Tests for serving cached answers of the model a turn is routed to.
+"""
+import sys
+import types
+
+from utils import chat
+from utils.chat import LlmService
+from utils.response_cache import ResponseCache
+from utils.slo import SloPolicy
+
+
+def test_fallback_answers_are_served_while_the_chosen_model_is_degraded(monkeypatch):
+    streamlit = types.ModuleType("streamlit")
+    streamlit.session_state = {}
+    monkeypatch.setitem(sys.modules, "streamlit", streamlit)
+    cache = ResponseCache(data_path=None)
+    monkeypatch.setattr(chat, "get_response_cache", lambda: cache)
+    
+    service = LlmService(model="large")
+    service.fallback_model = "small"
+    service.slo = SloPolicy(ttft_target=1.0, min_samples=1)
+    service.temperature = 0.0
+    messages = [{"role": "user", "content": "What is a PCI conflict?"}]
+    prompt_messages, options = service._prepare(messages)
+    cache.put(cache.make_key("small", options, prompt_messages), "Answer from the fallback model")
+    
+    # Healthy: only the chosen model's answers count
+    assert service.cached_response(messages) is None
+    
+    service.slo.record("large", ttft=30.0, queue_wait=0.0)
+    assert service.slo.is_degraded("large")
+    assert "".join(service.cached_response(messages)) == "Answer from the fallback model"
+    assert service.last_model == "small"
@@ -0,0 +1,230 @@
+"""
+Tests for host routing, failover and the per-host circuit breaker.
+
+Each test starts local HTTP stand-ins that speak enough of the Ollama API
+for the health monitor and the chat client: a healthy host, a slow host
+whose probes time out, and a failing host.
+"""
+import json
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List
+
+import pytest
+
+from utils import health
+from utils import router as router_module
+from utils.chat import LlmService
+from utils.config import config
+from utils.health import CircuitBreaker, OllamaHealthMonitor
+from utils.router import OllamaRouter
+from utils.warmup import ModelWarmer
+
+MODEL = "stand-in:latest"
+
+
+class StandIn:
+    """Local Ollama stand-in whose behavior can be switched while it runs."""
+    
+    def __init__(self, mode: str = "healthy", loaded: bool = True) -> None:
+        self.mode = mode
+        self.loaded = loaded
+        self.chat_requests = 0
+        stand_in = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+                
+            def _json(self, payload: Dict[str, Any], status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                
+            def do_GET(self) -> None:
+                if stand_in.mode == "failing":
+                    self._json({"error": "unavailable"}, 500)
+                    return
+                if stand_in.mode == "slow":
+                    time.sleep(1.0)
+                if self.path == "/api/version":
+                    self._json({"version": "stand-in"})
+                else:
+                    self._json({"models": [{"name": MODEL, "model": MODEL}] if stand_in.loaded else []})
+                    
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stand_in.chat_requests += 1
+                if stand_in.mode != "healthy" or stand_in.drop_chat:
+                    # Hang up without answering, like a host that went away mid-request
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for word in ("hello ", "from ", stand_in.name):
+                    chunk = {"model": MODEL, "done": False, "message": {"role": "assistant", "content": word}}
+                    self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+                final = {"model": MODEL, "done": True, "message": {"role": "assistant", "content": ""}}
+                self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+                
+        self.drop_chat = False
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.name = self.host
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 10.0) -> None:
+    """Wait until a condition holds or fail the test."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("condition not reached in time")
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def stand_ins(monkeypatch) -> Iterator[Callable[..., StandIn]]:
+    """Start stand-ins with fast health monitors registered for the router."""
+    started: List[StandIn] = []
+    monitors: List[OllamaHealthMonitor] = []
+    
+    def start(mode: str = "healthy", loaded: bool = True) -> StandIn:
+        stand_in = StandIn(mode, loaded)
+        started.append(stand_in)
+        monitor = OllamaHealthMonitor(stand_in.host, probe_interval=0.05, timeout=0.3,
+                                      failure_threshold=2, max_backoff=0.2)
+        monkeypatch.setitem(health._monitors, stand_in.host, monitor)
+        monitors.append(monitor)
+        return stand_in
+        
+    yield start
+    for monitor in monitors:
+        monitor.stop()
+    for stand_in in started:
+        # Monitors a test started through get_health_monitor
+        health.remove_health_monitor(stand_in.host)
+        stand_in.close()
+
+
+def test_least_outstanding_host_is_chosen(stand_ins):
+    first, second = stand_ins(), stand_ins()
+    router = OllamaRouter([first.host, second.host])
+    _wait_for(lambda: all(health._monitors[h].has_model_loaded(MODEL) for h in router.hosts))
+    
+    chosen = [router.choose(MODEL) for _ in range(4)]
+    assert sorted(chosen) == sorted([first.host, second.host] * 2)
+    
+    router.release(first.host)
+    assert router.choose(MODEL) == first.host
+    assert router.choose(MODEL) in (first.host, second.host)
+    assert {row["host"]: row["outstanding"] for row in router.status()} in (
+        {first.host: 3, second.host: 2}, {first.host: 2, second.host: 3}
+    )
+
+
+def test_loaded_model_wins_over_idle_host(stand_ins):
+    warm, cold = stand_ins(loaded=True), stand_ins(loaded=False)
+    router = OllamaRouter([cold.host, warm.host])
+    _wait_for(lambda: health._monitors[warm.host].has_model_loaded(MODEL))
+    
+    assert router.choose(MODEL) == warm.host
+    assert router.choose(MODEL) == warm.host
+
+
+def test_host_list_follows_configuration(stand_ins, monkeypatch):
+    old, kept, added = stand_ins(), stand_ins(), stand_ins()
+    hosts = [old.host, kept.host]
+    monkeypatch.setattr(config, "ollama_hosts", lambda: list(hosts))
+    subscribers: List[Any] = []
+    monkeypatch.setattr(config, "subscribe", lambda callback, keys=None: subscribers.append((callback, keys)))
+    monkeypatch.setattr(router_module, "_router", None)
+    
+    router = router_module.get_router()
+    _wait_for(lambda: all(health._monitors[h].has_model_loaded(MODEL) for h in hosts))
+    busy = router.choose(MODEL, exclude=[old.host])
+    assert busy == kept.host
+    on_old = router.choose(MODEL)
+    assert on_old == old.host
+    
+    old_monitor = health._monitors[old.host]
+    hosts[:] = [kept.host, added.host]
+    callback, keys = subscribers[0]
+    assert "OLLAMA_API_HOSTS" in keys
+    callback({"OLLAMA_API_HOSTS": ",".join(hosts)})
+    _wait_for(lambda: health._monitors[added.host].has_model_loaded(MODEL))
+    
+    assert router.hosts == [kept.host, added.host]
+    assert router.choose(MODEL) == added.host
+    router.release(on_old)
+    assert {row["host"]: row["outstanding"] for row in router.status()} == {kept.host: 1, added.host: 1}
+    
+    # The removed host is no longer probed; adding it back starts one fresh monitor
+    assert old.host not in health._monitors
+    old_monitor._thread.join(timeout=2)
+    assert not old_monitor._thread.is_alive()
+    hosts[:] = [kept.host, added.host, old.host]
+    callback({"OLLAMA_API_HOSTS": ",".join(hosts)})
+    assert [t.name for t in threading.enumerate()].count(f"ollama-health-{old.host}") == 1
+
+
+def test_warmer_loads_each_model_once_on_its_affinity_host(stand_ins):
+    warm, cold = stand_ins(loaded=True), stand_ins(loaded=False)
+    router = OllamaRouter([cold.host, warm.host])
+    warmer = ModelWarmer(router, [MODEL, "other:latest"], rewarm_interval=3600)
+    warmer.start()
+    _wait_for(lambda: len(warmer.assignments) == 2 and warm.chat_requests + cold.chat_requests == 1)
+    warmer.stop()
+    
+    # The loaded model stays where it is; only the missing one is loaded, on one host
+    assert warmer.assignments[MODEL] == warm.host
+    time.sleep(0.2)
+    assert warm.chat_requests + cold.chat_requests == 1
+
+
+def test_breaker_opens_for_failing_and_slow_hosts_and_closes_on_recovery(stand_ins):
+    healthy, slow, failing = stand_ins(), stand_ins("slow"), stand_ins("failing")
+    router = OllamaRouter([healthy.host, slow.host, failing.host])
+    _wait_for(lambda: health._monitors[failing.host].breaker.state == CircuitBreaker.OPEN)
+    _wait_for(lambda: health._monitors[slow.host].breaker.state == CircuitBreaker.OPEN)
+    
+    assert [router.choose(MODEL) for _ in range(5)] == [healthy.host] * 5
+    assert router.choose(MODEL, exclude=[healthy.host]) is None
+    
+    failing.mode = "healthy"
+    _wait_for(lambda: health._monitors[failing.host].breaker.state == CircuitBreaker.CLOSED)
+    assert router.choose(MODEL, exclude=[healthy.host, slow.host]) == failing.host
+
+
+def test_request_fails_over_to_the_next_host(stand_ins, monkeypatch):
+    # generate_response reads its output buffer from the Streamlit session
+    streamlit = types.ModuleType("streamlit")
+    streamlit.session_state = {}
+    monkeypatch.setitem(sys.modules, "streamlit", streamlit)
+    
+    broken, backup = stand_ins(loaded=True), stand_ins(loaded=False)
+    broken.drop_chat = True
+    backup.name = "backup"
+    router = OllamaRouter([broken.host, backup.host])
+    _wait_for(lambda: health._monitors[broken.host].has_model_loaded(MODEL))
+    
+    service = LlmService(model=MODEL)
+    service.router = router
+    service.fallback_model = None
+    answer = "".join(service.generate_response([{"role": "user", "content": "hi"}]))
+    
+    assert answer == "hello from backup"
+    assert broken.chat_requests >= 1 and backup.chat_requests == 1
+    assert [row["outstanding"] for row in router.status()] == [0, 0]
@@ -0,0 +1,37 @@
+"""
+Tests for fair scheduling and the low-priority queue for background work.
+"""
+from utils.scheduler import FairScheduler
+
+
+def test_background_work_waits_for_users_and_leaves_a_slot_free():
+    scheduler = FairScheduler(max_concurrent=2, max_queue=8)
+    first = scheduler.submit("background:summary", low_priority=True)
+    second = scheduler.submit("background:summary", low_priority=True)
+    assert first.granted
+    # The last slot stays free for interactive requests
+    assert not second.granted
+    
+    user = scheduler.submit("alice")
+    assert user.granted
+    waiting_user = scheduler.submit("bob")
+    assert scheduler.position(waiting_user) == 1
+    assert scheduler.position(second) == 2
+    
+    scheduler.release(first)
+    assert waiting_user.granted and not second.granted
+    scheduler.release(user)
+    scheduler.release(waiting_user)
+    assert second.granted
+    scheduler.release(second)
+    assert scheduler.metrics()["active"] == 0
+
+
+def test_background_work_is_never_rejected():
+    scheduler = FairScheduler(max_concurrent=1, max_queue=0)
+    held = scheduler.submit("alice")
+    queued = [scheduler.submit("background:summary", low_priority=True) for _ in range(3)]
+    assert scheduler.metrics()["waiting_background"] == 3
+    scheduler.release(queued[1])
+    scheduler.release(held)
+    assert queued[0].granted and not queued[2].granted
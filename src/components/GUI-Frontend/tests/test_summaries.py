@@ -0,0 +1,42 @@
+"""
+Tests for the offline ticket summary job's cache keys and its lease.
+"""
+import threading
+import time
+from typing import Any, Dict, List
+
+from utils.summaries import SummaryJob, TicketSummaryStore, content_hash
+from utils.ticket import TicketStore
+
+
+def test_summaries_survive_a_date_shift(tmp_path):
+    ticket = TicketStore(size=1, seed=7).slice(1)[0]
+    assert content_hash(ticket) == content_hash(dict(ticket, last_updated="2000-01-01T00:00:00.000+0200"))
+    assert content_hash(ticket) != content_hash(dict(ticket, title="Something else"))
+    
+    store = TicketSummaryStore(str(tmp_path / "summaries.sqlite3"))
+    store.put(ticket["key"], content_hash(ticket), "model", "summary")
+    assert store.get_many([dict(ticket, last_updated="tomorrow")]) == {ticket["key"]: "summary"}
+
+
+def test_only_one_job_runs_at_a_time(tmp_path):
+    tickets = TicketStore(size=6, seed=7)
+    store = TicketSummaryStore(str(tmp_path / "summaries.sqlite3"))
+    summarized: List[str] = []
+    
+    def summarize(ticket: Dict[str, Any]) -> str:
+        summarized.append(ticket["key"])
+        time.sleep(0.05)
+        return "summary"
+        
+    # Two jobs stand in for the workers of two app processes
+    first = SummaryJob(tickets, store, summarize, "model", concurrency=1)
+    second = SummaryJob(tickets, store, summarize, "model", concurrency=1)
+    runner = threading.Thread(target=first.run, kwargs={"ignore_hours": True})
+    runner.start()
+    time.sleep(0.02)
+    assert second.run(ignore_hours=True) == {}
+    runner.join()
+    
+    assert sorted(summarized) == sorted(ticket["key"] for ticket in tickets.slice(len(tickets)))
+    assert second.run(ignore_hours=True)["summarized"] == 0
@@ -0,0 +1,112 @@
+"""
+Asyncio streaming bridge for the TicketAssist application.
+
+This module runs async LLM streams on one background event loop and
+exposes them to the Streamlit script thread as plain iterators. When the
+consumer stops iterating (the user navigates away or sends a new
+message), the async task is cancelled, which closes the HTTP stream and
+makes Ollama stop the generation.
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+import asyncio
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_ITEM = "item"
+_ERROR = "error"
+_DONE = "done"
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_stats = {"started": 0, "completed": 0, "cancelled": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop, starting its thread if needed.
+    
+    Returns:
+        The running background event loop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def _count(outcome: str) -> None:
+    """Increment a stream outcome counter."""
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stream_stats() -> Dict[str, int]:
+    """
+    Get counts of bridged streams by outcome.
+    
+    Returns:
+        Dictionary with started, completed, cancelled and failed counts
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def iterate_async_stream(open_stream: Callable[[], Awaitable[AsyncIterator[Any]]]) -> Iterator[Any]:
+    """
+    Consume an async stream from synchronous code.
+    
+    The stream runs on the background event loop and hands items over
+    through a queue. Closing the returned iterator before the stream ends
+    cancels the async task.
+    
+    Args:
+        open_stream: Callable returning an awaitable that resolves to the
+            async iterator, e.g. lambda: client.chat(..., stream=True)
+            
+    Yields:
+        Items of the async stream as they arrive
+        
+    Raises:
+        Exception: Any error raised by the async stream
+    """
+    items: "queue.Queue[tuple]" = queue.Queue()
+    
+    async def pump() -> None:
+        try:
+            async for item in await open_stream():
+                items.put((_ITEM, item))
+            items.put((_DONE, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            items.put((_ERROR, e))
+            
+    _count("started")
+    future = asyncio.run_coroutine_threadsafe(pump(), get_event_loop())
+    finished = False
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == _ITEM:
+                yield value
+            elif kind == _ERROR:
+                finished = True
+                _count("failed")
+                raise value
+            else:
+                finished = True
+                _count("completed")
+                return
+    finally:
+        if not finished:
+            # The consumer went away; abort the request to free the decode slot
+            future.cancel()
+            _count("cancelled")
+            logger.info("Cancelled abandoned LLM stream")
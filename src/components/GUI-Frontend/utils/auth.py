@@ -3,12 +3,314 @@ Authentication module for TicketAssist application.
 
 This module provides authentication utilities and session management 
 for the TicketAssist application.
+
+A successful login issues a signed, expiring session cookie. On page load
+the cookie is checked with a single HMAC, so a websocket reconnect or a
+restart after a deploy restores the login without showing the form again.
 """
-from typing import Callable, Dict, Optional, Tuple, Any
+from typing import Callable, Deque, Dict, Optional, Tuple, Any
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+
 import streamlit as st
 
 from utils.config import config
 
+logger = logging.getLogger(__name__)
+
+
+def _b64encode(data: bytes) -> str:
+    """Encode bytes as unpadded URL-safe base64."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    """Decode unpadded URL-safe base64."""
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokenSigner:
+    """
+    Issues and checks signed session tokens.
+    
+    A token carries the username and an expiry time, signed with HMAC-SHA256.
+    The signing key is derived from the server secret and the current
+    password, so changing either one revokes every issued token.
+    """
+    
+    VERSION = "v1"
+    
+    def __init__(self, secret: bytes, ttl_seconds: float = 43200.0) -> None:
+        """
+        Initialize the signer.
+        
+        Args:
+            secret: Server-side secret key
+            ttl_seconds: Seconds an issued token stays valid
+        """
+        self.secret = secret
+        self.ttl_seconds = ttl_seconds
+    
+    def _sign(self, payload: str, credential: str) -> str:
+        """Sign a payload with the key for the current credential."""
+        key = hmac.new(self.secret, credential.encode("utf-8"), hashlib.sha256).digest()
+        return _b64encode(hmac.new(key, f"{self.VERSION}.{payload}".encode("ascii"), hashlib.sha256).digest())
+    
+    def issue(self, username: str, credential: str) -> str:
+        """
+        Issue a token for a user.
+        
+        Args:
+            username: Authenticated user
+            credential: Password the user logged in with
+            
+        Returns:
+            The token, safe to store in a cookie
+        """
+        now = int(time.time())
+        payload = _b64encode(json.dumps(
+            {"u": username, "iat": now, "exp": now + int(self.ttl_seconds)}, separators=(",", ":")
+        ).encode("utf-8"))
+        return f"{self.VERSION}.{payload}.{self._sign(payload, credential)}"
+    
+    def verify(self, token: str, credential: str) -> Optional[str]:
+        """
+        Check a token.
+        
+        Args:
+            token: Token from issue
+            credential: Current password
+            
+        Returns:
+            The username the token was issued to, or None if it is invalid or expired
+        """
+        try:
+            version, payload, signature = token.split(".")
+            if version != self.VERSION or not hmac.compare_digest(signature, self._sign(payload, credential)):
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError):
+            return None
+        if claims.get("exp", 0) < time.time():
+            return None
+        return claims.get("u")
+
+
+class LoginRateLimiter:
+    """
+    Per-client limit on failed logins.
+    
+    A client that fails max_failures times within the window is refused
+    until its oldest failure leaves the window. A successful login clears
+    the client's failures.
+    """
+    
+    def __init__(self, max_failures: int = 5, window_seconds: float = 300.0) -> None:
+        """
+        Initialize the limiter.
+        
+        Args:
+            max_failures: Failed logins allowed per client within the window
+            window_seconds: Length of the sliding window in seconds
+        """
+        self.max_failures = max(1, max_failures)
+        self.window_seconds = window_seconds
+        self._failures: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+    
+    def _prune(self, client: str, now: float) -> Deque[float]:
+        """Drop failures that left the window. Caller holds the lock."""
+        failures = self._failures.setdefault(client, deque())
+        while failures and now - failures[0] >= self.window_seconds:
+            failures.popleft()
+        return failures
+    
+    def retry_after(self, client: str) -> float:
+        """
+        Check whether a client may try to log in.
+        
+        Args:
+            client: Client identifier, usually its IP address
+            
+        Returns:
+            Seconds until the client may try again, 0 if it may try now
+        """
+        now = time.monotonic()
+        with self._lock:
+            failures = self._prune(client, now)
+            if not failures:
+                del self._failures[client]
+                return 0.0
+            if len(failures) < self.max_failures:
+                return 0.0
+            return failures[-self.max_failures] + self.window_seconds - now
+    
+    def record_failure(self, client: str) -> None:
+        """
+        Count a failed login.
+        
+        Args:
+            client: Client identifier, usually its IP address
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(client, now).append(now)
+            if len(self._failures) > 10000:
+                # Forget clients whose failures have all expired
+                for key in [key for key in self._failures if not self._prune(key, now)]:
+                    del self._failures[key]
+    
+    def reset(self, client: str) -> None:
+        """
+        Clear a client's failures after a successful login.
+        
+        Args:
+            client: Client identifier, usually its IP address
+        """
+        with self._lock:
+            self._failures.pop(client, None)
+
+
+def _load_session_secret() -> bytes:
+    """
+    Get the secret session tokens are signed with.
+    
+    Uses AUTH_SESSION_SECRET if set. Otherwise a random secret is created
+    once in AUTH_SESSION_KEY_FILE, so tokens stay valid across restarts
+    and processes sharing the data directory.
+    """
+    secret = config.get("AUTH_SESSION_SECRET", "")
+    if secret:
+        return secret.encode("utf-8")
+        
+    path = Path(config.get("AUTH_SESSION_KEY_FILE", "data/session_secret"))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process may still be writing it
+        for _ in range(50):
+            secret = path.read_text(encoding="utf-8").strip()
+            if secret:
+                return secret.encode("utf-8")
+            time.sleep(0.1)
+        raise RuntimeError(f"Session key file {path} is empty")
+    secret = secrets.token_hex(32)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secret)
+    logger.info(f"Created session signing key in {path}")
+    return secret.encode("utf-8")
+
+
+_signer: Optional[SessionTokenSigner] = None
+_limiter: Optional[LoginRateLimiter] = None
+_auth_lock = threading.Lock()
+
+
+def get_session_signer() -> SessionTokenSigner:
+    """
+    Get the process-wide session token signer.
+    
+    Returns:
+        The shared signer
+    """
+    global _signer
+    with _auth_lock:
+        if _signer is None:
+            _signer = SessionTokenSigner(
+                _load_session_secret(),
+                ttl_seconds=float(config.get("AUTH_SESSION_TTL_SECONDS", 43200.0))
+            )
+        return _signer
+
+
+def get_login_limiter() -> LoginRateLimiter:
+    """
+    Get the process-wide login rate limiter.
+    
+    Returns:
+        The shared limiter
+    """
+    global _limiter
+    with _auth_lock:
+        if _limiter is None:
+            _limiter = LoginRateLimiter(
+                max_failures=int(config.get("AUTH_LOGIN_MAX_FAILURES", 5)),
+                window_seconds=float(config.get("AUTH_LOGIN_WINDOW_SECONDS", 300.0))
+            )
+        return _limiter
+
+
+def client_ip() -> str:
+    """
+    Get the address of the client running the current script.
+    
+    Forwarded headers are only used when AUTH_TRUSTED_PROXY says the app
+    runs behind a reverse proxy, since clients can send them too. Even then
+    only the right-most X-Forwarded-For entry, the one the proxy appended,
+    is believed.
+    
+    Returns:
+        The client address, or "unknown"
+    """
+    if config.get("AUTH_TRUSTED_PROXY", False):
+        headers = st.context.headers
+        hops = [hop.strip() for hop in (headers.get("X-Forwarded-For") or "").split(",") if hop.strip()]
+        forwarded = hops[-1] if hops else (headers.get("X-Real-Ip") or "").strip()
+        if forwarded:
+            return forwarded
+    return getattr(st.context, "ip_address", None) or "unknown"
+
+
+def restore_session() -> bool:
+    """
+    Log the session in from its session cookie if it is not logged in yet.
+    
+    Only reads the cookie sent with the page request and checks its
+    signature; there is no round trip to the browser and no rerun.
+    
+    Returns:
+        True if the session is authenticated
+    """
+    if st.session_state.get("authenticated"):
+        return True
+    if st.session_state.get("signed_out"):
+        return False
+    token = st.context.cookies.get(config.get("AUTH_COOKIE_NAME", "ticketassist_session"))
+    if not token:
+        return False
+    username = get_session_signer().verify(token, config.get("STREAMLIT_AUTH_PASSWORD", "admin"))
+    if username is None or not hmac.compare_digest(username, config.get("STREAMLIT_AUTH_USER", "admin")):
+        return False
+    st.session_state["authenticated"] = True
+    st.session_state["username"] = username
+    return True
+
+
+def _write_session_cookie(value: str, expires_at: datetime) -> None:
+    """Set the session cookie in the browser."""
+    # Imported here so page loads that only read the cookie skip the component
+    import extra_streamlit_components as stx
+    
+    cookie_manager = stx.CookieManager(key="session_cookie_manager")
+    cookie_manager.set(
+        config.get("AUTH_COOKIE_NAME", "ticketassist_session"),
+        value,
+        expires_at=expires_at,
+        key="session_cookie"
+    )
+
 
 class Authenticator:
     """
@@ -34,9 +336,27 @@ class Authenticator:
         valid_username = config.get("STREAMLIT_AUTH_USER", "admin")
         valid_password = config.get("STREAMLIT_AUTH_PASSWORD", "admin")
         
-        if (st.session_state["user"].strip() == valid_username and 
-            st.session_state["passwd"].strip() == valid_password):
+        client = client_ip()
+        limiter = get_login_limiter()
+        retry_after = limiter.retry_after(client)
+        if retry_after:
+            st.session_state["authenticated"] = False
+            st.error(f"Too many failed logins. Please try again in {math.ceil(retry_after)} seconds.")
+            return
+            
+        # Compare both fields in constant time so timing reveals neither
+        username_ok = hmac.compare_digest(st.session_state["user"].strip().encode("utf-8"),
+                                          valid_username.encode("utf-8"))
+        password_ok = hmac.compare_digest(st.session_state["passwd"].strip().encode("utf-8"),
+                                          valid_password.encode("utf-8"))
+        if username_ok and password_ok:
             st.session_state["authenticated"] = True
+            st.session_state.pop("signed_out", None)
+            # Widget keys are dropped on other pages, so keep the user separately
+            st.session_state["username"] = valid_username
+            limiter.reset(client)
+            # Written to the browser by authenticate_user; callbacks cannot render components
+            st.session_state["session_token"] = get_session_signer().issue(valid_username, valid_password)
         else:
             st.session_state["authenticated"] = False
             
@@ -45,6 +365,8 @@ class Authenticator:
             elif not st.session_state["user"]:
                 st.warning("Please enter username.")
             else:
+                limiter.record_failure(client)
+                logger.warning(f"Failed login from {client}")
                 st.error("Invalid Username/Password :face_with_raised_eyebrow:")
     
     def authenticate_user(self) -> bool:
@@ -54,6 +376,15 @@ class Authenticator:
         Returns:
             bool: True if user is authenticated, False otherwise.
         """
+        if restore_session():
+            token = st.session_state.pop("session_token", None)
+            if token:
+                ttl = get_session_signer().ttl_seconds
+                _write_session_cookie(token, datetime.now() + timedelta(seconds=ttl))
+            return True
+        if st.session_state.pop("clear_session_cookie", False):
+            _write_session_cookie("", datetime.now() - timedelta(days=1))
+            
         if "authenticated" not in st.session_state:
             st.text_input(label="Username :", value="", key="user")
             st.text_input(
@@ -82,6 +413,17 @@ class Authenticator:
                     on_change=self.verify_credentials
                 )
                 return False
+    
+    def sign_out(self) -> None:
+        """
+        Log the session out and remove its session cookie.
+        
+        The cookie is expired on the next run, which shows the login form.
+        """
+        st.session_state["authenticated"] = False
+        st.session_state["signed_out"] = True
+        st.session_state["clear_session_cookie"] = True
+        st.session_state.pop("session_token", None)
 
 
 class SessionManager:
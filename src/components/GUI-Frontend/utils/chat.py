@@ -3,116 +3,430 @@ Chat utilities for the TicketAssist application.
 
 This module provides chat-related functionality for the TicketAssist chatbot.
 """
-from typing import Dict, List, Iterator, Any, Optional
+from typing import Dict, List, Iterable, Iterator, Any, Optional, Set, Tuple
+from collections import OrderedDict
 from datetime import datetime
+from contextlib import closing
+import dbm
+import functools
+import hashlib
 import json
 import logging
 import shelve
-import os
+import sqlite3
 from pathlib import Path
-import requests
+import threading
 import time
+import uuid
 
-import ollama
-import streamlit as st
-
+from utils.async_stream import iterate_async_stream
 from utils.config import config
+from utils.health import get_health_monitor
+from utils.llm_clients import get_async_ollama_client, get_ollama_client
+from utils.metrics import get_llm_metrics
+from utils.persistence import WriteBehindQueue
+from utils.response_cache import ResponseCache, get_response_cache
+from utils.router import get_router
+from utils.slo import get_slo_policy
 
-# Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(encoding="UTF-8", level=logging.INFO)
+
+_history_queue: Optional[WriteBehindQueue] = None
+_history_queue_lock = threading.Lock()
+
+
+def get_history_queue() -> WriteBehindQueue:
+    """
+    Get the process-wide write-behind queue for chat history.
+    
+    Returns:
+        The shared chat history write queue
+    """
+    global _history_queue
+    with _history_queue_lock:
+        if _history_queue is None:
+            _history_queue = WriteBehindQueue(
+                "chat_history",
+                ChatHistory.save_batch,
+                flush_interval=float(config.get("CHAT_FLUSH_INTERVAL_SECONDS", 1.0)),
+                max_pending=int(config.get("CHAT_FLUSH_MAX_PENDING", 64))
+            )
+        return _history_queue
+
+
+_generate_contexts: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_generate_contexts_lock = threading.Lock()
+_MAX_GENERATE_CONTEXTS = 256
+
+
+def _prompt_digest(messages: List[Dict[str, str]]) -> str:
+    """Identify a prompt by the roles and contents of its messages."""
+    payload = json.dumps([[m["role"], m["content"]] for m in messages])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def coalesce_stream(tokens: Iterable[str], interval: float = 0.05, max_chars: int = 64) -> Iterator[str]:
+    """
+    Merge a token stream into fewer, larger chunks.
+    
+    The first token is passed through at once; after that, tokens are
+    buffered until interval seconds have passed since the last chunk or
+    max_chars characters are pending, so the browser gets a few updates per
+    second instead of one per token.
+    
+    Args:
+        tokens: Token stream to merge
+        interval: Maximum seconds between chunks while tokens arrive
+        max_chars: Buffered characters that force a chunk
+        
+    Yields:
+        Chunks of concatenated tokens
+    """
+    pending: List[str] = []
+    pending_chars = 0
+    last_flush = float("-inf")
+    for token in tokens:
+        pending.append(token)
+        pending_chars += len(token)
+        now = time.monotonic()
+        if pending_chars >= max_chars or now - last_flush >= interval:
+            yield "".join(pending)
+            pending.clear()
+            pending_chars = 0
+            last_flush = now
+    if pending:
+        yield "".join(pending)
 
 
 class ChatHistory:
     """
     Manager for chat history persistence and manipulation.
     
-    Handles loading, saving, and clearing of chat message history.
+    Messages are kept in an append-only SQLite table in WAL mode, partitioned
+    by user and conversation. Saving appends only the messages that have not
+    been stored yet, and loading can read just the most recent messages
+    instead of the whole history. Writes take SQLite's write lock up front,
+    so concurrent sessions and Streamlit worker processes never interleave
+    or corrupt each other's history.
     """
     
-    def __init__(self, data_path: str = "data/chat_history") -> None:
+    SCHEMA_VERSION = 2
+    LEGACY_CONVERSATION_ID = "legacy"
+    
+    # Databases whose schema is known to be current in this process
+    _schema_ready: Set[str] = set()
+    _schema_lock = threading.Lock()
+    
+    def __init__(self, user_id: str = "anonymous", conversation_id: Optional[str] = None,
+                 data_path: str = "data/chat_history.sqlite3",
+                 legacy_path: str = "data/chat_history") -> None:
         """
         Initialize the chat history manager.
         
         Args:
-            data_path: Path to the chat history storage file
+            user_id: Authenticated user owning the history
+            conversation_id: Conversation to read and write, defaults to the
+                user's most recent conversation or a new one
+            data_path: Path to the chat history database
+            legacy_path: Path to the shelve file used by earlier versions,
+                imported once when the database is created
         """
+        self.user_id = user_id
         self.data_path = data_path
-        # Ensure the data directory exists
-        Path(data_path).parent.mkdir(parents=True, exist_ok=True)
+        self.legacy_path = legacy_path
+        # Set up the database once per process instead of on every construction
+        with ChatHistory._schema_lock:
+            if data_path not in ChatHistory._schema_ready:
+                # Ensure the data directory exists
+                Path(data_path).parent.mkdir(parents=True, exist_ok=True)
+                if self._init_db():
+                    ChatHistory._schema_ready.add(data_path)
+        self.conversation_id = conversation_id or self._latest_conversation_id() or uuid.uuid4().hex
     
-    def load(self) -> List[Dict[str, Any]]:
+    def _connect(self) -> sqlite3.Connection:
         """
-        Load chat history from storage.
+        Open a connection to the chat history database.
         
         Returns:
-            List of message dictionaries containing chat history
+            SQLite connection configured for WAL journaling
+        """
+        conn = sqlite3.connect(self.data_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _init_db(self) -> bool:
+        """
+        Create or upgrade the schema and import legacy history on first use.
+        
+        Returns:
+            True if the schema is current
         """
         try:
-            with shelve.open(self.data_path) as db:
-                return db.get("messages", [])
+            with closing(self._connect()) as conn, conn:
+                # Serialize schema setup between processes
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= self.SCHEMA_VERSION:
+                    return True
+                if version < 1:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS messages (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            role TEXT NOT NULL,
+                            content TEXT NOT NULL,
+                            created_at TEXT NOT NULL
+                        )
+                        """
+                    )
+                if version < 2:
+                    # Existing rows predate partitioning and belong to the configured user
+                    owner = config.get("STREAMLIT_AUTH_USER", "admin")
+                    conn.execute("ALTER TABLE messages ADD COLUMN user_id TEXT NOT NULL DEFAULT ''")
+                    conn.execute("ALTER TABLE messages ADD COLUMN conversation_id TEXT NOT NULL DEFAULT ''")
+                    conn.execute(
+                        "UPDATE messages SET user_id = ?, conversation_id = ?",
+                        (owner, self.LEGACY_CONVERSATION_ID)
+                    )
+                    conn.execute(
+                        "CREATE INDEX IF NOT EXISTS idx_messages_conversation "
+                        "ON messages (user_id, conversation_id, id)"
+                    )
+                if version < 1:
+                    self._insert(
+                        conn, config.get("STREAMLIT_AUTH_USER", "admin"),
+                        self.LEGACY_CONVERSATION_ID, self._load_legacy()
+                    )
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            return True
         except Exception as e:
-            logger.error(f"Error loading chat history: {e}")
-            return []
+            logger.error(f"Error initializing chat history: {e}")
+            return False
     
-    def save(self, messages: List[Dict[str, Any]]) -> None:
+    def _load_legacy(self) -> List[Dict[str, Any]]:
         """
-        Save chat history to storage.
+        Read messages from the legacy shelve store, if present.
         
-        Args:
-            messages: List of message dictionaries to save
+        Returns:
+            List of legacy message dictionaries
         """
+        if not dbm.whichdb(self.legacy_path):
+            return []
         try:
-            with shelve.open(self.data_path) as db:
-                db["messages"] = messages
+            with shelve.open(self.legacy_path, flag="r") as db:
+                messages = list(db.get("messages", []))
+            logger.info(f"Importing {len(messages)} messages from legacy chat history")
+            return messages
         except Exception as e:
-            logger.error(f"Error saving chat history: {e}")
+            logger.warning(f"Could not import legacy chat history: {e}")
+            return []
     
-    def clear(self) -> List[Dict[str, Any]]:
+    def _latest_conversation_id(self) -> Optional[str]:
         """
-        Clear chat history and return a fresh message list.
+        Find the user's most recently written conversation.
         
         Returns:
-            A new list with just the initial assistant message
+            The conversation ID, or None if the user has no history
         """
-        initial_message = [{"role": "assistant", "content": "How may I assist you today?"}]
-        self.save([])
-        return initial_message
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT conversation_id FROM messages WHERE user_id = ? "
+                    "ORDER BY id DESC LIMIT 1",
+                    (self.user_id,)
+                ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error looking up latest conversation: {e}")
+            return None
+    
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, user_id: str, conversation_id: str,
+                messages: List[Dict[str, Any]]) -> None:
+        """
+        Append messages to the store and record their IDs on the dictionaries.
+        
+        Args:
+            conn: Open database connection inside a transaction
+            user_id: User owning the messages
+            conversation_id: Conversation the messages belong to
+            messages: Message dictionaries to append, in order
+        """
+        created_at = datetime.now().isoformat(timespec="seconds")
+        for message in messages:
+            cursor = conn.execute(
+                "INSERT INTO messages (user_id, conversation_id, role, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, conversation_id, message["role"], message["content"], created_at)
+            )
+            message["id"] = cursor.lastrowid
     
-    def log_feedback(self, feedback_type: str) -> None:
+    def load(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Log user feedback on messages.
+        Load the conversation's chat history from storage.
         
         Args:
-            feedback_type: Type of feedback (positive/negative)
+            limit: Maximum number of most recent messages to load, or None for all
+            
+        Returns:
+            List of message dictionaries containing chat history
         """
         try:
-            # Retrieve the last question and answer
-            last_messages = json.dumps(st.session_state["messages"][-2:])
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT id, role, content FROM messages "
+                    "WHERE user_id = ? AND conversation_id = ? ORDER BY id DESC LIMIT ?",
+                    (self.user_id, self.conversation_id, -1 if limit is None else limit)
+                ).fetchall()
+            return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"Error loading chat history: {e}")
+            return []
+    
+    def load_before(self, before_id: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Load a page of messages older than a given message.
+        
+        Args:
+            before_id: ID of the oldest message already loaded
+            limit: Maximum number of messages to load
             
-            # Record the timestamp
-            activity = datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ": "
+        Returns:
+            List of message dictionaries, oldest first
+        """
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT id, role, content FROM messages "
+                    "WHERE user_id = ? AND conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                    (self.user_id, self.conversation_id, before_id, limit)
+                ).fetchall()
+            return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"Error loading earlier chat history: {e}")
+            return []
+    
+    @staticmethod
+    def _unsaved(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Get the tail of a conversation that has not been stored yet.
+        
+        Stored messages carry an "id" key, so the scan stops at the first
+        stored message from the end.
+        
+        Args:
+            messages: List of message dictionaries in the conversation
             
-            # Include feedback type and messages
-            activity += feedback_type
-            activity += ": " + last_messages
+        Returns:
+            The unsaved messages, oldest first
+        """
+        start = len(messages)
+        while start > 0 and "id" not in messages[start - 1]:
+            start -= 1
+        return messages[start:]
+    
+    def save(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Append the messages that have not been stored yet.
+        
+        Args:
+            messages: List of message dictionaries in the conversation
             
-            # Log the activity
-            logger.info(activity)
+        Raises:
+            sqlite3.Error: If the messages could not be written
+        """
+        self.save_batch([(None, (self, messages))])
+    
+    def save_async(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Queue the conversation for a write-behind save.
+        
+        Pending saves of the same conversation are coalesced, and the
+        messages get their "id" keys once the queue flushes.
+        
+        Args:
+            messages: List of message dictionaries in the conversation
+        """
+        key = (self.data_path, self.user_id, self.conversation_id)
+        get_history_queue().submit(key, (self, list(messages)))
+    
+    @staticmethod
+    def save_batch(items: List[Tuple[Any, Tuple["ChatHistory", List[Dict[str, Any]]]]]) -> None:
+        """
+        Append the unsaved messages of several conversations.
+        
+        Conversations stored in the same database are written in a single
+        transaction.
+        
+        Args:
+            items: (key, (history, messages)) pairs as queued by save_async
             
-            # Display a confirmation to the user
-            st.toast("Thanks for your feedback!", icon="👌")
+        Raises:
+            sqlite3.Error: If a database could not be written; the write-behind
+                queue then keeps the items and retries them on its next flush
+        """
+        by_database: Dict[str, List[Tuple["ChatHistory", List[Dict[str, Any]]]]] = {}
+        for _, (history, messages) in items:
+            unsaved = ChatHistory._unsaved(messages)
+            if unsaved:
+                by_database.setdefault(history.data_path, []).append((history, unsaved))
+        
+        error: Optional[Exception] = None
+        for entries in by_database.values():
+            try:
+                with closing(entries[0][0]._connect()) as conn, conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for history, unsaved in entries:
+                        ChatHistory._insert(conn, history.user_id, history.conversation_id, unsaved)
+            except Exception as e:
+                # Messages only get their IDs once committed, so a retry writes exactly the missing ones
+                for _, unsaved in entries:
+                    for message in unsaved:
+                        message.pop("id", None)
+                logger.error(f"Error saving chat history: {e}")
+                error = error or e
+        if error is not None:
+            raise error
+    
+    def clear(self) -> List[Dict[str, Any]]:
+        """
+        Clear the conversation's chat history and return a fresh message list.
+        
+        Returns:
+            A new list with just the initial assistant message
+        """
+        initial_message = [{"role": "assistant", "content": "How may I assist you today?"}]
+        # Drop queued saves so they cannot re-insert the cleared messages
+        get_history_queue().discard((self.data_path, self.user_id, self.conversation_id))
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "DELETE FROM messages WHERE user_id = ? AND conversation_id = ?",
+                    (self.user_id, self.conversation_id)
+                )
         except Exception as e:
-            logger.error(f"Error logging feedback: {e}")
+            logger.error(f"Error clearing chat history: {e}")
+        return initial_message
 
 
 class LlmService:
     """
     Service for interacting with Language Models.
     
-    Handles communication with Ollama and other LLM providers.
+    Handles communication with Ollama and other LLM providers. Requests are
+    laid out so consecutive turns share the longest possible prompt prefix:
+    a fixed system prompt first, then the conversation in its original,
+    append-only form, so Ollama can reuse its KV cache for the prefix and
+    only prefill the new turn.
     """
     
+    # Never changes between turns; anything per-turn goes into the user message
+    SYSTEM_PROMPT = (
+        "You are TicketAssist, a support assistant for 5G network tickets. "
+        "When a user message quotes tickets, use them if they are relevant and cite their keys."
+    )
+    
     def __init__(self, model: Optional[str] = None) -> None:
         """
         Initialize the LLM service.
@@ -124,81 +438,336 @@ class LlmService:
         self.temperature = config.get("LLM_TEMPERATURE", 0.1)
         self.max_tokens = config.get("LLM_MAX_TOKENS", 512)
         self.top_p = config.get("LLM_TOP_P", 0.9)
+        self.seed: Optional[int] = None
+        self.keep_alive = config.get("LLM_KEEP_ALIVE", "30m")
+        self.last_prefill: Dict[str, Any] = {}
         
-        # Configure Ollama API host if specified
-        ollama_api_host = config.get("OLLAMA_API_HOST")
-        if ollama_api_host:
-            os.environ["OLLAMA_HOST"] = ollama_api_host
-            logger.info(f"Using custom Ollama API host: {ollama_api_host}")
-
-    # Add this code to utils/chat.py in the LlmService class
-
-    def wait_for_ollama(self, max_retries=10, retry_interval=5):
+        # Smaller model that answers while the chosen one misses its latency SLO
+        self.fallback_model = config.get("LLM_FALLBACK_MODEL") or None
+        self.last_model = self.model
+        self.slo = get_slo_policy()
+        
+        # Requests are routed across the configured hosts; clients and health
+        # monitors are shared per host across sessions
+        self.router = get_router()
+    
+    def summarize(self, messages: List[Dict[str, str]], previous_summary: str = "",
+                  max_tokens: int = 256) -> str:
         """
-        Wait for Ollama service to be available.
+        Summarize conversation messages, extending a previous summary.
         
         Args:
-            max_retries: Maximum number of connection attempts
-            retry_interval: Seconds to wait between retries
+            messages: Messages to fold into the summary, oldest first
+            previous_summary: Summary of the messages before these, if any
+            max_tokens: Maximum length of the generated summary
             
         Returns:
-            bool: True if Ollama is available, False otherwise
+            The updated summary text
         """
-        ollama_url = os.environ.get("OLLAMA_API_HOST", "http://localhost:11434")
-        health_url = f"{ollama_url}/api/version"
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (
+            "Summarize the following conversation between a user and a support assistant. "
+            "Keep ticket keys, error details and decisions; drop small talk.\n\n"
+        )
+        if previous_summary:
+            prompt += f"Summary so far:\n{previous_summary}\n\n"
+        prompt += f"New messages:\n{transcript}\n\nUpdated summary:"
+        return self.complete(prompt, max_tokens)
+    
+    def summarize_ticket(self, ticket: Dict[str, Any], max_tokens: int = 120) -> str:
+        """
+        Summarize a ticket's problem and solution for the ticket cards.
         
-        logger.info(f"Checking Ollama availability at {health_url}")
+        Args:
+            ticket: Ticket dictionary
+            max_tokens: Maximum length of the generated summary
+            
+        Returns:
+            The summary text
+        """
+        answer = ticket.get("Answer") or {}
+        prompt = (
+            "Summarize this 5G network ticket in two short sentences: what went wrong and how it "
+            "was resolved. Do not repeat the ticket key.\n\n"
+            f"Title: {ticket['title']}\n"
+            f"Description: {ticket.get('description') or '(none)'}\n"
+            f"Analysis: {answer.get('summary_of_analysis', '')}\n"
+            f"Solution: {answer.get('answer_text', '')}\n\nSummary:"
+        )
+        return self.complete(prompt, max_tokens)
+    
+    def complete(self, prompt: str, max_tokens: int = 256) -> str:
+        """
+        Run a single non-streaming, deterministic completion.
         
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(health_url, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"Ollama is available: {response.json()}")
-                    return True
-            except Exception as e:
-                logger.warning(f"Attempt {attempt+1}/{max_retries}: Ollama not available yet. Error: {e}")
+        Args:
+            prompt: User prompt
+            max_tokens: Maximum length of the completion
+            
+        Returns:
+            The completion text
             
-            logger.info(f"Waiting {retry_interval} seconds before next attempt...")
-            time.sleep(retry_interval)
+        Raises:
+            ConnectionError: If no Ollama host is available
+        """
+        host = self.router.choose(self.model)
+        if host is None:
+            raise ConnectionError("No Ollama host is available")
+        try:
+            response = get_ollama_client(host).chat(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                options={"temperature": 0, "num_predict": max_tokens},
+                keep_alive=self.keep_alive
+            )
+        finally:
+            self.router.release(host)
+        return response["message"]["content"].strip()
+    
+    def _build_request(self, model: str, prompt_messages: List[Dict[str, str]], options: Dict[str, Any],
+                       conversation_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Choose the API for a turn and build its request.
         
-        logger.error(f"Failed to connect to Ollama after {max_retries} attempts")
-        return False
-
-    def generate_response(self, messages: List[Dict[str, Any]]) -> Iterator[str]:
+        With LLM_REUSE_GENERATE_CONTEXT enabled, a conversation whose prompt
+        extends the previous turn exactly is continued through the generate
+        API with the context returned last time, so only the new user turn
+        is sent. Everything else goes through the chat API.
+        
+        Args:
+            model: Model that answers the turn
+            prompt_messages: Prompt messages, system prompt first
+            options: Sampling options
+            conversation_id: Conversation the turn belongs to, if known
+            
+        Returns:
+            Tuple of the API name ("chat" or "generate") and its request
+        """
+        request = {"model": model, "stream": True, "options": options, "keep_alive": self.keep_alive}
+        
+        if conversation_id and config.get("LLM_REUSE_GENERATE_CONTEXT", False):
+            with _generate_contexts_lock:
+                previous = _generate_contexts.get((conversation_id, model))
+            history = prompt_messages[:-1]
+            fresh = not any(m["role"] == "user" for m in history)
+            if fresh or (previous and previous["digest"] == _prompt_digest(history)):
+                request.update(system=self.SYSTEM_PROMPT, prompt=prompt_messages[-1]["content"])
+                if previous and not fresh:
+                    request["context"] = previous["context"]
+                return "generate", request
+                
+        request["messages"] = prompt_messages
+        return "chat", request
+    
+    def _remember_context(self, conversation_id: str, model: str, prompt_messages: List[Dict[str, str]],
+                          answer: str, context: List[int]) -> None:
+        """Keep the generate API context of a turn for the conversation's next turn."""
+        digest = _prompt_digest(prompt_messages + [{"role": "assistant", "content": answer}])
+        with _generate_contexts_lock:
+            _generate_contexts[(conversation_id, model)] = {"digest": digest, "context": context}
+            _generate_contexts.move_to_end((conversation_id, model))
+            while len(_generate_contexts) > _MAX_GENERATE_CONTEXTS:
+                _generate_contexts.popitem(last=False)
+    
+    def _record_prefill(self, final: Any, host: str, api: str, conversation_id: Optional[str]) -> None:
+        """
+        Log prompt evaluation statistics from the final stream chunk.
+        
+        A follow-up turn that reuses the cached prefix shows a much smaller
+        prompt_eval_count than the full prompt.
+        """
+        if final is None:
+            return
+        prompt_eval_count = final.get("prompt_eval_count") or 0
+        prompt_eval_ms = (final.get("prompt_eval_duration") or 0) / 1e6
+        self.last_prefill = {
+            "conversation_id": conversation_id,
+            "host": host,
+            "api": api,
+            "prompt_eval_count": prompt_eval_count,
+            "prompt_eval_ms": round(prompt_eval_ms, 1),
+            "eval_count": final.get("eval_count") or 0,
+        }
+        logger.info(
+            f"Prefill for conversation {conversation_id} on {host} via {api}: "
+            f"{prompt_eval_count} prompt tokens evaluated in {prompt_eval_ms:.0f}ms"
+        )
+    
+    def _prepare(self, messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the prompt and sampling options for a turn.
+        
+        Args:
+            messages: List of message dictionaries to send to the LLM
+            
+        Returns:
+            Prompt messages with the system prompt, and the Ollama sampling options
+        """
+        prompt_messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+        prompt_messages.extend({"role": m["role"], "content": m["content"]} for m in messages)
+        options = {
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "num_predict": self.max_tokens,
+        }
+        if self.seed is not None:
+            options["seed"] = int(self.seed)
+        return prompt_messages, options
+    
+    def cached_response(self, messages: List[Dict[str, Any]]) -> Optional[Iterator[str]]:
+        """
+        Look up a cached answer for a turn with repeatable settings.
+        
+        Called before the turn asks for a scheduler slot, so cache hits
+        neither wait for nor occupy the backend. Answers of the chosen model
+        are preferred; while it misses its SLO, answers of the fallback
+        model are served too, as generate_response would route there.
+        
+        Args:
+            messages: List of message dictionaries to send to the LLM
+            
+        Returns:
+            A token stream replaying the cached answer, or None on a miss
+        """
+        prompt_messages, options = self._prepare(messages)
+        if not (config.get("LLM_CACHE_ENABLED", True) and ResponseCache.is_cacheable(options)):
+            return None
+        cache = get_response_cache()
+        models = [self.model]
+        if self.fallback_model and self.fallback_model != self.model and self.slo.is_degraded(self.model):
+            models.append(self.fallback_model)
+        for model in models:
+            cached = cache.get(cache.make_key(model, options, prompt_messages))
+            if cached is not None:
+                break
+        else:
+            return None
+        logger.info(f"Serving cached response for model={model}")
+        self.last_model = model
+        self.last_prefill = {}
+        
+        def replay() -> Iterator[str]:
+            import streamlit as st
+            
+            full_message = st.session_state.get("full_message")
+            for token in ResponseCache.replay(cached):
+                if full_message is not None:
+                    full_message.append(token)
+                yield token
+                
+        return replay()
+    
+    def generate_response(self, messages: List[Dict[str, Any]],
+                          conversation_id: Optional[str] = None,
+                          queue_wait: float = 0.0) -> Iterator[str]:
         """
         Generate streaming response from the LLM.
         
         Args:
             messages: List of message dictionaries to send to the LLM
+            conversation_id: Conversation the turn belongs to, used for
+                generate API context reuse and prefill logging
+            queue_wait: Seconds the turn waited for a scheduler slot, for metrics
             
         Yields:
             Tokens from the LLM response as they become available
         """
-        # Try to ensure Ollama is available
-        if not self.wait_for_ollama():
-            yield "I'm having trouble connecting to the language model service. Please try again in a few moments."
-            return
+        prompt_messages, options = self._prepare(messages)
         
-        try:
-            logger.info(f"Generating response with model={self.model}, temp={self.temperature}")
-            
-            response = ollama.chat(
-                model=self.model, 
-                stream=True, 
-                messages=messages,
-                options={
-                    "temperature": self.temperature,
-                    "top_p": self.top_p,
-                    "num_predict": self.max_tokens
-                }
-            )
+        # Downgrade to the fallback model while the chosen one misses its latency SLO;
+        # last_model tells the page which model answered
+        model = self.slo.route(self.model, self.fallback_model)
+        if model != self.model:
+            logger.info(f"Answering with {model} instead of {self.model}, which misses its latency SLO")
+        self.last_model = model
+        
+        # The page collects the answer in a list buffer; joined once at the end
+        import streamlit as st
+        
+        full_message = st.session_state.get("full_message")
+        
+        # Store answers for repeatable settings; hits are served by cached_response before the turn gets here
+        cache_key = None
+        if config.get("LLM_CACHE_ENABLED", True) and ResponseCache.is_cacheable(options):
+            cache_key = ResponseCache.make_key(model, options, prompt_messages)
+        
+        api, request = self._build_request(model, prompt_messages, options, conversation_id)
+        tried: List[str] = []
+        last_error: Optional[Exception] = None
+        
+        while True:
+            # Route from the cached health state instead of probing per turn
+            host = self.router.choose(model, exclude=tried)
+            if host is None:
+                if last_error is not None:
+                    yield f"I encountered an error: {str(last_error)}"
+                else:
+                    yield (
+                        "I'm having trouble connecting to the language model service. "
+                        f"Please try again in {max(int(self.router.retry_in()), 1)} seconds."
+                    )
+                return
+            tried.append(host)
+            health = get_health_monitor(host)
             
-            for partial_resp in response:
-                token = partial_resp["message"]["content"]
-                # Update the full message in session state
-                if "full_message" in st.session_state:
-                    st.session_state["full_message"] += token
-                yield token
-        except Exception as e:
-            logger.error(f"Error generating LLM response: {e}")
-            yield f"I encountered an error: {str(e)}"
\ No newline at end of file
+            tokens = []
+            try:
+                logger.info(f"Generating response with model={model}, temp={self.temperature} on {host}")
+                
+                if config.get("LLM_ASYNC_STREAMING", True):
+                    # Abandoning this generator cancels the request so Ollama stops decoding
+                    response = iterate_async_stream(
+                        functools.partial(getattr(get_async_ollama_client(host), api), **request)
+                    )
+                else:
+                    response = getattr(get_ollama_client(host), api)(**request)
+                    
+                final = None
+                ttft = None
+                sent_at = time.perf_counter()
+                try:
+                    for partial_resp in response:
+                        if partial_resp.get("done"):
+                            final = partial_resp
+                        message = partial_resp.get("message")
+                        token = message["content"] if message else partial_resp.get("response", "")
+                        if not token:
+                            continue
+                        if ttft is None:
+                            ttft = time.perf_counter() - sent_at
+                        tokens.append(token)
+                        # Update the full message buffer in session state
+                        if full_message is not None:
+                            full_message.append(token)
+                        yield token
+                finally:
+                    # Close the stream right away when the consumer stops early
+                    response.close()
+                health.record_success()
+                get_llm_metrics().record(model, ttft, queue_wait, final)
+                if model != self.fallback_model:
+                    self.slo.record(model, ttft, queue_wait)
+                self._record_prefill(final, host, api, conversation_id)
+                if api == "generate" and final is not None and final.get("context"):
+                    self._remember_context(conversation_id, model, prompt_messages, "".join(tokens), final["context"])
+                    
+                if cache_key:
+                    get_response_cache().put(cache_key, "".join(tokens))
+                return
+            except Exception as e:
+                # A ResponseError means the host answered, so it is not a health failure
+                from ollama import ResponseError
+                
+                if not isinstance(e, ResponseError):
+                    health.record_failure()
+                get_llm_metrics().record_error(model)
+                if model != self.fallback_model:
+                    self.slo.record_error(model)
+                logger.error(f"Error generating LLM response on {host}: {e}")
+                if tokens:
+                    yield f"I encountered an error: {str(e)}"
+                    return
+                # Nothing was shown yet, so the request can fail over to another host
+                last_error = e
+            finally:
+                self.router.release(host)
\ No newline at end of file
@@ -1,71 +1,301 @@
 """
 Configuration module for TicketAssist application.
 
-This module handles loading configuration from environment variables,
-Docker secrets, and provides a unified interface for accessing configuration
-throughout the application.
+This module handles loading configuration from environment variables, an
+optional JSON or TOML config file, and Docker secrets, and provides a
+unified interface for accessing configuration throughout the application.
+
+Every value is validated against the type of its default. The config file
+named by CONFIG_FILE may also hold lists and maps, and is watched for
+changes: edits are applied without a restart and pushed to subscribers,
+so limits such as cache sizes, concurrency and timeouts can be retuned
+under load.
 """
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union, cast
+import json
 import logging
+import threading
+import time
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
 
 logger = logging.getLogger(__name__)
 
+Subscriber = Callable[[Dict[str, Any]], None]
+
+# Models offered in the chatbot when LLM_MODEL_OPTIONS/LLM_MODEL_MAPPING are not set
+DEFAULT_LLM_MODEL_OPTIONS = ['Llama3-8B', 'Llama2-13B', 'Llama3.2-3B']
+DEFAULT_LLM_MODEL_MAPPING = {
+    'Llama3-8B': 'llama3.1:8b',
+    'Llama2-13B': 'llama2.1:13b',
+    'Llama3.2-3B': 'llama3.2'
+}
+
+
+def _is_int(text: str) -> bool:
+    """Check whether a string is an integer."""
+    try:
+        int(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_hour_window(text: str) -> bool:
+    """Check whether a string is an hour window such as "22-6", or empty."""
+    if not text.strip():
+        return True
+    parts = text.split("-")
+    return len(parts) == 2 and all(_is_int(part.strip()) and 0 <= int(part) <= 24 for part in parts)
+
 
 class AppConfig:
     """
     Application configuration manager.
     
-    Handles loading and accessing configuration from environment variables
-    and Docker secrets.
+    Handles loading and accessing configuration from environment variables,
+    the config file and Docker secrets, in increasing order of precedence.
+    The file overrides the environment so values tuned in it take effect
+    even for keys the container sets.
     """
     
-    # Default configurations
-    DEFAULTS = {
+    # Default configurations; the type of each default is the type a value must have
+    DEFAULTS: Dict[str, Any] = {
+        "CONFIG_FILE": "",
+        "CONFIG_RELOAD_INTERVAL_SECONDS": 2.0,
         "REPLICATE_API_TOKEN": "",
         "STREAMLIT_AUTH_USER": "admin",
         "STREAMLIT_AUTH_PASSWORD": "admin",
+        "AUTH_SESSION_SECRET": "",
+        "AUTH_SESSION_KEY_FILE": "data/session_secret",
+        "AUTH_SESSION_TTL_SECONDS": 43200.0,
+        "AUTH_COOKIE_NAME": "ticketassist_session",
+        "AUTH_LOGIN_MAX_FAILURES": 5,
+        "AUTH_LOGIN_WINDOW_SECONDS": 300.0,
+        "AUTH_TRUSTED_PROXY": False,
         "LLM_MODEL": "llama3.1:8b",
+        "LLM_MODEL_OPTIONS": DEFAULT_LLM_MODEL_OPTIONS,
+        "LLM_MODEL_MAPPING": DEFAULT_LLM_MODEL_MAPPING,
+        "LLM_DEFAULT_MODEL": "Llama3-8B",
         "LLM_TEMPERATURE": 0.1,
         "LLM_MAX_TOKENS": 512,
         "LLM_TOP_P": 0.9,
+        "LLM_CONTEXT_TOKEN_BUDGET": 2048,
+        "LLM_CONTEXT_LOW_WATER": 0.6,
+        "LLM_REUSE_GENERATE_CONTEXT": False,
+        "LLM_SUMMARY_TOKEN_BUDGET": 256,
+        "LLM_SUMMARY_MODEL": "",
+        "LLM_KEEP_ALIVE": "30m",
+        "LLM_WARMUP_ENABLED": True,
+        "LLM_REWARM_INTERVAL_SECONDS": 300.0,
+        "LLM_ASYNC_STREAMING": True,
+        "LLM_METRICS_PATH": "data/llm_metrics.prom",
+        "LLM_METRICS_INTERVAL_SECONDS": 15.0,
+        "LLM_METRICS_PORT": 0,
+        "LLM_METRICS_WINDOW": 1000,
+        "LLM_FALLBACK_MODEL": "llama3.2",
+        "LLM_SLO_TTFT_SECONDS": 5.0,
+        "LLM_SLO_QUEUE_WAIT_SECONDS": 10.0,
+        "LLM_SLO_QUANTILE": 0.9,
+        "LLM_SLO_WINDOW": 20,
+        "LLM_SLO_MIN_SAMPLES": 5,
+        "LLM_SLO_RECOVERY_SECONDS": 60.0,
+        "LLM_CACHE_ENABLED": True,
+        "LLM_CACHE_MAX_ENTRIES": 512,
+        "LLM_CACHE_TTL_SECONDS": 3600.0,
+        "LLM_CACHE_PATH": "data/response_cache.sqlite3",
+        "LLM_CACHE_DISK_MAX_ENTRIES": 10000,
         "APP_TITLE": "TicketAssist",
         "DEBUG_MODE": False,
         "OLLAMA_API_HOST": "http://localhost:11434",
+        "OLLAMA_API_HOSTS": "",
+        "OLLAMA_NUM_PARALLEL": 4,
+        "LLM_QUEUE_MAX_LENGTH": 32,
+        "LLM_SCHEDULER_PROCESSES": 1,
+        "OLLAMA_POOL_SIZE": 10,
+        "OLLAMA_CONNECT_TIMEOUT_SECONDS": 5.0,
+        "OLLAMA_REQUEST_TIMEOUT_SECONDS": 300.0,
+        "OLLAMA_HEALTH_INTERVAL_SECONDS": 5.0,
+        "OLLAMA_HEALTH_TIMEOUT_SECONDS": 2.0,
+        "OLLAMA_BREAKER_FAILURE_THRESHOLD": 3,
+        "OLLAMA_BREAKER_MAX_BACKOFF_SECONDS": 60.0,
+        "TICKET_DATASET_SIZE": 50,
+        "TICKET_DATASET_SEED": "",
+        "TICKET_SHARED_DATASET": False,
+        "TICKET_SHARED_DIR": "",
+        "TICKET_SHARED_REFRESH_SECONDS": 1.0,
+        "TICKET_SHARED_DECODE_CACHE_SIZE": 4096,
+        "TICKET_SUMMARY_PATH": "data/ticket_summaries.sqlite3",
+        "SUMMARY_JOB_ENABLED": True,
+        "SUMMARY_JOB_MODEL": "",
+        "SUMMARY_JOB_MAX_TOKENS": 120,
+        "SUMMARY_JOB_CONCURRENCY": 2,
+        "SUMMARY_JOB_OFF_PEAK_HOURS": "22-6",
+        "SUMMARY_JOB_INTERVAL_SECONDS": 900.0,
+        "RETRIEVAL_ENABLED": True,
+        "RETRIEVAL_TOP_K": 3,
+        "RETRIEVAL_TOKEN_BUDGET": 512,
+        "CHAT_HISTORY_LOAD_LIMIT": 200,
+        "CHAT_RENDER_PAGE_SIZE": 20,
+        "CHAT_STREAM_FLUSH_INTERVAL_SECONDS": 0.05,
+        "CHAT_STREAM_FLUSH_CHARS": 64,
+        "CHAT_FLUSH_INTERVAL_SECONDS": 1.0,
+        "CHAT_FLUSH_MAX_PENDING": 64,
+    }
+    
+    # Format checks on top of the type: key -> (check, what a valid value is)
+    VALIDATORS: Dict[str, Tuple[Callable[[Any], bool], str]] = {
+        "TICKET_DATASET_SEED": (lambda value: not value.strip() or _is_int(value.strip()), "an integer or empty"),
+        "SUMMARY_JOB_OFF_PEAK_HOURS": (_is_hour_window, 'hours as "start-end", e.g. "22-6", or empty'),
     }
     
     def __init__(self) -> None:
-        """Initialize the application config from environment and secrets."""
-        self._config = self.DEFAULTS.copy()
-        self._load_from_environment()
-        self._load_from_secrets()
+        """Initialize the application config from environment, config file and secrets."""
+        self._subscribers: List[Tuple[Subscriber, Optional[frozenset]]] = []
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        # The environment cannot change while the process runs, so it is read once
+        self._environment = self.DEFAULTS.copy()
+        self._load_from_environment(self._environment)
+        self._config = self._load()
         
         # Log configuration (excluding sensitive values)
         self._log_configuration()
     
-    def _load_from_environment(self) -> None:
+    @classmethod
+    def _coerce(cls, key: str, value: Any) -> Any:
+        """
+        Validate a value against the type of its default.
+        
+        Strings, as found in environment variables, are parsed: booleans
+        from true/false, yes/no or 1/0, numbers as usual, and lists and maps
+        as JSON.
+        
+        Args:
+            key: The configuration key
+            value: The raw value
+            
+        Returns:
+            The value converted to the type of the default
+            
+        Raises:
+            ValueError: If the value does not fit the type or is out of range
+        """
+        default = cls.DEFAULTS[key]
+        if isinstance(default, (list, dict)) and isinstance(value, str):
+            value = json.loads(value)
+            
+        if isinstance(default, bool):
+            if isinstance(value, str) and value.strip().lower() in ("true", "yes", "1", "false", "no", "0", ""):
+                value = value.strip().lower() in ("true", "yes", "1")
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be true or false")
+        elif isinstance(default, (int, float)):
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError(f"{key} must be a number")
+            value = int(value) if isinstance(default, int) else float(value)
+            if value < 0:
+                raise ValueError(f"{key} must not be negative")
+        elif isinstance(default, list):
+            if not isinstance(value, list) or not value or not all(isinstance(item, str) for item in value):
+                raise ValueError(f"{key} must be a non-empty list of strings")
+        elif isinstance(default, dict):
+            if not isinstance(value, dict) or not value or not all(isinstance(item, str) for item in value.values()):
+                raise ValueError(f"{key} must be a non-empty map of strings")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif not isinstance(value, str):
+            raise ValueError(f"{key} must be a string")
+            
+        check = cls.VALIDATORS.get(key)
+        if check and not check[0](value):
+            raise ValueError(f"{key} must be {check[1]}")
+        return value
+    
+    def _apply(self, values: Dict[str, Any], raw: Dict[str, Any], source: str) -> None:
+        """
+        Validate raw values into a configuration, keeping the previous value of invalid ones.
+        
+        Args:
+            values: Configuration to update
+            raw: Raw values by key
+            source: Where the values come from, for log messages
+        """
+        for key, value in raw.items():
+            if key not in self.DEFAULTS:
+                logger.warning(f"Ignoring unknown configuration key {key} in {source}")
+                continue
+            try:
+                values[key] = self._coerce(key, value)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Invalid value for {key} in {source}, keeping {values[key]!r}: {e}")
+    
+    def _load(self, strict_file: bool = False) -> Dict[str, Any]:
+        """
+        Build the configuration from all sources.
+        
+        Args:
+            strict_file: Raise if the config file cannot be read instead of skipping it
+            
+        Returns:
+            The complete configuration
+        """
+        values = self._environment.copy()
+        try:
+            self._load_from_file(values)
+        except Exception as e:
+            if strict_file:
+                raise
+            logger.error(f"Error reading config file {values['CONFIG_FILE']}: {e}")
+        self._load_from_secrets(values)
+        return values
+    
+    def _load_from_environment(self, values: Dict[str, Any]) -> None:
         """Load configuration from environment variables."""
-        for key in self._config.keys():
-            env_value = os.environ.get(key)
-            if env_value is not None:
-                # Convert environment variable values to appropriate types
-                if isinstance(self._config[key], bool):
-                    self._config[key] = env_value.lower() in ('true', 'yes', '1')
-                elif isinstance(self._config[key], int):
-                    try:
-                        self._config[key] = int(env_value)
-                    except ValueError:
-                        logger.warning(f"Could not convert {key}={env_value} to int, using default")
-                elif isinstance(self._config[key], float):
-                    try:
-                        self._config[key] = float(env_value)
-                    except ValueError:
-                        logger.warning(f"Could not convert {key}={env_value} to float, using default")
-                else:
-                    self._config[key] = env_value
-    
-    def _load_from_secrets(self) -> None:
+        self._apply(values, {key: os.environ[key] for key in self.DEFAULTS if key in os.environ}, "environment")
+    
+    def _stat_file(self, path: str) -> Optional[Tuple[int, int]]:
+        """Get the modification time and size of the config file, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _load_from_file(self, values: Dict[str, Any]) -> None:
+        """
+        Load configuration from the JSON or TOML file named by CONFIG_FILE.
+        
+        Raises:
+            ValueError: If the file is not a table of settings or TOML is unsupported
+        """
+        path = values["CONFIG_FILE"]
+        self._file_stamp = self._stat_file(path) if path else None
+        if self._file_stamp is None:
+            return
+            
+        text = Path(path).read_text(encoding="utf-8")
+        if path.endswith(".toml"):
+            if tomllib is None:
+                raise ValueError("reading TOML needs Python 3.11 or the tomli package; use a .json file")
+            raw = tomllib.loads(text)
+        else:
+            raw = json.loads(text)
+        if not isinstance(raw, dict):
+            raise ValueError("expected a table of settings")
+        raw.pop("CONFIG_FILE", None)
+        self._apply(values, raw, path)
+    
+    def _load_from_secrets(self, values: Dict[str, Any]) -> None:
         """Load configuration from Docker secrets."""
         secrets_dir = Path('/run/secrets')
         if not secrets_dir.exists():
@@ -76,22 +306,95 @@ class AppConfig:
             'replicate_api_token': 'REPLICATE_API_TOKEN',
             'streamlit_auth_user': 'STREAMLIT_AUTH_USER',
             'streamlit_auth_password': 'STREAMLIT_AUTH_PASSWORD',
+            'auth_session_secret': 'AUTH_SESSION_SECRET',
         }
         
         for secret_file, config_key in secret_mapping.items():
             secret_path = secrets_dir / secret_file
             if secret_path.exists():
                 try:
-                    self._config[config_key] = secret_path.read_text().strip()
+                    values[config_key] = secret_path.read_text().strip()
                     logger.info(f"Loaded configuration for {config_key} from Docker secret")
                 except Exception as e:
                     logger.error(f"Error reading secret {secret_file}: {e}")
     
+    @staticmethod
+    def _mask(values: Dict[str, Any]) -> Dict[str, Any]:
+        """Hide sensitive values for logging."""
+        return {k: '********' if 'TOKEN' in k or 'PASSWORD' in k or 'SECRET' in k else v
+                for k, v in values.items()}
+    
     def _log_configuration(self) -> None:
         """Log the current configuration (excluding sensitive data)."""
-        safe_config = {k: '********' if 'TOKEN' in k or 'PASSWORD' in k else v 
-                       for k, v in self._config.items()}
-        logger.info(f"Application configuration: {safe_config}")
+        logger.info(f"Application configuration: {self._mask(self._config)}")
+    
+    def reload(self) -> Dict[str, Any]:
+        """
+        Re-read all sources and notify subscribers of changed values.
+        
+        If the config file cannot be parsed, for example while it is being
+        written, the current configuration is kept.
+        
+        Returns:
+            The changed keys with their new values
+        """
+        with self._reload_lock:
+            try:
+                values = self._load(strict_file=True)
+            except Exception as e:
+                logger.error(
+                    f"Error reloading config file {self._config['CONFIG_FILE']}, "
+                    f"keeping the current configuration: {e}"
+                )
+                return {}
+            changed = {key: value for key, value in values.items() if self._config.get(key) != value}
+            if not changed:
+                return {}
+            # Readers see either the old or the new configuration, never a mix
+            self._config = values
+            subscribers = list(self._subscribers)
+            
+        logger.info(f"Configuration reloaded: {self._mask(changed)}")
+        for callback, keys in subscribers:
+            relevant = {key: value for key, value in changed.items() if keys is None or key in keys}
+            if relevant:
+                try:
+                    callback(relevant)
+                except Exception as e:
+                    logger.error(f"Error applying configuration change in {callback!r}: {e}")
+        return changed
+    
+    def subscribe(self, callback: Subscriber, keys: Optional[Iterable[str]] = None) -> None:
+        """
+        Get notified when configuration values change.
+        
+        Args:
+            callback: Called from the watcher thread with the changed keys and their new values
+            keys: Keys the callback is interested in, or None for all
+        """
+        with self._reload_lock:
+            self._subscribers.append((callback, frozenset(keys) if keys is not None else None))
+    
+    def watch(self) -> None:
+        """
+        Start the background thread that reloads the config file when it changes.
+        
+        Does nothing if CONFIG_FILE is not set; only the first call starts the thread.
+        """
+        path = self._config["CONFIG_FILE"]
+        with self._reload_lock:
+            if not path or self._watcher is not None:
+                return
+                
+            def run() -> None:
+                while True:
+                    time.sleep(float(self.get("CONFIG_RELOAD_INTERVAL_SECONDS", 2.0)) or 2.0)
+                    if self._stat_file(path) != self._file_stamp:
+                        self.reload()
+                        
+            self._watcher = threading.Thread(target=run, name="config-watcher", daemon=True)
+            self._watcher.start()
+        logger.info(f"Watching {path} for configuration changes")
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -121,6 +424,34 @@ class AppConfig:
         """
         return self._config[key]
     
+    def warm_models(self) -> List[str]:
+        """
+        Get the Ollama models kept loaded ahead of the first request.
+        
+        These are the chatbot's default model and the SLO fallback model.
+        
+        Returns:
+            Model identifiers without duplicates
+        """
+        mapping = self.get("LLM_MODEL_MAPPING")
+        models = [mapping.get(self.get("LLM_DEFAULT_MODEL")) or self.get("LLM_MODEL"), self.get("LLM_FALLBACK_MODEL")]
+        return list(dict.fromkeys(model for model in models if model))
+    
+    def ollama_hosts(self) -> List[str]:
+        """
+        Get the Ollama hosts chat traffic is spread across.
+        
+        Uses the comma-separated OLLAMA_API_HOSTS list if set, otherwise the
+        single OLLAMA_API_HOST.
+        
+        Returns:
+            Host base URLs without trailing slashes or duplicates
+        """
+        hosts = [h.strip() for h in str(self.get("OLLAMA_API_HOSTS") or "").split(",") if h.strip()]
+        if not hosts:
+            hosts = [self.get("OLLAMA_API_HOST") or "http://localhost:11434"]
+        return list(dict.fromkeys(host.rstrip("/") for host in hosts))
+    
     def as_dict(self) -> Dict[str, Any]:
         """
         Get the complete configuration as a dictionary.
@@ -131,5 +462,43 @@ class AppConfig:
         return self._config.copy()
 
 
-# Create a singleton instance
-config = AppConfig()
\ No newline at end of file
+def configure_logging() -> None:
+    """Set up application logging; does nothing if logging is already configured."""
+    logging.basicConfig(encoding="UTF-8", level=logging.INFO)
+
+
+class _LazyConfig:
+    """
+    Stand-in for the AppConfig singleton that loads it on first use.
+    
+    Importing this module stays cheap; the configuration is read, and
+    logging is set up, when a value is first needed.
+    """
+    
+    def __init__(self) -> None:
+        """Initialize the proxy without loading the configuration."""
+        self._instance: Optional[AppConfig] = None
+        self._lock = threading.Lock()
+    
+    def _load(self) -> AppConfig:
+        """Load the configuration once."""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    configure_logging()
+                    instance = AppConfig()
+                    instance.watch()
+                    self._instance = instance
+        return self._instance
+    
+    def __getattr__(self, name: str) -> Any:
+        """Forward attribute access to the loaded configuration."""
+        return getattr(self._load(), name)
+    
+    def __getitem__(self, key: str) -> Any:
+        """Forward dictionary access to the loaded configuration."""
+        return self._load()[key]
+
+
+# Singleton instance, loaded on first use
+config = cast(AppConfig, _LazyConfig())
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Conversation context utilities for the TicketAssist application.
+
+This module keeps the prompt sent to the LLM within a token budget by
+sending only the most recent turns and folding older turns into a rolling
+summary that is generated in the background. The window start only moves
+when the budget is exceeded, so consecutive turns share a prompt prefix.
+"""
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ContextWindow:
+    """
+    Token-budgeted view of a conversation for the LLM prompt.
+    
+    Keeps the most recent messages that fit in the budget and replaces the
+    older ones with a per-conversation summary. Summaries are produced by a
+    background worker, so building the prompt never waits on the LLM.
+    
+    The window start is sticky: it stays put while the prompt fits the
+    budget, and when it has to move it drops enough messages to get under
+    the low-water mark, so the prompt prefix (and Ollama's KV cache for it)
+    stays valid for several turns instead of shifting every turn.
+    
+    Summaries and window starts are kept for the most recently used
+    max_conversations conversations; an evicted conversation simply sends
+    its recent turns without a summary until a new one is made.
+    """
+    
+    # Rough size of a token for English text and per-message chat template overhead
+    CHARS_PER_TOKEN = 4
+    MESSAGE_OVERHEAD_TOKENS = 4
+    
+    def __init__(self, summarizer: Callable[[List[Dict[str, str]], str], str],
+                 token_budget: int = 2048, low_water: float = 0.6, max_conversations: int = 1024) -> None:
+        """
+        Initialize the context window.
+        
+        Args:
+            summarizer: Callable taking the messages to fold and the previous
+                summary text, returning the new summary text
+            token_budget: Maximum estimated prompt tokens, summary included
+            low_water: Fraction of the budget the window shrinks to when it
+                has to move forward
+            max_conversations: Conversations whose summary and window start are kept
+        """
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.low_water = low_water
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cuts: "OrderedDict[str, Tuple[int, Optional[int]]]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-summary")
+    
+    @classmethod
+    def estimate_tokens(cls, message: Dict[str, Any]) -> int:
+        """
+        Estimate the number of prompt tokens used by a message.
+        
+        Args:
+            message: Message dictionary with a "content" key
+            
+        Returns:
+            Estimated token count
+        """
+        return math.ceil(len(cls.prompt_content(message)) / cls.CHARS_PER_TOKEN) + cls.MESSAGE_OVERHEAD_TOKENS
+    
+    @staticmethod
+    def prompt_content(message: Dict[str, Any]) -> str:
+        """
+        Get the text a message contributes to the prompt.
+        
+        Ticket context retrieved for a user turn is stored on the message
+        and sent ahead of the question, so re-sending the turn later yields
+        exactly the same text.
+        
+        Args:
+            message: Message dictionary, optionally with a "ticket_context" key
+            
+        Returns:
+            Prompt text of the message
+        """
+        if message.get("ticket_context"):
+            return f"{message['ticket_context']}\n\nQuestion: {message['content']}"
+        return message["content"]
+    
+    @staticmethod
+    def _fingerprint(message: Dict[str, Any]) -> int:
+        """Identify a message by its role and content."""
+        return hash((message["role"], message["content"]))
+    
+    def _remember(self, entries: "OrderedDict[str, Any]", conversation_id: str, value: Any) -> None:
+        """Store a per-conversation entry, evicting the least recently used. Caller holds the lock."""
+        entries[conversation_id] = value
+        entries.move_to_end(conversation_id)
+        while len(entries) > self.max_conversations:
+            entries.popitem(last=False)
+    
+    def _current_summary(self, conversation_id: str,
+                         messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Get the conversation's summary if it still matches the messages.
+        
+        Args:
+            conversation_id: Conversation the messages belong to
+            messages: Full message list of the conversation
+            
+        Returns:
+            Summary record, or None if there is none or it is stale
+        """
+        with self._lock:
+            summary = self._summaries.get(conversation_id)
+            if summary is None:
+                return None
+            covered = summary["covered"]
+            if covered > len(messages) or self._fingerprint(messages[covered - 1]) != summary["fingerprint"]:
+                # The conversation was cleared or replaced since the summary was made
+                del self._summaries[conversation_id]
+                return None
+            self._summaries.move_to_end(conversation_id)
+            return summary
+    
+    def _schedule_summary(self, conversation_id: str, older: List[Dict[str, Any]],
+                          summary: Optional[Dict[str, Any]]) -> None:
+        """
+        Fold messages that left the window into the summary in the background.
+        
+        Args:
+            conversation_id: Conversation to summarize
+            older: Messages before the window, oldest first
+            summary: Current summary record, if any
+        """
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+            
+        covered = summary["covered"] if summary else 0
+        previous_text = summary["text"] if summary else ""
+        to_fold = [{"role": m["role"], "content": self.prompt_content(m)} for m in older[covered:]]
+        fingerprint = self._fingerprint(older[-1])
+        
+        def run() -> None:
+            try:
+                text = self.summarizer(to_fold, previous_text)
+                with self._lock:
+                    self._remember(self._summaries, conversation_id, {
+                        "text": text,
+                        "covered": len(older),
+                        "fingerprint": fingerprint,
+                    })
+                logger.info(f"Folded {len(to_fold)} messages into summary for conversation {conversation_id}")
+            except Exception as e:
+                logger.error(f"Error summarizing conversation {conversation_id}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(conversation_id)
+                    
+        self._executor.submit(run)
+    
+    def _sticky_cut(self, conversation_id: str, messages: List[Dict[str, Any]],
+                    budget: int) -> Optional[int]:
+        """
+        Get the previous window start if it is still valid and within budget.
+        
+        Args:
+            conversation_id: Conversation the messages belong to
+            messages: Full message list of the conversation
+            budget: Tokens available for the window
+            
+        Returns:
+            The previous window start, or None if the window has to move
+        """
+        with self._lock:
+            previous = self._cuts.get(conversation_id)
+        if previous is None:
+            return None
+        cut, fingerprint = previous
+        if cut > len(messages) or (cut and self._fingerprint(messages[cut - 1]) != fingerprint):
+            return None
+        if sum(self.estimate_tokens(m) for m in messages[cut:]) > budget:
+            return None
+        return cut
+    
+    def build(self, conversation_id: str,
+              messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """
+        Build the prompt messages for the next LLM call.
+        
+        Args:
+            conversation_id: Conversation the messages belong to
+            messages: Full message list of the conversation, oldest first
+            
+        Returns:
+            Tuple of the prompt messages and token statistics for the turn
+        """
+        summary = self._current_summary(conversation_id, messages)
+        summary_message = None
+        summary_tokens = 0
+        if summary:
+            summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary['text']}"
+            }
+            summary_tokens = self.estimate_tokens(summary_message)
+            
+        budget = self.token_budget - summary_tokens
+        cut = self._sticky_cut(conversation_id, messages, budget)
+        if cut is None:
+            # Walk back from the newest message down to the low-water mark;
+            # the latest one is always kept
+            target = int(budget * self.low_water)
+            cut = len(messages)
+            window_tokens = 0
+            while cut > 0:
+                tokens = self.estimate_tokens(messages[cut - 1])
+                if cut < len(messages) and window_tokens + tokens > target:
+                    break
+                window_tokens += tokens
+                cut -= 1
+        window_tokens = sum(self.estimate_tokens(m) for m in messages[cut:])
+        with self._lock:
+            self._remember(self._cuts, conversation_id, (cut, self._fingerprint(messages[cut - 1]) if cut else None))
+            
+        if cut > (summary["covered"] if summary else 0):
+            self._schedule_summary(conversation_id, messages[:cut], summary)
+            
+        prompt = [{"role": m["role"], "content": self.prompt_content(m)} for m in messages[cut:]]
+        if summary_message and cut > 0:
+            prompt.insert(0, summary_message)
+        else:
+            summary_tokens = 0
+            
+        total_tokens = sum(self.estimate_tokens(m) for m in messages)
+        prompt_tokens = window_tokens + summary_tokens
+        stats = {
+            "total_tokens": total_tokens,
+            "prompt_tokens": prompt_tokens,
+            "saved_tokens": max(total_tokens - prompt_tokens, 0),
+            "kept_messages": len(messages) - cut,
+            "summarized_messages": summary["covered"] if summary and cut > 0 else 0,
+        }
+        logger.info(
+            f"Context window for {conversation_id}: kept {stats['kept_messages']}/{len(messages)} messages, "
+            f"~{prompt_tokens} prompt tokens, ~{stats['saved_tokens']} tokens saved"
+        )
+        return prompt, stats
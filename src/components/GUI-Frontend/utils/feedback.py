@@ -0,0 +1,210 @@
+"""
+Feedback utilities for the TicketAssist application.
+
+This module records user feedback on chatbot answers as structured events
+and provides aggregate queries over them.
+"""
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+import itertools
+import json
+import logging
+import sqlite3
+
+from utils.persistence import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackStore:
+    """
+    Store for structured feedback events.
+    
+    Events are written in batches by a write-behind queue into a SQLite
+    table indexed for per-model and per-day aggregation.
+    """
+    
+    # Normalized scores for the streamlit_feedback widgets
+    SCORES = {
+        "😞": 0.0, "🙁": 0.25, "😐": 0.5, "🙂": 0.75, "😀": 1.0,
+        "👎": 0.0, "👍": 1.0,
+    }
+    
+    GROUP_COLUMNS = {"model": "model", "day": "day"}
+    
+    def __init__(self, data_path: str = "data/feedback.sqlite3",
+                 flush_interval: float = 1.0, max_pending: int = 64) -> None:
+        """
+        Initialize the feedback store.
+        
+        Args:
+            data_path: Path to the feedback database
+            flush_interval: Maximum seconds an event stays unwritten
+            max_pending: Number of pending events that triggers an early flush
+        """
+        self.data_path = data_path
+        Path(data_path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_db()
+        self._sequence = itertools.count()
+        self._queue = WriteBehindQueue(
+            "feedback", self._write_batch,
+            flush_interval=flush_interval, max_pending=max_pending
+        )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection to the feedback database.
+        
+        Returns:
+            SQLite connection configured for WAL journaling
+        """
+        conn = sqlite3.connect(self.data_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _init_db(self) -> None:
+        """Create the feedback schema if needed."""
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS feedback_events (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        created_at TEXT NOT NULL,
+                        day TEXT NOT NULL,
+                        user_id TEXT NOT NULL,
+                        conversation_id TEXT NOT NULL,
+                        message_ids TEXT NOT NULL,
+                        score REAL NOT NULL,
+                        text TEXT,
+                        model TEXT NOT NULL,
+                        temperature REAL,
+                        top_p REAL,
+                        num_predict INTEGER,
+                        seed INTEGER
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_model_day ON feedback_events (model, day)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_day ON feedback_events (day)")
+        except Exception as e:
+            logger.error(f"Error initializing feedback store: {e}")
+    
+    @classmethod
+    def normalize_score(cls, score: Any) -> Optional[float]:
+        """
+        Convert a feedback widget score to a value between 0 and 1.
+        
+        Args:
+            score: Emoji returned by the widget, or a number
+            
+        Returns:
+            Normalized score, or None if it is not recognized
+        """
+        if isinstance(score, (int, float)):
+            return min(max(float(score), 0.0), 1.0)
+        return cls.SCORES.get(score)
+    
+    def record(self, user_id: str, conversation_id: str, message_ids: List[Optional[int]],
+               score: Any, text: Optional[str], params: Dict[str, Any]) -> bool:
+        """
+        Queue a feedback event for writing.
+        
+        Args:
+            user_id: User giving the feedback
+            conversation_id: Conversation the rated answer belongs to
+            message_ids: IDs of the rated question and answer
+            score: Widget score (emoji) or a number between 0 and 1
+            text: Optional free-text explanation
+            params: Generation parameters of the answer (model, temperature,
+                top_p, max_length, seed)
+                
+        Returns:
+            True if the event was queued, False if the score is not recognized
+        """
+        normalized = self.normalize_score(score)
+        if normalized is None:
+            logger.warning(f"Ignoring feedback with unknown score {score!r}")
+            return False
+            
+        now = datetime.now()
+        event = (
+            now.isoformat(timespec="seconds"),
+            now.strftime("%Y-%m-%d"),
+            user_id,
+            conversation_id,
+            json.dumps(message_ids),
+            normalized,
+            text or None,
+            params.get("model", ""),
+            params.get("temperature"),
+            params.get("top_p"),
+            params.get("max_length"),
+            params.get("seed"),
+        )
+        self._queue.submit(next(self._sequence), event)
+        return True
+    
+    def _write_batch(self, items: List[Tuple[Hashable, Tuple[Any, ...]]]) -> None:
+        """
+        Write a batch of queued events in one transaction.
+        
+        Args:
+            items: (sequence, event row) pairs from the write-behind queue
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO feedback_events (created_at, day, user_id, conversation_id, message_ids, "
+                "score, text, model, temperature, top_p, num_predict, seed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [event for _, event in items]
+            )
+    
+    def feedback_rate(self, group_by: str = "model", since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate feedback per model or per day.
+        
+        Args:
+            group_by: "model" or "day"
+            since: Earliest day to include (YYYY-MM-DD), or None for all
+            
+        Returns:
+            One dictionary per group with event counts, positive rate and
+            average score
+        """
+        column = self.GROUP_COLUMNS[group_by]
+        query = (
+            f"SELECT {column}, COUNT(*), SUM(score > 0.5), SUM(score < 0.5), AVG(score) "
+            "FROM feedback_events WHERE day >= ? "
+            f"GROUP BY {column} ORDER BY {column}"
+        )
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(query, (since or "",)).fetchall()
+        except Exception as e:
+            logger.error(f"Error querying feedback: {e}")
+            return []
+            
+        return [
+            {
+                group_by: group,
+                "total": total,
+                "positive": positive,
+                "negative": negative,
+                "positive_rate": positive / total if total else 0.0,
+                "avg_score": avg_score,
+            }
+            for group, total, positive, negative, avg_score in rows
+        ]
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get metrics of the feedback write queue.
+        
+        Returns:
+            Dictionary of queue metrics
+        """
+        return self._queue.metrics()
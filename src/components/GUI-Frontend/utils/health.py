@@ -0,0 +1,305 @@
+"""
+Backend health utilities for the TicketAssist application.
+
+This module probes Ollama hosts in the background and keeps a circuit
+breaker per host, so chat requests can check availability without making
+a network call or sleeping on the Streamlit script thread.
+"""
+from typing import Any, Dict, Optional, Set
+import logging
+import threading
+import time
+
+from utils.config import config
+from utils.llm_clients import get_http_session
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with exponential backoff.
+    
+    The breaker opens after a number of consecutive failures and stays open
+    for a backoff period that doubles each time it trips again, up to a
+    maximum. While open, requests are rejected immediately.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 1.0,
+                 max_backoff: float = 60.0) -> None:
+        """
+        Initialize the circuit breaker in the closed state.
+        
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            base_backoff: Seconds the breaker stays open after the first trip
+            max_backoff: Upper bound for the open period
+        """
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """
+        Check whether requests may be sent.
+        
+        Returns:
+            True if the breaker is closed
+        """
+        return self.state == self.CLOSED
+    
+    def retry_in(self) -> float:
+        """
+        Get the remaining open period.
+        
+        Returns:
+            Seconds until the next recovery probe, 0 if the breaker is closed
+        """
+        return max(self.open_until - time.monotonic(), 0.0) if self.state == self.OPEN else 0.0
+    
+    def record_success(self) -> None:
+        """Close the breaker and reset the backoff."""
+        with self._lock:
+            if self.state == self.OPEN:
+                logger.info("Circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trips = 0
+    
+    def record_failure(self) -> None:
+        """Count a failure and open the breaker once the threshold is reached."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.OPEN or self.failures >= self.failure_threshold:
+                backoff = min(self.base_backoff * (2 ** self.trips), self.max_backoff)
+                self.trips += 1
+                self.state = self.OPEN
+                self.open_until = time.monotonic() + backoff
+                logger.warning(f"Circuit breaker open for {backoff:.1f}s after {self.failures} failures")
+
+
+class OllamaHealthMonitor:
+    """
+    Background health monitor for one Ollama host.
+    
+    Probes the host's version endpoint on an interval and feeds the results
+    into a circuit breaker. Each successful probe also refreshes the models
+    the host has loaded, for model-affinity routing. While the breaker is open, probes wait for the
+    backoff period to pass, so a down host is retried with exponential
+    backoff instead of on every chat turn.
+    """
+    
+    def __init__(self, host: str, probe_interval: float = 5.0, timeout: float = 2.0,
+                 failure_threshold: int = 3, max_backoff: float = 60.0) -> None:
+        """
+        Initialize the monitor and start probing.
+        
+        Args:
+            host: Base URL of the Ollama host
+            probe_interval: Seconds between probes while the host is healthy
+            timeout: Timeout of a single probe in seconds
+            failure_threshold: Consecutive failures that open the breaker
+            max_backoff: Upper bound for the breaker's open period
+        """
+        self.host = host.rstrip("/")
+        self.probe_interval = probe_interval
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(
+            failure_threshold=failure_threshold,
+            base_backoff=probe_interval,
+            max_backoff=max_backoff
+        )
+        self.version: Optional[str] = None
+        self.loaded_models: Set[str] = set()
+        self.last_probe = 0.0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ollama-health-{self.host}", daemon=True)
+        self._thread.start()
+    
+    def probe(self) -> bool:
+        """
+        Probe the host once and record the result.
+        
+        Returns:
+            True if the host answered
+        """
+        try:
+            # Looked up here so the requests library is loaded by the probe thread
+            response = get_http_session(self.host).get(f"{self.host}/api/version", timeout=self.timeout)
+            response.raise_for_status()
+            self.version = response.json().get("version")
+            self.last_error = None
+            self.breaker.record_success()
+            self._refresh_loaded_models()
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Ollama health probe failed for {self.host}: {e}")
+            self.breaker.record_failure()
+            return False
+        finally:
+            self.last_probe = time.time()
+    
+    def _refresh_loaded_models(self) -> None:
+        """Fetch the models the host holds in memory, keeping the last list on error."""
+        try:
+            response = get_http_session(self.host).get(f"{self.host}/api/ps", timeout=self.timeout)
+            response.raise_for_status()
+            self.loaded_models = {
+                name for entry in response.json().get("models", [])
+                for name in (entry.get("name"), entry.get("model")) if name
+            }
+        except Exception as e:
+            logger.debug(f"Could not list loaded models on {self.host}: {e}")
+    
+    def has_model_loaded(self, model: str) -> bool:
+        """
+        Check whether the host had a model in memory at the last probe.
+        
+        Args:
+            model: Model name, with or without a tag
+            
+        Returns:
+            True if the model was loaded
+        """
+        loaded = self.loaded_models
+        return model in loaded or (":" not in model and f"{model}:latest" in loaded)
+    
+    def _run(self) -> None:
+        """Probe until stopped, waiting out the breaker's backoff."""
+        while not self._stop.is_set():
+            self.probe()
+            wait = self.breaker.retry_in() or self.probe_interval
+            self._stop.wait(wait)
+    
+    def configure(self, probe_interval: float, timeout: float, failure_threshold: int,
+                  max_backoff: float) -> None:
+        """
+        Change the probe and breaker settings; they apply from the next probe.
+        
+        Args:
+            probe_interval: Seconds between probes while the host is healthy
+            timeout: Timeout of a single probe in seconds
+            failure_threshold: Consecutive failures that open the breaker
+            max_backoff: Upper bound for the breaker's open period
+        """
+        self.probe_interval = probe_interval
+        self.timeout = timeout
+        with self.breaker._lock:
+            self.breaker.failure_threshold = failure_threshold
+            self.breaker.base_backoff = probe_interval
+            self.breaker.max_backoff = max_backoff
+    
+    def stop(self) -> None:
+        """Stop the probe thread."""
+        self._stop.set()
+    
+    def is_available(self) -> bool:
+        """
+        Check the cached health state without any network call.
+        
+        Returns:
+            True if requests may be sent to the host
+        """
+        return self.breaker.allow_request()
+    
+    def record_success(self) -> None:
+        """Record a successful request to the host."""
+        self.breaker.record_success()
+    
+    def record_failure(self) -> None:
+        """Record a request that failed to reach the host."""
+        self.breaker.record_failure()
+    
+    def status(self) -> Dict[str, Any]:
+        """
+        Get the cached health state.
+        
+        Returns:
+            Dictionary with the breaker state and last probe result
+        """
+        return {
+            "host": self.host,
+            "state": self.breaker.state,
+            "retry_in": round(self.breaker.retry_in(), 1),
+            "version": self.version,
+            "loaded_models": sorted(self.loaded_models),
+            "last_probe": self.last_probe,
+            "last_error": self.last_error,
+        }
+
+
+_monitors: Dict[str, OllamaHealthMonitor] = {}
+_monitors_lock = threading.Lock()
+_watching_settings = False
+
+_MONITOR_KEYS = (
+    "OLLAMA_HEALTH_INTERVAL_SECONDS", "OLLAMA_HEALTH_TIMEOUT_SECONDS",
+    "OLLAMA_BREAKER_FAILURE_THRESHOLD", "OLLAMA_BREAKER_MAX_BACKOFF_SECONDS",
+)
+
+
+def _monitor_settings() -> Dict[str, Any]:
+    """Read the probe and breaker settings from the configuration."""
+    return {
+        "probe_interval": float(config.get("OLLAMA_HEALTH_INTERVAL_SECONDS", 5.0)),
+        "timeout": float(config.get("OLLAMA_HEALTH_TIMEOUT_SECONDS", 2.0)),
+        "failure_threshold": int(config.get("OLLAMA_BREAKER_FAILURE_THRESHOLD", 3)),
+        "max_backoff": float(config.get("OLLAMA_BREAKER_MAX_BACKOFF_SECONDS", 60.0)),
+    }
+
+
+def _reconfigure_monitors(changed: Dict[str, Any]) -> None:
+    """Apply reconfigured probe and breaker settings to every running monitor."""
+    with _monitors_lock:
+        monitors = list(_monitors.values())
+    for monitor in monitors:
+        monitor.configure(**_monitor_settings())
+
+
+def get_health_monitor(host: str) -> OllamaHealthMonitor:
+    """
+    Get the process-wide health monitor for a host, starting it if needed.
+    
+    The monitor picks up reconfigured probe and breaker settings.
+    
+    Args:
+        host: Base URL of the Ollama host
+        
+    Returns:
+        The shared health monitor for the host
+    """
+    global _watching_settings
+    key = host.rstrip("/")
+    with _monitors_lock:
+        if key not in _monitors:
+            if not _watching_settings:
+                config.subscribe(_reconfigure_monitors, _MONITOR_KEYS)
+                _watching_settings = True
+            _monitors[key] = OllamaHealthMonitor(key, **_monitor_settings())
+        return _monitors[key]
+
+
+def remove_health_monitor(host: str) -> None:
+    """
+    Stop probing a host that is no longer routed to.
+    
+    A later get_health_monitor for the host starts a fresh monitor.
+    
+    Args:
+        host: Base URL of the Ollama host
+    """
+    with _monitors_lock:
+        monitor = _monitors.pop(host.rstrip("/"), None)
+    if monitor is not None:
+        monitor.stop()
+        logger.info(f"Stopped health monitor for {monitor.host}")
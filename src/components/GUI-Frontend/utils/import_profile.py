@@ -0,0 +1,162 @@
+"""
+Import-time profiling for the TicketAssist application.
+
+Set TICKETASSIST_IMPORT_PROFILE=1 to record how long every module imported
+after startup takes to load, with its own time separated from the time of
+the modules it imports in turn. The results are logged once the entry
+script has finished its imports, and shown in the chatbot's debug sidebar.
+
+Cold-start cost of individual modules can also be measured in a fresh
+interpreter with:
+
+    python -m utils.import_profile utils.chat pages.ticket
+"""
+from typing import Any, Dict, List, Optional
+import importlib
+import importlib.abc
+import logging
+import os
+import sys
+import threading
+import time
+
+from utils.config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR = "TICKETASSIST_IMPORT_PROFILE"
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Meta path finder that times module execution.
+    
+    It finds nothing itself: it asks the other finders for the module spec
+    and wraps the spec's loader so executing the module is timed. Time
+    spent importing nested modules is subtracted to get each module's self
+    time.
+    """
+    
+    def __init__(self) -> None:
+        """Initialize an empty timer."""
+        self.records: Dict[str, Dict[str, float]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        """Find the module with the other finders and time its loader."""
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+            
+        # Only per-module loaders (source and extension files) can be wrapped safely;
+        # built-in, frozen and zip importers are shared between modules
+        loader = spec.loader
+        if getattr(loader, "name", None) != fullname or not hasattr(loader, "exec_module"):
+            return spec
+        exec_module = loader.exec_module
+        
+        def timed_exec_module(module: Any) -> None:
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.records[fullname] = {"total": elapsed, "self": elapsed - nested}
+                    
+        loader.exec_module = timed_exec_module
+        return spec
+    
+    def report(self, top: int = 25) -> List[Dict[str, Any]]:
+        """
+        Get the slowest imports.
+        
+        Args:
+            top: Maximum number of modules to return
+            
+        Returns:
+            Rows with module name, self and cumulative milliseconds, slowest first
+        """
+        with self._lock:
+            records = list(self.records.items())
+        records.sort(key=lambda item: item[1]["self"], reverse=True)
+        return [
+            {
+                "module": name,
+                "self_ms": round(times["self"] * 1000, 1),
+                "total_ms": round(times["total"] * 1000, 1),
+            }
+            for name, times in records[:top]
+        ]
+
+
+_timer: Optional[ImportTimer] = None
+_reported = 0
+
+
+def install_from_env() -> Optional[ImportTimer]:
+    """
+    Start profiling imports if TICKETASSIST_IMPORT_PROFILE is set.
+    
+    Safe to call from every entry script; only the first call installs the timer.
+    
+    Returns:
+        The active timer, or None if profiling is off
+    """
+    global _timer
+    if _timer is None and os.environ.get(ENV_VAR, "").lower() in ("true", "yes", "1"):
+        _timer = ImportTimer()
+        sys.meta_path.insert(0, _timer)
+    return _timer
+
+
+def report(top: int = 25) -> List[Dict[str, Any]]:
+    """
+    Get the slowest imports recorded so far.
+    
+    Args:
+        top: Maximum number of modules to return
+        
+    Returns:
+        Rows with module name, self and cumulative milliseconds, empty if profiling is off
+    """
+    return _timer.report(top) if _timer else []
+
+
+def log_report(top: int = 25) -> None:
+    """
+    Log the slowest imports if modules were imported since the last report.
+    
+    Args:
+        top: Maximum number of modules to log
+    """
+    global _reported
+    if _timer is None or len(_timer.records) == _reported:
+        return
+    _reported = len(_timer.records)
+    configure_logging()
+    lines = [f"{row['self_ms']:>9.1f} {row['total_ms']:>9.1f}  {row['module']}" for row in report(top)]
+    logger.info("Slowest imports (self ms, total ms):\n" + "\n".join(lines))
+
+
+if __name__ == "__main__":
+    os.environ[ENV_VAR] = "1"
+    install_from_env()
+    start = time.perf_counter()
+    for name in sys.argv[1:] or ["utils.chat"]:
+        importlib.import_module(name)
+    print(f"Imported {', '.join(sys.argv[1:]) or 'utils.chat'} in {(time.perf_counter() - start) * 1000:.1f}ms")
+    print(f"{'self ms':>9} {'total ms':>9}  module")
+    for row in report(40):
+        print(f"{row['self_ms']:>9.1f} {row['total_ms']:>9.1f}  {row['module']}")
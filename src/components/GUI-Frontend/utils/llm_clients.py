@@ -0,0 +1,183 @@
+"""
+LLM client registry for the TicketAssist application.
+
+This module keeps one keep-alive HTTP client per Ollama host for the whole
+process, so every session reuses pooled connections instead of opening new
+ones per turn or configuring the host through environment variables.
+
+The client libraries are imported when the first client is created, so
+importing this module does not slow down page start-up. When the pool or
+timeout settings change, new clients are built and the old ones are closed
+once the requests still using them have had time to finish.
+"""
+from typing import TYPE_CHECKING, Any, Dict, List
+import asyncio
+import logging
+import threading
+
+from utils.config import config
+
+if TYPE_CHECKING:
+    import ollama
+    import requests
+
+logger = logging.getLogger(__name__)
+
+_ollama_clients: Dict[str, "ollama.Client"] = {}
+_async_ollama_clients: Dict[str, "ollama.AsyncClient"] = {}
+_http_sessions: Dict[str, "requests.Session"] = {}
+_registry_lock = threading.Lock()
+_watching_settings = False
+
+_CLIENT_KEYS = ("OLLAMA_POOL_SIZE", "OLLAMA_CONNECT_TIMEOUT_SECONDS", "OLLAMA_REQUEST_TIMEOUT_SECONDS")
+
+
+def _retire_grace() -> float:
+    """Seconds retired clients stay open: twice the request timeout, so running requests can finish."""
+    return 2 * float(config.get("OLLAMA_REQUEST_TIMEOUT_SECONDS", 300.0))
+
+
+def _close_clients(clients: List["ollama.Client"], async_clients: List["ollama.AsyncClient"],
+                   sessions: List["requests.Session"]) -> None:
+    """Close retired clients and their connection pools."""
+    closers = [client._client.close for client in clients] + [session.close for session in sessions]
+    if async_clients:
+        # Async clients own connections on the shared event loop and must be closed there
+        from utils.async_stream import get_event_loop
+        
+        loop = get_event_loop()
+        closers += [
+            lambda client=client: asyncio.run_coroutine_threadsafe(client._client.aclose(), loop).result(timeout=10)
+            for client in async_clients
+        ]
+    for close in closers:
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"Error closing a retired Ollama client: {e}")
+    logger.info(f"Closed {len(closers)} retired Ollama clients")
+
+
+def _reset_clients(changed: Dict[str, Any]) -> None:
+    """
+    Drop the cached clients so the next request builds them with the new pool and timeout settings.
+    
+    Requests already running keep the client they started with; the old
+    clients are closed after a grace period instead of leaking their sockets.
+    """
+    with _registry_lock:
+        retired = (
+            list(_ollama_clients.values()),
+            list(_async_ollama_clients.values()),
+            list(_http_sessions.values()),
+        )
+        _ollama_clients.clear()
+        _async_ollama_clients.clear()
+        _http_sessions.clear()
+    logger.info(f"Recreating Ollama clients after configuration change: {sorted(changed)}")
+    if any(retired):
+        timer = threading.Timer(_retire_grace(), _close_clients, retired)
+        timer.daemon = True
+        timer.start()
+
+
+def _watch_settings() -> None:
+    """Subscribe to pool and timeout changes when the first client is created. Caller holds the lock."""
+    global _watching_settings
+    if not _watching_settings:
+        config.subscribe(_reset_clients, _CLIENT_KEYS)
+        _watching_settings = True
+
+
+def _normalize_host(host: str) -> str:
+    """Strip trailing slashes so equivalent host URLs share a client."""
+    return host.rstrip("/")
+
+
+def _client_options() -> Dict[str, Any]:
+    """Build the httpx timeout and pool settings shared by Ollama clients."""
+    import httpx
+    
+    pool_size = int(config.get("OLLAMA_POOL_SIZE", 10))
+    return {
+        "timeout": httpx.Timeout(
+            float(config.get("OLLAMA_REQUEST_TIMEOUT_SECONDS", 300.0)),
+            connect=float(config.get("OLLAMA_CONNECT_TIMEOUT_SECONDS", 5.0))
+        ),
+        "limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    }
+
+
+def get_ollama_client(host: str) -> "ollama.Client":
+    """
+    Get the shared Ollama client for a host.
+    
+    The client's connection pool size and timeouts come from the
+    OLLAMA_POOL_SIZE, OLLAMA_CONNECT_TIMEOUT_SECONDS and
+    OLLAMA_REQUEST_TIMEOUT_SECONDS settings.
+    
+    Args:
+        host: Base URL of the Ollama host
+        
+    Returns:
+        The process-wide client for the host
+    """
+    key = _normalize_host(host)
+    with _registry_lock:
+        if key not in _ollama_clients:
+            import ollama
+            
+            _watch_settings()
+            _ollama_clients[key] = ollama.Client(host=key, **_client_options())
+            logger.info(f"Created Ollama client for {key} (pool size {config.get('OLLAMA_POOL_SIZE', 10)})")
+        return _ollama_clients[key]
+
+
+def get_async_ollama_client(host: str) -> "ollama.AsyncClient":
+    """
+    Get the shared async Ollama client for a host.
+    
+    The client must only be used on the event loop from
+    utils.async_stream.get_event_loop, which owns its connections.
+    
+    Args:
+        host: Base URL of the Ollama host
+        
+    Returns:
+        The process-wide async client for the host
+    """
+    key = _normalize_host(host)
+    with _registry_lock:
+        if key not in _async_ollama_clients:
+            import ollama
+            
+            _watch_settings()
+            _async_ollama_clients[key] = ollama.AsyncClient(host=key, **_client_options())
+            logger.info(f"Created async Ollama client for {key}")
+        return _async_ollama_clients[key]
+
+
+def get_http_session(host: str) -> "requests.Session":
+    """
+    Get the shared keep-alive HTTP session for plain requests to a host.
+    
+    Args:
+        host: Base URL of the Ollama host
+        
+    Returns:
+        The process-wide session for the host
+    """
+    key = _normalize_host(host)
+    with _registry_lock:
+        if key not in _http_sessions:
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            _watch_settings()
+            pool_size = int(config.get("OLLAMA_POOL_SIZE", 10))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_sessions[key] = session
+        return _http_sessions[key]
@@ -0,0 +1,287 @@
+"""
+LLM performance metrics for the TicketAssist application.
+
+This module aggregates per-request statistics from Ollama's final stream
+chunk together with client-side timings (time to first token, queue wait)
+and exposes them per model as a Prometheus text file, an optional
+Prometheus HTTP endpoint, and a summary table for the debug sidebar.
+"""
+from typing import Any, Deque, Dict, List, Optional
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import logging
+import math
+import os
+import threading
+import time
+
+from utils.config import config
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "ticketassist_llm"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Get a percentile using the nearest-rank method.
+    
+    Args:
+        values: Sample values
+        fraction: Percentile as a fraction, e.g. 0.95
+        
+    Returns:
+        The percentile, or 0.0 without samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class LlmMetrics:
+    """
+    Per-model aggregation of LLM request metrics.
+    
+    Totals are kept as monotonically increasing counters; latency
+    percentiles are computed over a sliding window of recent requests.
+    """
+    
+    QUANTILES = (0.5, 0.95)
+    
+    def __init__(self, window: int = 1000) -> None:
+        """
+        Initialize empty metrics.
+        
+        Args:
+            window: Recent requests per model kept for percentiles
+        """
+        self.window = window
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._ttft: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._queue_wait: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._context: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+    
+    def record(self, model: str, ttft: Optional[float], queue_wait: float,
+               final: Optional[Dict[str, Any]]) -> None:
+        """
+        Record a completed request.
+        
+        Args:
+            model: Model that answered
+            ttft: Seconds from sending the request to the first token
+            queue_wait: Seconds the request waited for a scheduler slot
+            final: Final stream chunk with Ollama's counts and durations (ns)
+        """
+        final = final or {}
+        with self._lock:
+            counters = self._counters[model]
+            counters["requests"] += 1
+            counters["eval_tokens"] += final.get("eval_count") or 0
+            counters["eval_seconds"] += (final.get("eval_duration") or 0) / 1e9
+            counters["prompt_eval_tokens"] += final.get("prompt_eval_count") or 0
+            counters["prompt_eval_seconds"] += (final.get("prompt_eval_duration") or 0) / 1e9
+            counters["load_seconds"] += (final.get("load_duration") or 0) / 1e9
+            counters["total_seconds"] += (final.get("total_duration") or 0) / 1e9
+            counters["queue_wait_seconds"] += queue_wait
+            counters["queue_wait_count"] += 1
+            if ttft is not None:
+                counters["ttft_seconds"] += ttft
+                counters["ttft_count"] += 1
+                self._ttft[model].append(ttft)
+            self._queue_wait[model].append(queue_wait)
+    
+    def record_error(self, model: str) -> None:
+        """
+        Record a request that failed.
+        
+        Args:
+            model: Model the request was for
+        """
+        with self._lock:
+            self._counters[model]["errors"] += 1
+    
+    def record_context(self, stats: Dict[str, int]) -> None:
+        """
+        Record how much a chat prompt was trimmed to fit its token budget.
+        
+        Args:
+            stats: Token statistics returned by ContextWindow.build
+        """
+        with self._lock:
+            self._context["prompts"] += 1
+            for key in ("total_tokens", "prompt_tokens", "saved_tokens", "summarized_messages"):
+                self._context[key] += stats.get(key, 0)
+    
+    def context_summary(self) -> Dict[str, Any]:
+        """
+        Get the context window totals for display.
+        
+        Returns:
+            Prompts built, estimated tokens before and after trimming, and tokens saved
+        """
+        with self._lock:
+            totals = {key: int(value) for key, value in self._context.items()}
+        totals["saved_fraction"] = round(totals["saved_tokens"] / totals["total_tokens"], 3) \
+            if totals.get("total_tokens") else 0.0
+        return totals
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Get a per-model summary for display.
+        
+        Returns:
+            One row per model with request counts, tokens/sec and latency percentiles
+        """
+        rows = []
+        with self._lock:
+            for model, counters in sorted(self._counters.items()):
+                ttft = list(self._ttft[model])
+                queue_wait = list(self._queue_wait[model])
+                rows.append({
+                    "model": model,
+                    "requests": int(counters["requests"]),
+                    "errors": int(counters["errors"]),
+                    "tokens_per_second": round(
+                        counters["eval_tokens"] / counters["eval_seconds"], 1
+                    ) if counters["eval_seconds"] else 0.0,
+                    "prefill_tokens_per_second": round(
+                        counters["prompt_eval_tokens"] / counters["prompt_eval_seconds"], 1
+                    ) if counters["prompt_eval_seconds"] else 0.0,
+                    "ttft_p50_s": round(percentile(ttft, 0.5), 3),
+                    "ttft_p95_s": round(percentile(ttft, 0.95), 3),
+                    "queue_wait_p95_s": round(percentile(queue_wait, 0.95), 3),
+                    "avg_load_s": round(counters["load_seconds"] / counters["requests"], 3)
+                    if counters["requests"] else 0.0,
+                })
+        return rows
+    
+    def prometheus_text(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        
+        Returns:
+            Metrics text ending with a newline
+        """
+        counters_help = {
+            "requests": ("requests_total", "Completed LLM requests"),
+            "errors": ("errors_total", "Failed LLM requests"),
+            "eval_tokens": ("eval_tokens_total", "Generated tokens"),
+            "eval_seconds": ("eval_seconds_total", "Time spent generating tokens"),
+            "prompt_eval_tokens": ("prompt_eval_tokens_total", "Prompt tokens evaluated"),
+            "prompt_eval_seconds": ("prompt_eval_seconds_total", "Time spent evaluating prompts"),
+            "load_seconds": ("load_seconds_total", "Time spent loading models"),
+            "total_seconds": ("request_seconds_total", "Server-side request time"),
+        }
+        lines = []
+        with self._lock:
+            models = sorted(self._counters)
+            for key, (name, help_text) in counters_help.items():
+                lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {_PREFIX}_{name} counter")
+                for model in models:
+                    lines.append(f'{_PREFIX}_{name}{{model="{model}"}} {self._counters[model][key]:g}')
+                    
+            # Quantiles cover the recent window; sum and count are cumulative
+            for name, samples, help_text in (
+                ("ttft_seconds", self._ttft, "Time to first token"),
+                ("queue_wait_seconds", self._queue_wait, "Time spent waiting for a scheduler slot"),
+            ):
+                lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {_PREFIX}_{name} summary")
+                for model in models:
+                    values = list(samples[model])
+                    for quantile in self.QUANTILES:
+                        lines.append(
+                            f'{_PREFIX}_{name}{{model="{model}",quantile="{quantile}"}} '
+                            f"{percentile(values, quantile):g}"
+                        )
+                    counters = self._counters[model]
+                    lines.append(f'{_PREFIX}_{name}_sum{{model="{model}"}} {counters[name]:g}')
+                    lines.append(f'{_PREFIX}_{name}_count{{model="{model}"}} {counters[name.replace("seconds", "count")]:g}')
+                    
+            # Context window counters are estimates from the app, not per model
+            for key, name, help_text in (
+                ("prompts", "context_prompts_total", "Chat prompts built by the context window"),
+                ("total_tokens", "context_tokens_total", "Estimated conversation tokens before trimming"),
+                ("prompt_tokens", "context_prompt_tokens_total", "Estimated prompt tokens sent after trimming"),
+                ("saved_tokens", "context_saved_tokens_total", "Estimated tokens saved by the context window"),
+            ):
+                lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {_PREFIX}_{name} counter")
+                lines.append(f"{_PREFIX}_{name} {self._context[key]:g}")
+        return "\n".join(lines) + "\n"
+    
+    def write_textfile(self, path: str) -> None:
+        """
+        Atomically write the Prometheus text to a file, e.g. for the
+        node_exporter textfile collector.
+        
+        Args:
+            path: Destination file path
+        """
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_suffix(target.suffix + ".tmp")
+        temp.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(temp, target)
+
+
+def _start_exporters(metrics: LlmMetrics) -> None:
+    """Start the configured text file writer and HTTP endpoint."""
+    path = config.get("LLM_METRICS_PATH")
+    if path:
+        interval = float(config.get("LLM_METRICS_INTERVAL_SECONDS", 15.0))
+        
+        def write_loop() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    metrics.write_textfile(path)
+                except Exception as e:
+                    logger.error(f"Error writing LLM metrics to {path}: {e}")
+                    
+        threading.Thread(target=write_loop, name="llm-metrics-writer", daemon=True).start()
+        
+    port = int(config.get("LLM_METRICS_PORT", 0))
+    if port:
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+                
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError as e:
+            logger.error(f"Could not serve LLM metrics on port {port}: {e}")
+            return
+        threading.Thread(target=server.serve_forever, name="llm-metrics-http", daemon=True).start()
+        logger.info(f"Serving LLM metrics on port {port}")
+
+
+_llm_metrics: Optional[LlmMetrics] = None
+_llm_metrics_lock = threading.Lock()
+
+
+def get_llm_metrics() -> LlmMetrics:
+    """
+    Get the process-wide LLM metrics, starting the exporters on first use.
+    
+    Returns:
+        The shared metrics registry
+    """
+    global _llm_metrics
+    with _llm_metrics_lock:
+        if _llm_metrics is None:
+            _llm_metrics = LlmMetrics(window=int(config.get("LLM_METRICS_WINDOW", 1000)))
+            _start_exporters(_llm_metrics)
+        return _llm_metrics
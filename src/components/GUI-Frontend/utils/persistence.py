@@ -0,0 +1,182 @@
+"""
+Persistence utilities for the TicketAssist application.
+
+This module provides a write-behind queue that takes storage writes off the
+Streamlit script thread and batches them in a background thread.
+"""
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Write-behind queue drained by a background thread.
+    
+    Pending writes are coalesced by key, so only the latest payload for a key
+    is written. The queue flushes every flush interval, or sooner once enough
+    keys are pending, and drains at interpreter shutdown. A crash loses at
+    most one flush interval of writes. After a failed flush the thread backs
+    off, doubling its wait up to max_retry_interval, so a storage error that
+    persists is not retried in a busy loop.
+    """
+    
+    def __init__(self, name: str, flush_fn: Callable[[List[Tuple[Hashable, Any]]], None],
+                 flush_interval: float = 1.0, max_pending: int = 64,
+                 max_retry_interval: float = 30.0) -> None:
+        """
+        Initialize the queue and start its flush thread.
+        
+        Args:
+            name: Name used for the thread and in log messages
+            flush_fn: Callable writing a batch of (key, payload) pairs
+            flush_interval: Maximum seconds a write stays pending
+            max_pending: Number of pending keys that triggers an early flush
+            max_retry_interval: Longest wait between retries after failed flushes
+        """
+        self.name = name
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retry_interval = max_retry_interval
+        
+        self._pending: Dict[Hashable, Any] = {}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._metrics = {
+            "submitted": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "items_written": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+        
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, key: Hashable, payload: Any) -> None:
+        """
+        Queue a write, replacing any pending write with the same key.
+        
+        Args:
+            key: Coalescing key, e.g. the conversation being saved
+            payload: Data handed to the flush function
+        """
+        with self._condition:
+            closed = self._closed
+            if not closed:
+                if key in self._pending:
+                    self._metrics["coalesced"] += 1
+                self._pending[key] = payload
+                self._metrics["submitted"] += 1
+                if len(self._pending) >= self.max_pending:
+                    self._condition.notify()
+        if closed:
+            # Late writes after shutdown are written inline
+            try:
+                self.flush_fn([(key, payload)])
+            except Exception as e:
+                with self._condition:
+                    self._metrics["errors"] += 1
+                logger.error(f"Error writing to closed {self.name} write-behind queue: {e}")
+    
+    def discard(self, key: Hashable) -> None:
+        """
+        Drop a pending write and wait for any flush in progress to finish.
+        
+        Args:
+            key: Coalescing key of the write to drop
+        """
+        with self._condition:
+            self._pending.pop(key, None)
+        with self._flush_lock:
+            pass
+    
+    def flush(self) -> bool:
+        """
+        Write all pending items now.
+        
+        Returns:
+            False if the write failed and the items were requeued
+        """
+        with self._flush_lock:
+            with self._condition:
+                items = list(self._pending.items())
+                self._pending.clear()
+            if not items:
+                return True
+                
+            start = time.perf_counter()
+            success = True
+            try:
+                self.flush_fn(items)
+                self._metrics["items_written"] += len(items)
+            except Exception as e:
+                success = False
+                self._metrics["errors"] += 1
+                logger.error(f"Error flushing {self.name} write-behind queue: {e}")
+                # Requeue items that were not superseded while flushing
+                with self._condition:
+                    for key, payload in items:
+                        self._pending.setdefault(key, payload)
+                        
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._metrics["flushes"] += 1
+            self._metrics["last_flush_ms"] = elapsed_ms
+            self._metrics["total_flush_ms"] += elapsed_ms
+            self._metrics["max_flush_ms"] = max(self._metrics["max_flush_ms"], elapsed_ms)
+            logger.debug(f"Flushed {len(items)} items from {self.name} queue in {elapsed_ms:.1f} ms")
+            return success
+    
+    def _run(self) -> None:
+        """Flush pending writes until the queue is closed."""
+        retry_delay = 0.0
+        while True:
+            with self._condition:
+                if retry_delay:
+                    # Back off after a failure even if the queue is full
+                    deadline = time.monotonic() + retry_delay
+                    while not self._closed and time.monotonic() < deadline:
+                        self._condition.wait(deadline - time.monotonic())
+                elif not self._closed and len(self._pending) < self.max_pending:
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            if self.flush():
+                retry_delay = 0.0
+            else:
+                retry_delay = min(max(retry_delay * 2, self.flush_interval), self.max_retry_interval)
+            if closed:
+                return
+    
+    def close(self) -> None:
+        """Stop the flush thread after draining all pending writes."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=max(self.flush_interval * 5, 5.0))
+        self.flush()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get queue depth and flush latency metrics.
+        
+        Returns:
+            Dictionary of queue metrics
+        """
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics["queue_depth"] = len(self._pending)
+        flushes = metrics["flushes"]
+        metrics["avg_flush_ms"] = metrics["total_flush_ms"] / flushes if flushes else 0.0
+        return metrics
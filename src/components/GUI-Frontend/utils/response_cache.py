@@ -0,0 +1,291 @@
+"""
+Response cache for the TicketAssist chatbot.
+
+This module caches LLM responses for deterministic generation settings,
+keyed by the model, sampling options and a normalized message history. A
+size-bounded in-memory LRU sits in front of a persistent SQLite tier.
+"""
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from utils.config import config
+from utils.persistence import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses with TTL expiry.
+    
+    Lookups check the in-memory LRU first and fall back to the on-disk tier,
+    promoting disk hits into memory. Disk writes go through a write-behind
+    queue so storing a response never blocks the chat turn.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0,
+                 data_path: Optional[str] = "data/response_cache.sqlite3",
+                 disk_max_entries: int = 10000) -> None:
+        """
+        Initialize the response cache.
+        
+        Args:
+            max_entries: Maximum number of responses held in memory
+            ttl_seconds: Seconds a cached response stays valid
+            data_path: Path to the persistent tier, or None for memory only
+            disk_max_entries: Maximum number of responses kept on disk
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.data_path = data_path
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._queue: Optional[WriteBehindQueue] = None
+        
+        if data_path:
+            Path(data_path).parent.mkdir(parents=True, exist_ok=True)
+            self._init_db()
+            self._queue = WriteBehindQueue("response_cache", self._write_batch)
+    
+    @staticmethod
+    def is_cacheable(options: Dict[str, Any]) -> bool:
+        """
+        Check whether generation options produce repeatable output.
+        
+        Args:
+            options: Ollama sampling options
+            
+        Returns:
+            True for a fixed seed or greedy (zero temperature) decoding
+        """
+        return options.get("seed") is not None or float(options.get("temperature", 1.0)) == 0.0
+    
+    @staticmethod
+    def make_key(model: str, options: Dict[str, Any], messages: List[Dict[str, Any]]) -> str:
+        """
+        Build the cache key for a request.
+        
+        Message content is normalized by collapsing whitespace, and user
+        messages are case-folded, so trivially different prompts share a key.
+        
+        Args:
+            model: Model name
+            options: Sampling options (temperature, top_p, num_predict, seed)
+            messages: Prompt messages sent to the model
+            
+        Returns:
+            Hex digest identifying the request
+        """
+        normalized = []
+        for message in messages:
+            content = " ".join(message["content"].split())
+            if message["role"] == "user":
+                content = content.casefold()
+            normalized.append([message["role"], content])
+            
+        payload = {
+            "model": model,
+            "temperature": options.get("temperature"),
+            "top_p": options.get("top_p"),
+            "num_predict": options.get("num_predict"),
+            "seed": options.get("seed"),
+            "messages": normalized,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def replay(response: str) -> Iterator[str]:
+        """
+        Replay a cached response as a token stream.
+        
+        Args:
+            response: Cached response text
+            
+        Yields:
+            Word-sized chunks of the response, whitespace included
+        """
+        for match in re.finditer(r"\s*\S+\s*", response):
+            yield match.group(0)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection to the persistent tier.
+        
+        Returns:
+            SQLite connection configured for WAL journaling
+        """
+        conn = sqlite3.connect(self.data_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _init_db(self) -> None:
+        """Create the cache table and drop expired entries."""
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at)")
+                conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        except Exception as e:
+            logger.error(f"Error initializing response cache: {e}")
+    
+    def _write_batch(self, items: List[Tuple[Hashable, Tuple[str, float]]]) -> None:
+        """
+        Write queued responses to disk and trim the oldest entries.
+        
+        Args:
+            items: (key, (response, created_at)) pairs from the write-behind queue
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                [(key, response, created_at) for key, (response, created_at) in items]
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY created_at DESC LIMIT ?)",
+                (self.disk_max_entries,)
+            )
+    
+    def _remember(self, key: str, created_at: float, response: str) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._metrics["evictions"] += 1
+    
+    def resize(self, max_entries: int, ttl_seconds: float, disk_max_entries: int) -> None:
+        """
+        Change the cache limits; the memory tier is trimmed right away, the disk tier on its next write.
+        
+        Args:
+            max_entries: Maximum number of responses held in memory
+            ttl_seconds: Seconds a cached response stays valid
+            disk_max_entries: Maximum number of responses kept on disk
+        """
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl_seconds = ttl_seconds
+            self.disk_max_entries = disk_max_entries
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._metrics["evictions"] += 1
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Cache key from make_key
+            
+        Returns:
+            The cached response, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._metrics["memory_hits"] += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+                
+        row = None
+        if self.data_path:
+            try:
+                with closing(self._connect()) as conn:
+                    row = conn.execute(
+                        "SELECT response, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                        (key, now - self.ttl_seconds)
+                    ).fetchone()
+            except Exception as e:
+                logger.error(f"Error reading response cache: {e}")
+                
+        with self._lock:
+            if row is None:
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["disk_hits"] += 1
+            self._remember(key, row[1], row[0])
+            return row[0]
+    
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a response in both tiers.
+        
+        Args:
+            key: Cache key from make_key
+            response: Complete response text
+        """
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, response)
+            self._metrics["stores"] += 1
+        if self._queue:
+            self._queue.submit(key, (response, created_at))
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get hit-rate metrics.
+        
+        Returns:
+            Dictionary of hit, miss and eviction counts with the hit rate
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["memory_entries"] = len(self._memory)
+        lookups = metrics["memory_hits"] + metrics["disk_hits"] + metrics["misses"]
+        metrics["hit_rate"] = (metrics["memory_hits"] + metrics["disk_hits"]) / lookups if lookups else 0.0
+        return metrics
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+_LIMIT_KEYS = ("LLM_CACHE_MAX_ENTRIES", "LLM_CACHE_TTL_SECONDS", "LLM_CACHE_DISK_MAX_ENTRIES")
+
+
+def _cache_limits() -> Dict[str, Any]:
+    """Read the cache limits from the configuration."""
+    return {
+        "max_entries": int(config.get("LLM_CACHE_MAX_ENTRIES", 512)),
+        "ttl_seconds": float(config.get("LLM_CACHE_TTL_SECONDS", 3600.0)),
+        "disk_max_entries": int(config.get("LLM_CACHE_DISK_MAX_ENTRIES", 10000)),
+    }
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache, resized when its limits are reconfigured.
+    
+    Returns:
+        The shared response cache
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            cache = ResponseCache(data_path=config.get("LLM_CACHE_PATH") or None, **_cache_limits())
+            config.subscribe(lambda changed: cache.resize(**_cache_limits()), _LIMIT_KEYS)
+            _response_cache = cache
+        return _response_cache
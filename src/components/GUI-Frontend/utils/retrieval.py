@@ -0,0 +1,303 @@
+"""
+Ticket retrieval for the TicketAssist chatbot.
+
+This module ranks tickets against the user's question with BM25 and packs
+the best matches into a context block for the LLM, so answers are
+grounded in the ticket data instead of whatever the user pastes in.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import Counter, defaultdict
+import logging
+import math
+import re
+import threading
+import time
+
+from utils.context import ContextWindow
+from utils.ticket import TicketStore
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can for from has have how i in is it its of on or "
+    "that the this to was we what when where which why will with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+    
+    Args:
+        text: Text to tokenize
+        
+    Returns:
+        Alphanumeric terms without stopwords
+    """
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if term not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Incrementally updatable Okapi BM25 index.
+    
+    Documents can be added and removed one at a time; the inverted index
+    and length statistics are updated in place, so a changed dataset does
+    not require a full rebuild.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        """
+        Initialize an empty index.
+        
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+    
+    def __len__(self) -> int:
+        """Return the number of indexed documents."""
+        return len(self._doc_lengths)
+    
+    def __contains__(self, doc_id: str) -> bool:
+        """Check whether a document is indexed."""
+        return doc_id in self._doc_lengths
+    
+    def add(self, doc_id: str, text: str) -> None:
+        """
+        Index a document, replacing any previous version.
+        
+        Args:
+            doc_id: Document identifier
+            text: Document text
+        """
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self._postings[term][doc_id] = count
+        self._doc_terms[doc_id] = terms
+        self._doc_lengths[doc_id] = sum(terms.values())
+        self._total_length += self._doc_lengths[doc_id]
+    
+    def remove(self, doc_id: str) -> None:
+        """
+        Drop a document from the index if present.
+        
+        Args:
+            doc_id: Document identifier
+        """
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+    
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Rank documents against a query.
+        
+        Args:
+            query: Free-text query
+            top_k: Maximum number of results
+            
+        Returns:
+            (doc_id, score) pairs with a positive score, best first
+        """
+        count = len(self._doc_lengths)
+        if not count:
+            return []
+        avg_length = self._total_length / count
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class TicketRetriever:
+    """
+    BM25 retrieval over the shared ticket store.
+    
+    The index covers each ticket's title, description, comments and answer.
+    It is built on first use and brought up to date whenever the store
+    publishes a new version, re-indexing only tickets that were added,
+    changed or removed.
+    """
+    
+    def __init__(self, store: TicketStore, top_k: int = 3, token_budget: int = 512) -> None:
+        """
+        Initialize the retriever.
+        
+        Args:
+            store: Ticket store to index
+            top_k: Maximum number of tickets packed into the context
+            token_budget: Maximum estimated tokens of the context message
+        """
+        self.store = store
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.index = BM25Index()
+        self._tickets: Dict[str, Dict[str, Any]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def document_text(ticket: Dict[str, Any]) -> str:
+        """
+        Get the searchable text of a ticket.
+        
+        Args:
+            ticket: Ticket dictionary
+            
+        Returns:
+            Key, title, description, comments and answer fields joined
+        """
+        answer = ticket.get("Answer") or {}
+        parts = [ticket["key"], ticket["title"], ticket.get("description") or ""]
+        parts.extend(comment["content"] for comment in ticket.get("comments", []))
+        parts.extend(str(answer.get(field) or "") for field in (
+            "summary_of_analysis", "answer_text", "answer_category", "planned_release"
+        ))
+        return "\n".join(parts)
+    
+    def _sync(self) -> None:
+        """Re-index tickets that changed since the last seen store version. Caller holds the lock."""
+        version = self.store.version
+        if version == self._version:
+            return
+        start = time.perf_counter()
+        current = {ticket["key"]: ticket for ticket in self.store.slice(len(self.store))}
+        removed = [key for key in self._tickets if key not in current]
+        for key in removed:
+            self.index.remove(key)
+            del self._tickets[key]
+        updated = 0
+        for key, ticket in current.items():
+            previous = self._tickets.get(key)
+            if previous is not None and previous["last_updated"] == ticket["last_updated"]:
+                continue
+            self.index.add(key, self.document_text(ticket))
+            self._tickets[key] = ticket
+            updated += 1
+        self._version = version
+        logger.info(
+            f"Ticket index at version {version}: {updated} indexed, {len(removed)} removed, "
+            f"{len(self.index)} total in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+    
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Find the tickets most relevant to a query.
+        
+        Args:
+            query: The user's question
+            top_k: Maximum number of results, defaults to the configured value
+            
+        Returns:
+            (ticket, score) pairs, best first
+        """
+        with self._lock:
+            self._sync()
+            hits = self.index.search(query, top_k or self.top_k)
+            return [(self._tickets[key], score) for key, score in hits]
+    
+    @staticmethod
+    def format_ticket(ticket: Dict[str, Any]) -> str:
+        """
+        Format a ticket as a prompt snippet.
+        
+        Args:
+            ticket: Ticket dictionary
+            
+        Returns:
+            Snippet with the ticket's header, description, comments and answer
+        """
+        answer = ticket.get("Answer") or {}
+        lines = [
+            f"[{ticket['key']}] {ticket['title']} "
+            f"({ticket['status_name']}, {ticket['priority_name']}, {ticket['project_name']})"
+        ]
+        if ticket.get("description"):
+            lines.append(f"Description: {ticket['description']}")
+        if ticket.get("comments"):
+            lines.append("Comments: " + " | ".join(comment["content"] for comment in ticket["comments"]))
+        if answer:
+            lines.append(
+                f"Answer ({answer.get('answer_category')}, release {answer.get('planned_release')}): "
+                f"{answer.get('summary_of_analysis')} {answer.get('answer_text')}"
+            )
+        return "\n".join(lines)
+    
+    def _pack(self, snippets: Iterable[str], budget: int) -> List[str]:
+        """
+        Fit snippets into a token budget, truncating the last one that fits partially.
+        
+        Args:
+            snippets: Snippets in relevance order
+            budget: Estimated tokens available for the snippets
+            
+        Returns:
+            Snippets that fit the budget
+        """
+        packed = []
+        remaining = budget
+        for snippet in snippets:
+            tokens = ContextWindow.estimate_tokens({"content": snippet})
+            if tokens <= remaining:
+                packed.append(snippet)
+                remaining -= tokens
+                continue
+            chars = (remaining - ContextWindow.MESSAGE_OVERHEAD_TOKENS) * ContextWindow.CHARS_PER_TOKEN
+            if chars > 80:
+                packed.append(snippet[:chars].rsplit(" ", 1)[0] + " ...")
+            break
+        return packed
+    
+    def build_context(self, query: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Build the retrieval context for a user question.
+        
+        The context is meant to be stored on the user message it was
+        retrieved for, so the prompt prefix of later turns never changes.
+        
+        Args:
+            query: The user's question
+            
+        Returns:
+            Tuple of the packed ticket snippets (None if no ticket matched)
+            and retrieval statistics for the turn
+        """
+        start = time.perf_counter()
+        hits = self.search(query)
+        header = "Relevant tickets:"
+        budget = self.token_budget - ContextWindow.estimate_tokens({"content": header})
+        packed = self._pack((self.format_ticket(ticket) for ticket, _ in hits), budget)
+        context = "\n\n".join([header] + packed) if packed else None
+        
+        stats = {
+            "tickets": [ticket["key"] for ticket, _ in hits[:len(packed)]],
+            "scores": [round(score, 2) for _, score in hits[:len(packed)]],
+            "context_tokens": ContextWindow.estimate_tokens({"content": context}) if context else 0,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        logger.info(
+            f"Retrieved {len(stats['tickets'])} tickets ({', '.join(stats['tickets']) or 'none'}), "
+            f"~{stats['context_tokens']} tokens in {stats['latency_ms']}ms"
+        )
+        return context, stats
@@ -0,0 +1,167 @@
+"""
+Host routing for the TicketAssist application.
+
+This module spreads LLM requests across the configured Ollama hosts. Each
+request goes to a healthy host that already has the model loaded, picking
+the one with the fewest outstanding requests.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+import itertools
+import logging
+import threading
+
+from utils.config import config
+from utils.health import get_health_monitor, remove_health_monitor
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaRouter:
+    """
+    Least-outstanding-requests router with health and model affinity.
+    
+    Hosts whose circuit breaker is open are skipped. Among the rest, hosts
+    with the requested model loaded win over hosts that would have to load
+    it first, then the host with the fewest in-flight requests is chosen.
+    Ties rotate so equally loaded hosts share the traffic.
+    """
+    
+    def __init__(self, hosts: List[str]) -> None:
+        """
+        Initialize the router.
+        
+        Args:
+            hosts: Base URLs of the Ollama hosts
+        """
+        self.hosts = [host.rstrip("/") for host in hosts]
+        self._outstanding = {host: 0 for host in self.hosts}
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+        
+        # Start probing every host right away so routing has fresh state
+        for host in self.hosts:
+            get_health_monitor(host)
+    
+    def set_hosts(self, hosts: List[str]) -> None:
+        """
+        Replace the hosts requests are routed to.
+        
+        Hosts that stay keep their outstanding counts. Requests still running
+        on a removed host are released normally but it is not chosen again,
+        and its health monitor is stopped.
+        
+        Args:
+            hosts: Base URLs of the Ollama hosts
+        """
+        hosts = [host.rstrip("/") for host in hosts]
+        for host in hosts:
+            get_health_monitor(host)
+        with self._lock:
+            removed = [host for host in self.hosts if host not in hosts]
+            self._outstanding = {host: self._outstanding.get(host, 0) for host in hosts}
+            self.hosts = hosts
+        for host in removed:
+            remove_health_monitor(host)
+    
+    def choose(self, model: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        Pick a host for a request and count it as outstanding there.
+        
+        Every host returned must be handed back to release.
+        
+        Args:
+            model: Model the request needs
+            exclude: Hosts already tried for this request
+            
+        Returns:
+            The chosen host, or None if no healthy host is left
+        """
+        excluded = set(exclude)
+        hosts = self.hosts
+        monitors = {
+            host: get_health_monitor(host) for host in hosts
+            if host not in excluded
+        }
+        candidates = [host for host, monitor in monitors.items() if monitor.is_available()]
+        
+        with self._lock:
+            # The host list may have been replaced while the monitors were checked
+            candidates = [host for host in candidates if host in self._outstanding]
+            if not candidates:
+                return None
+            offset = next(self._rotation)
+            host = min(
+                candidates,
+                key=lambda h: (
+                    not monitors[h].has_model_loaded(model),
+                    self._outstanding[h],
+                    (hosts.index(h) - offset) % len(hosts)
+                )
+            )
+            self._outstanding[host] += 1
+        return host
+    
+    def release(self, host: str) -> None:
+        """
+        Mark a request on a host as finished.
+        
+        Args:
+            host: Host returned by choose
+        """
+        with self._lock:
+            if host in self._outstanding:
+                self._outstanding[host] = max(self._outstanding[host] - 1, 0)
+    
+    def retry_in(self) -> float:
+        """
+        Get the time until the first unavailable host is probed again.
+        
+        Returns:
+            Seconds until a host may become available, 0 if one already is
+        """
+        return min(get_health_monitor(host).breaker.retry_in() for host in self.hosts)
+    
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Get the routing state of every host.
+        
+        Returns:
+            Health status of each host with its outstanding request count
+        """
+        with self._lock:
+            hosts = self.hosts
+            outstanding = dict(self._outstanding)
+        return [
+            {**get_health_monitor(host).status(), "outstanding": outstanding[host]}
+            for host in hosts
+        ]
+
+
+_HOST_KEYS = ("OLLAMA_API_HOSTS", "OLLAMA_API_HOST")
+
+_router: Optional[OllamaRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> OllamaRouter:
+    """
+    Get the process-wide router over the configured Ollama hosts.
+    
+    The host list follows configuration changes.
+    
+    Returns:
+        The shared router
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            router = OllamaRouter(config.ollama_hosts())
+            logger.info(f"Routing LLM requests across {len(router.hosts)} Ollama host(s)")
+            
+            def update_hosts(changed: Dict[str, Any]) -> None:
+                router.set_hosts(config.ollama_hosts())
+                logger.info(f"Routing LLM requests across {len(router.hosts)} Ollama host(s)")
+                
+            config.subscribe(update_hosts, _HOST_KEYS)
+            _router = router
+        return _router
@@ -0,0 +1,328 @@
+"""
+Request scheduling for the TicketAssist application.
+
+This module admits LLM requests to the shared Ollama backend. At most
+OLLAMA_NUM_PARALLEL generations per host run at once; waiting requests are
+queued per user and granted round-robin across users, so one user's long
+generations cannot starve everyone else. Background work (rolling
+summaries, model warm-up, the ticket summary job) queues behind chat.
+
+The scheduler lives in one process. When several app processes share the
+same Ollama hosts, set LLM_SCHEDULER_PROCESSES so the limit is divided
+between them instead of multiplied.
+"""
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from utils.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a request arrives while the scheduler queue is full."""
+
+
+class QueuedRequest:
+    """A request waiting for, or holding, a generation slot."""
+    
+    def __init__(self, user_id: str, low_priority: bool = False) -> None:
+        """
+        Initialize the request.
+        
+        Args:
+            user_id: User the request belongs to
+            low_priority: Whether the request is background work
+        """
+        self.user_id = user_id
+        self.low_priority = low_priority
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.released = False
+    
+    @property
+    def granted(self) -> bool:
+        """Whether the request holds a slot."""
+        return self.granted_at is not None
+    
+    @property
+    def wait_seconds(self) -> float:
+        """Seconds spent in the queue so far, or until the slot was granted."""
+        return (self.granted_at or time.monotonic()) - self.enqueued_at
+
+
+class FairScheduler:
+    """
+    Concurrency limiter with per-user fair queuing.
+    
+    Requests get a slot right away while fewer than max_concurrent are
+    running. Otherwise they wait in their user's queue, and freed slots go
+    to users in round-robin order. New requests are rejected with
+    QueueFullError once max_queue requests are waiting.
+    
+    Low-priority requests wait in their own queue, are only granted while
+    no user is waiting, and never take the last free slot, so background
+    work cannot hold up interactive requests.
+    """
+    
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 32) -> None:
+        """
+        Initialize the scheduler.
+        
+        Args:
+            max_concurrent: Generations allowed to run at once
+            max_queue: Waiting requests allowed before new ones are rejected
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self._queues: "OrderedDict[str, Deque[QueuedRequest]]" = OrderedDict()
+        self._background: Deque[QueuedRequest] = deque()
+        self._active = 0
+        self._active_background = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._metrics = {
+            "granted": 0,
+            "rejected": 0,
+            "abandoned": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+    
+    def _grant(self, request: QueuedRequest) -> None:
+        """Give a slot to a request. Caller holds the lock."""
+        request.granted_at = time.monotonic()
+        self._active += 1
+        if request.low_priority:
+            self._active_background += 1
+        self._metrics["granted"] += 1
+        self._metrics["total_wait_seconds"] += request.wait_seconds
+        self._metrics["max_wait_seconds"] = max(self._metrics["max_wait_seconds"], request.wait_seconds)
+    
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting users in round-robin order. Caller holds the lock."""
+        granted = False
+        while self._active < self.max_concurrent and self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            self._grant(queue.popleft())
+            self._waiting -= 1
+            granted = True
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+        while self._background and not self._queues and self._background_may_start():
+            self._grant(self._background.popleft())
+            granted = True
+        if granted:
+            self._condition.notify_all()
+    
+    def _background_may_start(self) -> bool:
+        """Whether a low-priority request may take a slot. Caller holds the lock."""
+        reserved = 1 if self.max_concurrent > 1 else 0
+        return self._active < self.max_concurrent and self._active_background < self.max_concurrent - reserved
+    
+    def resize(self, max_concurrent: int, max_queue: int) -> None:
+        """
+        Change the limits while requests are running.
+        
+        A higher concurrency limit grants waiting requests right away; a lower
+        one takes effect as running generations finish.
+        
+        Args:
+            max_concurrent: Generations allowed to run at once
+            max_queue: Waiting requests allowed before new ones are rejected
+        """
+        with self._condition:
+            self.max_concurrent = max(1, max_concurrent)
+            self.max_queue = max_queue
+            self._dispatch()
+        logger.info(f"Scheduler limits changed to {self.max_concurrent} running, {self.max_queue} waiting")
+    
+    def submit(self, user_id: str, low_priority: bool = False) -> QueuedRequest:
+        """
+        Ask for a generation slot.
+        
+        Args:
+            user_id: User the request belongs to
+            low_priority: Queue as background work behind all users
+            
+        Returns:
+            The queued request, already granted if a slot was free
+            
+        Raises:
+            QueueFullError: If max_queue requests are already waiting
+        """
+        request = QueuedRequest(user_id, low_priority)
+        with self._condition:
+            if low_priority:
+                # Background work is bounded by its callers and never rejected
+                self._background.append(request)
+                self._dispatch()
+                return request
+            if self._active < self.max_concurrent and not self._queues:
+                self._grant(request)
+                return request
+            if self._waiting >= self.max_queue:
+                self._metrics["rejected"] += 1
+                logger.warning(f"Rejected request from {user_id}: {self._waiting} requests waiting")
+                raise QueueFullError(f"{self._waiting} requests are already waiting")
+            self._queues.setdefault(user_id, deque()).append(request)
+            self._waiting += 1
+            self._dispatch()
+        return request
+    
+    def position(self, request: QueuedRequest) -> int:
+        """
+        Get the position of a request in the round-robin order.
+        
+        Args:
+            request: Request from submit
+            
+        Returns:
+            1 for the next request to run, 0 if it already holds a slot
+        """
+        with self._condition:
+            if request.granted or request.released:
+                return 0
+            if request.low_priority:
+                return self._waiting + list(self._background).index(request) + 1
+            queues = [list(queue) for queue in self._queues.values()]
+            position = 0
+            for depth in range(max(len(queue) for queue in queues)):
+                for queue in queues:
+                    if depth < len(queue):
+                        position += 1
+                        if queue[depth] is request:
+                            return position
+            return 0
+    
+    def wait(self, request: QueuedRequest, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a request to be granted a slot.
+        
+        Args:
+            request: Request from submit
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+            
+        Returns:
+            True if the request holds a slot
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: request.granted, timeout)
+    
+    def release(self, request: QueuedRequest) -> None:
+        """
+        Free a request's slot, or withdraw it from the queue if still waiting.
+        
+        Args:
+            request: Request from submit
+        """
+        with self._condition:
+            if request.released:
+                return
+            request.released = True
+            if request.granted:
+                self._active -= 1
+                if request.low_priority:
+                    self._active_background -= 1
+            elif request.low_priority:
+                self._background.remove(request)
+            else:
+                queue = self._queues.get(request.user_id)
+                if queue and request in queue:
+                    queue.remove(request)
+                    self._waiting -= 1
+                    self._metrics["abandoned"] += 1
+                    if not queue:
+                        del self._queues[request.user_id]
+            self._dispatch()
+    
+    @contextmanager
+    def slot(self, user_id: str, on_wait: Optional[Callable[[int], None]] = None,
+             poll_interval: float = 0.5, low_priority: bool = False) -> Iterator[QueuedRequest]:
+        """
+        Hold a generation slot for the duration of a with block.
+        
+        Args:
+            user_id: User the request belongs to
+            on_wait: Called with the queue position while the request waits
+            poll_interval: Seconds between on_wait calls
+            low_priority: Queue as background work behind all users
+            
+        Yields:
+            The granted request
+            
+        Raises:
+            QueueFullError: If max_queue requests are already waiting
+        """
+        request = self.submit(user_id, low_priority)
+        try:
+            while not self.wait(request, poll_interval):
+                if on_wait:
+                    on_wait(self.position(request))
+            yield request
+        finally:
+            self.release(request)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get scheduler metrics.
+        
+        Returns:
+            Dictionary with active and waiting counts, rejections and wait times
+        """
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics["active"] = self._active
+            metrics["waiting"] = self._waiting
+            metrics["waiting_users"] = len(self._queues)
+            metrics["active_background"] = self._active_background
+            metrics["waiting_background"] = len(self._background)
+            metrics["max_concurrent"] = self.max_concurrent
+            metrics["max_queue"] = self.max_queue
+        metrics["avg_wait_seconds"] = metrics["total_wait_seconds"] / metrics["granted"] if metrics["granted"] else 0.0
+        return metrics
+
+
+_scheduler: Optional[FairScheduler] = None
+_scheduler_lock = threading.Lock()
+
+_LIMIT_KEYS = (
+    "OLLAMA_NUM_PARALLEL", "LLM_QUEUE_MAX_LENGTH", "LLM_SCHEDULER_PROCESSES",
+    "OLLAMA_API_HOSTS", "OLLAMA_API_HOST",
+)
+
+
+def _scheduler_limits() -> Dict[str, int]:
+    """Read the scheduler limits from the configuration."""
+    # OLLAMA_NUM_PARALLEL is per host and shared by all app processes
+    capacity = int(config.get("OLLAMA_NUM_PARALLEL", 4)) * len(config.ollama_hosts())
+    processes = max(1, int(config.get("LLM_SCHEDULER_PROCESSES", 1)))
+    return {
+        "max_concurrent": max(1, capacity // processes),
+        "max_queue": int(config.get("LLM_QUEUE_MAX_LENGTH", 32)),
+    }
+
+
+def get_scheduler() -> FairScheduler:
+    """
+    Get the process-wide request scheduler for the Ollama backend.
+    
+    Chat sessions and background jobs share it. Its limits follow
+    configuration changes.
+    
+    Returns:
+        The shared scheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            scheduler = FairScheduler(**_scheduler_limits())
+            config.subscribe(lambda changed: scheduler.resize(**_scheduler_limits()), _LIMIT_KEYS)
+            _scheduler = scheduler
+        return _scheduler
@@ -0,0 +1,249 @@
+"""
+Shared ticket dataset for the TicketAssist application.
+
+When several Streamlit processes serve the app, this module lets them share
+one copy of the ticket data. A process publishes the dataset as a
+memory-mapped file (in /dev/shm when available); every process maps it
+read-only, so the tickets live once in the page cache instead of once per
+process, and a ticket is only decoded when it is first sliced. Decoded
+tickets are kept in a small per-process LRU, so pages that are shown
+again are not decoded again.
+
+Each published version is a separate immutable file. A small pointer file
+names the current one and is replaced atomically, so a reload never
+disturbs workers still reading the previous version; they switch on their
+next refresh.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; publishing is then not serialized between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"TKTSHM01"
+_HEADER = struct.Struct("<8sQ")
+_POINTER_FILE = "current.json"
+
+
+class SharedTicketDataset:
+    """
+    Read-only view of a ticket dataset published to a shared directory.
+    
+    The data file holds a header, a table of byte offsets and the tickets
+    as concatenated JSON documents. The offset table is read in place from
+    the mapping, so attaching costs no copies regardless of the dataset
+    size.
+    """
+    
+    def __init__(self, directory: str, refresh_interval: float = 1.0,
+                 decode_cache_size: int = 4096) -> None:
+        """
+        Initialize the view without attaching to a dataset yet.
+        
+        Args:
+            directory: Directory the dataset is published in
+            refresh_interval: Minimum seconds between checks for a newer version
+            decode_cache_size: Decoded tickets kept for reuse by later slices
+        """
+        self.directory = Path(directory)
+        self.refresh_interval = refresh_interval
+        self.decode_cache_size = decode_cache_size
+        self.version = 0
+        # (version, mapping, offset table) of the attached version, swapped as one reference
+        self._view: Optional[Tuple[int, mmap.mmap, memoryview]] = None
+        # Decoded tickets by (version, index), least recently used first
+        self._decoded: "OrderedDict[Tuple[int, int], Dict[str, Any]]" = OrderedDict()
+        self._decoded_lock = threading.Lock()
+        self._pointer_mtime = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    @contextmanager
+    def _publish_lock(self) -> Iterator[None]:
+        """Serialize publishers across processes."""
+        with open(self.directory / "publish.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _read_pointer(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the pointer to the current version.
+        
+        Returns:
+            Dictionary with the version and data file name, or None if nothing is published
+        """
+        try:
+            return json.loads((self.directory / _POINTER_FILE).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+    
+    def publish(self, tickets: List[Dict[str, Any]]) -> int:
+        """
+        Publish tickets as a new version and attach to it.
+        
+        Args:
+            tickets: Ticket dictionaries in display order
+            
+        Returns:
+            The published version number
+        """
+        with self._publish_lock():
+            version = self._write_version(tickets)
+        self.refresh(force=True)
+        return version
+    
+    def attach_or_publish(self, build: Callable[[], List[Dict[str, Any]]]) -> int:
+        """
+        Attach to the current version, publishing one first if none exists.
+        
+        Only the first process to get here builds the dataset; processes
+        starting at the same time wait for it and attach.
+        
+        Args:
+            build: Callable returning the tickets to publish
+            
+        Returns:
+            The attached version number
+        """
+        if not self.refresh(force=True):
+            with self._publish_lock():
+                if self._read_pointer() is None:
+                    self._write_version(build())
+            self.refresh(force=True)
+        return self.version
+    
+    def _write_version(self, tickets: List[Dict[str, Any]]) -> int:
+        """Write tickets as the next version and make it current. Caller holds the publish lock."""
+        documents = [json.dumps(ticket, separators=(",", ":")).encode("utf-8") for ticket in tickets]
+        offsets = array("Q", [0])
+        for document in documents:
+            offsets.append(offsets[-1] + len(document))
+            
+        pointer = self._read_pointer()
+        version = (pointer["version"] if pointer else 0) + 1
+        name = f"tickets-{version}.bin"
+        temp = self.directory / f"{name}.tmp"
+        with open(temp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(documents)))
+            f.write(offsets.tobytes())
+            f.write(b"".join(documents))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.directory / name)
+        
+        # Switching the pointer is the atomic step that makes the version current
+        temp_pointer = self.directory / f"{_POINTER_FILE}.tmp"
+        temp_pointer.write_text(json.dumps({"version": version, "file": name}), encoding="utf-8")
+        os.replace(temp_pointer, self.directory / _POINTER_FILE)
+        
+        # Keep the previous version for workers that read the old pointer a moment ago;
+        # mapped files stay readable after removal
+        for old in self.directory.glob("tickets-*.bin"):
+            old_version = int(old.stem.split("-", 1)[1])
+            if old_version < version - 1:
+                old.unlink(missing_ok=True)
+                
+        logger.info(f"Published {len(documents)} tickets as shared dataset version {version}")
+        return version
+    
+    def _attach(self, pointer: Dict[str, Any]) -> None:
+        """Map a published version read-only and make it current. Caller holds the lock."""
+        with open(self.directory / pointer["file"], "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(mapping, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{pointer['file']} is not a ticket dataset")
+        table = memoryview(mapping)[_HEADER.size:_HEADER.size + 8 * (count + 1)].cast("Q")
+        # Readers holding the previous view keep it mapped until they finish
+        self._view = (pointer["version"], mapping, table)
+        self.version = pointer["version"]
+        with self._decoded_lock:
+            self._decoded.clear()
+        logger.info(f"Attached to shared ticket dataset version {self.version} ({count} tickets)")
+    
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Switch to the newest published version if it changed.
+        
+        Args:
+            force: Check now instead of waiting for the refresh interval
+            
+        Returns:
+            True if a dataset is attached
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._view is not None and now - self._checked_at < self.refresh_interval:
+                return True
+            self._checked_at = now
+            try:
+                mtime = (self.directory / _POINTER_FILE).stat().st_mtime_ns
+                if force or mtime != self._pointer_mtime or self._view is None:
+                    pointer = self._read_pointer()
+                    if pointer and pointer["version"] != self.version:
+                        self._attach(pointer)
+                    self._pointer_mtime = mtime
+            except FileNotFoundError:
+                # Nothing published yet, or the pointer moved on while attaching; retry next time
+                pass
+            except Exception as e:
+                logger.error(f"Error attaching to shared ticket dataset: {e}")
+            return self._view is not None
+    
+    def __len__(self) -> int:
+        """Return the number of tickets in the attached version."""
+        self.refresh()
+        view = self._view
+        return len(view[2]) - 1 if view else 0
+    
+    def slice(self, count: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Decode a page of tickets from the attached version.
+        
+        Args:
+            count: Maximum number of tickets to return
+            offset: Index of the first ticket to return
+            
+        Returns:
+            Ticket dictionaries, shared with later slices and not to be mutated
+        """
+        self.refresh()
+        view = self._view
+        if view is None:
+            return []
+        version, mapping, table = view
+        data_start = _HEADER.size + table.nbytes
+        end = min(offset + count, len(table) - 1)
+        tickets = []
+        with self._decoded_lock:
+            for i in range(offset, end):
+                ticket = self._decoded.get((version, i))
+                if ticket is None:
+                    ticket = json.loads(mapping[data_start + table[i]:data_start + table[i + 1]])
+                    self._decoded[(version, i)] = ticket
+                    if len(self._decoded) > self.decode_cache_size:
+                        self._decoded.popitem(last=False)
+                else:
+                    self._decoded.move_to_end((version, i))
+                tickets.append(ticket)
+        return tickets
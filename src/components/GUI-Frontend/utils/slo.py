@@ -0,0 +1,248 @@
+"""
+Latency SLO policy for the TicketAssist application.
+
+This module watches time to first token and scheduler queue wait per model
+and downgrades new requests to a smaller fallback model while the chosen
+model misses its latency targets. A quick answer from a small model beats
+a long wait for a large one.
+"""
+from typing import Any, Deque, Dict, List, Optional
+from collections import deque
+import logging
+import threading
+import time
+
+from utils.config import config
+from utils.metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class _ModelState:
+    """Recent measurements and degradation state of one model."""
+    
+    def __init__(self, window: int) -> None:
+        self.ttft: Deque[float] = deque(maxlen=window)
+        self.queue_wait: Deque[float] = deque(maxlen=window)
+        self.degraded = False
+        self.retry_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.downgraded = 0
+
+
+class SloPolicy:
+    """
+    Per-model latency SLO with automatic fallback.
+    
+    A model is degraded once the chosen percentile of its recent TTFT or
+    queue wait exceeds the target. While degraded, requests for it go to
+    the fallback model. After a recovery period a single probe request is
+    let through to the model; if it meets both targets the model recovers,
+    otherwise it stays degraded for another period.
+    """
+    
+    def __init__(self, ttft_target: float = 5.0, queue_wait_target: float = 10.0,
+                 window: int = 20, min_samples: int = 5, quantile: float = 0.9,
+                 recovery_seconds: float = 60.0) -> None:
+        """
+        Initialize the policy.
+        
+        Args:
+            ttft_target: Target time to first token in seconds
+            queue_wait_target: Target scheduler queue wait in seconds
+            window: Recent requests per model the percentiles cover
+            min_samples: Requests needed before a model can be degraded
+            quantile: Percentile compared with the targets, e.g. 0.9
+            recovery_seconds: Time a degraded model gets before the next probe
+        """
+        self.ttft_target = ttft_target
+        self.queue_wait_target = queue_wait_target
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self.quantile = quantile
+        self.recovery_seconds = recovery_seconds
+        self._states: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+    
+    def configure(self, ttft_target: float, queue_wait_target: float, window: int,
+                  min_samples: int, quantile: float, recovery_seconds: float) -> None:
+        """
+        Change the targets and windows; recent measurements are kept.
+        
+        Args:
+            ttft_target: Target time to first token in seconds
+            queue_wait_target: Target scheduler queue wait in seconds
+            window: Recent requests per model the percentiles cover
+            min_samples: Requests needed before a model can be degraded
+            quantile: Percentile compared with the targets, e.g. 0.9
+            recovery_seconds: Time a degraded model gets before the next probe
+        """
+        with self._lock:
+            self.ttft_target = ttft_target
+            self.queue_wait_target = queue_wait_target
+            self.min_samples = max(1, min_samples)
+            self.quantile = quantile
+            self.recovery_seconds = recovery_seconds
+            if window != self.window:
+                self.window = window
+                for state in self._states.values():
+                    state.ttft = deque(state.ttft, maxlen=window)
+                    state.queue_wait = deque(state.queue_wait, maxlen=window)
+    
+    def _state(self, model: str) -> _ModelState:
+        """Get the state of a model, creating it on first use. Caller holds the lock."""
+        if model not in self._states:
+            self._states[model] = _ModelState(self.window)
+        return self._states[model]
+    
+    def route(self, model: str, fallback: Optional[str]) -> str:
+        """
+        Pick the model a new request should use.
+        
+        Args:
+            model: Model the user chose
+            fallback: Smaller model to use while the chosen one misses its SLO
+            
+        Returns:
+            The chosen model, or the fallback while the chosen model is degraded
+        """
+        if not fallback or fallback == model:
+            return model
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            if not state.degraded:
+                return model
+            # An abandoned probe never reports back, so it expires after a recovery period
+            probe_stale = state.probe_started is not None and now - state.probe_started > self.recovery_seconds
+            if now >= state.retry_at and (state.probe_started is None or probe_stale):
+                state.probe_started = now
+                logger.info(f"Probing {model} to see whether it meets its latency SLO again")
+                return model
+            state.downgraded += 1
+            return fallback
+    
+    def is_degraded(self, model: str) -> bool:
+        """
+        Check whether a model currently misses its SLO, without routing a request.
+        
+        Args:
+            model: Model name
+            
+        Returns:
+            True while new requests for the model may go to the fallback
+        """
+        with self._lock:
+            state = self._states.get(model)
+            return bool(state and state.degraded)
+    
+    def record(self, model: str, ttft: Optional[float], queue_wait: float) -> None:
+        """
+        Record the latency of a completed request.
+        
+        Args:
+            model: Model that answered
+            ttft: Seconds from sending the request to the first token
+            queue_wait: Seconds the request waited for a scheduler slot
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            if state.degraded:
+                if state.probe_started is None:
+                    return
+                state.probe_started = None
+                if (ttft or 0.0) <= self.ttft_target and queue_wait <= self.queue_wait_target:
+                    state.degraded = False
+                    state.ttft.clear()
+                    state.queue_wait.clear()
+                    logger.info(f"{model} meets its latency SLO again (TTFT {ttft or 0.0:.2f}s)")
+                else:
+                    state.retry_at = now + self.recovery_seconds
+                return
+                
+            if ttft is not None:
+                state.ttft.append(ttft)
+            state.queue_wait.append(queue_wait)
+            if len(state.queue_wait) < self.min_samples:
+                return
+            ttft_p = percentile(list(state.ttft), self.quantile)
+            queue_wait_p = percentile(list(state.queue_wait), self.quantile)
+            if ttft_p > self.ttft_target or queue_wait_p > self.queue_wait_target:
+                state.degraded = True
+                state.retry_at = now + self.recovery_seconds
+                logger.warning(
+                    f"{model} misses its latency SLO (p{self.quantile * 100:g} TTFT {ttft_p:.2f}s, "
+                    f"queue wait {queue_wait_p:.2f}s); downgrading new requests"
+                )
+    
+    def record_error(self, model: str) -> None:
+        """
+        Record a failed request, which ends a pending probe unsuccessfully.
+        
+        Args:
+            model: Model the request was for
+        """
+        with self._lock:
+            state = self._state(model)
+            if state.degraded and state.probe_started is not None:
+                state.probe_started = None
+                state.retry_at = time.monotonic() + self.recovery_seconds
+    
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Get the SLO state of every model seen so far.
+        
+        Returns:
+            One row per model with its percentiles, degradation state and downgrade count
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model": model,
+                    "degraded": state.degraded,
+                    "ttft_p_s": round(percentile(list(state.ttft), self.quantile), 3),
+                    "queue_wait_p_s": round(percentile(list(state.queue_wait), self.quantile), 3),
+                    "probe_in_s": round(max(state.retry_at - now, 0.0), 1) if state.degraded else 0.0,
+                    "downgraded": state.downgraded,
+                }
+                for model, state in sorted(self._states.items())
+            ]
+
+
+_slo_policy: Optional[SloPolicy] = None
+_slo_policy_lock = threading.Lock()
+
+_SLO_KEYS = (
+    "LLM_SLO_TTFT_SECONDS", "LLM_SLO_QUEUE_WAIT_SECONDS", "LLM_SLO_WINDOW",
+    "LLM_SLO_MIN_SAMPLES", "LLM_SLO_QUANTILE", "LLM_SLO_RECOVERY_SECONDS",
+)
+
+
+def _slo_settings() -> Dict[str, Any]:
+    """Read the SLO targets from the configuration."""
+    return {
+        "ttft_target": float(config.get("LLM_SLO_TTFT_SECONDS", 5.0)),
+        "queue_wait_target": float(config.get("LLM_SLO_QUEUE_WAIT_SECONDS", 10.0)),
+        "window": int(config.get("LLM_SLO_WINDOW", 20)),
+        "min_samples": int(config.get("LLM_SLO_MIN_SAMPLES", 5)),
+        "quantile": float(config.get("LLM_SLO_QUANTILE", 0.9)),
+        "recovery_seconds": float(config.get("LLM_SLO_RECOVERY_SECONDS", 60.0)),
+    }
+
+
+def get_slo_policy() -> SloPolicy:
+    """
+    Get the process-wide latency SLO policy, retuned when its targets are reconfigured.
+    
+    Returns:
+        The shared SLO policy
+    """
+    global _slo_policy
+    with _slo_policy_lock:
+        if _slo_policy is None:
+            policy = SloPolicy(**_slo_settings())
+            config.subscribe(lambda changed: policy.configure(**_slo_settings()), _SLO_KEYS)
+            _slo_policy = policy
+        return _slo_policy
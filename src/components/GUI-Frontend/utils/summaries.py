@@ -0,0 +1,485 @@
+"""
+Offline ticket summarization for the TicketAssist application.
+
+This module runs a batch job that summarizes tickets through the LLM
+during off-peak hours and keeps the results in a persistent cache keyed by
+the ticket key and a hash of its content, so the ticket page can show
+summaries without generating them on demand. The job skips tickets that are
+already summarized, which makes it resumable after a stop or restart.
+
+The job needs the same dataset in every process, so it only runs with a
+TICKET_DATASET_SEED or the shared dataset. A lease row in the summary
+database lets one process at a time run it, and its LLM calls take
+low-priority scheduler slots so chat goes first.
+
+Run it once from the command line with:
+    
+    python -m utils.summaries [--now] [--limit N]
+"""
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.config import config
+from utils.scheduler import get_scheduler
+from utils.ticket import TicketStore, get_ticket_store
+
+logger = logging.getLogger(__name__)
+
+
+def in_hours(window: str, now: datetime) -> bool:
+    """
+    Check whether a time falls in an hour window.
+    
+    Args:
+        window: Hours as "start-end" in 24h time, e.g. "22-6" for overnight;
+            empty means always
+        now: Time to check
+        
+    Returns:
+        True if the hour of now is inside the window
+    """
+    if not window.strip():
+        return True
+    start, end = (int(part) % 24 for part in window.split("-", 1))
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+def content_hash(ticket: Dict[str, Any]) -> str:
+    """
+    Identify the content of a ticket independently of its timestamps.
+    
+    Generated datasets date their tickets relative to today, so a summary
+    keyed on last_updated would go stale every day although nothing it
+    summarizes changed.
+    
+    Args:
+        ticket: Ticket dictionary
+        
+    Returns:
+        Hex digest of the ticket without its created and last_updated fields
+    """
+    content = {field: value for field, value in ticket.items() if field not in ("created", "last_updated")}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def dataset_is_stable() -> bool:
+    """
+    Check whether every process sees the same tickets.
+    
+    Returns:
+        True if a TICKET_DATASET_SEED is set or the shared dataset is used
+    """
+    return bool(str(config.get("TICKET_DATASET_SEED") or "").strip()) or bool(config.get("TICKET_SHARED_DATASET", False))
+
+
+class TicketSummaryStore:
+    """
+    Persistent cache of ticket summaries.
+    
+    A summary belongs to one version of a ticket, identified by its key and
+    content hash; an edited ticket simply has no summary until the next job
+    run. The database also holds the lease that lets one process at a time
+    run the summary job.
+    """
+    
+    def __init__(self, data_path: str = "data/ticket_summaries.sqlite3") -> None:
+        """
+        Initialize the store and create its table if needed.
+        
+        Args:
+            data_path: Path to the SQLite database
+        """
+        self.data_path = data_path
+        Path(data_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # Summaries keyed on last_updated were regenerated daily anyway
+            conn.execute("DROP TABLE IF EXISTS ticket_summaries")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ticket_summaries_v2 (
+                    key TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (key, content_hash)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection to the summary database.
+        
+        Returns:
+            SQLite connection configured for WAL journaling
+        """
+        conn = sqlite3.connect(self.data_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def summarized(self) -> Set[Tuple[str, str]]:
+        """
+        Get the ticket versions that already have a summary.
+        
+        Returns:
+            Set of (key, content_hash) pairs
+        """
+        with closing(self._connect()) as conn:
+            return set(conn.execute("SELECT key, content_hash FROM ticket_summaries_v2").fetchall())
+    
+    def get_many(self, tickets: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Get the summaries of the current versions of some tickets.
+        
+        Args:
+            tickets: Ticket dictionaries
+            
+        Returns:
+            Mapping of ticket key to summary for tickets that have one
+        """
+        if not tickets:
+            return {}
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    f"SELECT key, content_hash, summary FROM ticket_summaries_v2 WHERE key IN "
+                    f"({', '.join('?' * len(tickets))})",
+                    [ticket["key"] for ticket in tickets]
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Error reading ticket summaries: {e}")
+            return {}
+        versions = {ticket["key"]: content_hash(ticket) for ticket in tickets}
+        return {key: summary for key, digest, summary in rows if versions.get(key) == digest}
+    
+    def put(self, key: str, digest: str, model: str, summary: str) -> None:
+        """
+        Store the summary of a ticket version.
+        
+        Args:
+            key: Ticket key
+            digest: Content hash of the ticket
+            model: Model that wrote the summary
+            summary: Summary text
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ticket_summaries_v2 (key, content_hash, model, summary, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, digest, model, summary, time.time())
+            )
+    
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take or renew a lease unless another owner holds it.
+        
+        Args:
+            name: Lease name
+            owner: Unique id of the caller
+            ttl: Seconds the lease stays valid without renewal
+            
+        Returns:
+            True if the caller holds the lease
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM job_leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.rollback()
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO job_leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl)
+            )
+            conn.commit()
+            return True
+    
+    def release_lease(self, name: str, owner: str) -> None:
+        """
+        Give up a lease if the caller still holds it.
+        
+        Args:
+            name: Lease name
+            owner: Unique id of the caller
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM job_leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+class SummaryJob:
+    """
+    Batch job that summarizes every ticket without a cached summary.
+    
+    Tickets are summarized by a bounded pool of workers. New work is only
+    started inside the off-peak window; when the window closes, in-flight
+    summaries finish and the rest wait for the next run. Each summary is
+    committed as soon as it is written.
+    
+    A run holds a lease in the summary database and renews it while it
+    works, so other processes skip their runs instead of summarizing the
+    same tickets again. A crashed holder's lease expires after LEASE_TTL_SECONDS.
+    """
+    
+    LEASE_NAME = "ticket-summary-job"
+    LEASE_TTL_SECONDS = 120.0
+    
+    def __init__(self, tickets: TicketStore, summaries: TicketSummaryStore,
+                 summarizer: Callable[[Dict[str, Any]], str], model: str,
+                 concurrency: int = 2, off_peak_hours: str = "22-6") -> None:
+        """
+        Initialize the job.
+        
+        Args:
+            tickets: Ticket store to summarize
+            summaries: Cache the summaries are written to
+            summarizer: Callable returning the summary of a ticket
+            model: Name of the model behind the summarizer, stored with each summary
+            concurrency: Maximum summaries generated at once
+            off_peak_hours: Hour window in which new work may start, e.g. "22-6"
+        """
+        self.tickets = tickets
+        self.summaries = summaries
+        self.summarizer = summarizer
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.off_peak_hours = off_peak_hours
+        self.last_run: Dict[str, Any] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    def pending(self) -> List[Dict[str, Any]]:
+        """
+        Get the tickets whose current version has no summary yet.
+        
+        Returns:
+            Ticket dictionaries still to summarize
+        """
+        done = self.summaries.summarized()
+        return [
+            ticket for ticket in self.tickets.slice(len(self.tickets))
+            if (ticket["key"], content_hash(ticket)) not in done
+        ]
+    
+    def _summarize(self, ticket: Dict[str, Any]) -> None:
+        """Summarize one ticket and commit the result."""
+        summary = self.summarizer(ticket)
+        self.summaries.put(ticket["key"], content_hash(ticket), self.model, summary)
+    
+    def run(self, ignore_hours: bool = False, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Summarize pending tickets.
+        
+        Args:
+            ignore_hours: Start work even outside the off-peak window
+            limit: Maximum number of tickets to summarize in this run
+            
+        Returns:
+            Run statistics with counts, elapsed time and throughput
+        """
+        if not self._run_lock.acquire(blocking=False):
+            logger.info("Ticket summary job is already running")
+            return self.last_run
+        if not self.summaries.acquire_lease(self.LEASE_NAME, self.owner, self.LEASE_TTL_SECONDS):
+            self._run_lock.release()
+            logger.info("Ticket summary job is running in another process")
+            return self.last_run
+            
+        try:
+            start = time.perf_counter()
+            pending = self.pending()
+            if limit is not None:
+                pending = pending[:limit]
+            stats = {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "pending": len(pending),
+                "summarized": 0,
+                "failed": 0,
+                "stopped_early": False,
+            }
+            logger.info(f"Ticket summary job: {len(pending)} tickets to summarize with {self.concurrency} workers")
+            
+            in_flight: Dict[Future, Dict[str, Any]] = {}
+            queue = list(reversed(pending))
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ticket-summary") as pool:
+                while queue or in_flight:
+                    can_start = ignore_hours or in_hours(self.off_peak_hours, datetime.now())
+                    if self._stop.is_set() or not can_start:
+                        stats["stopped_early"] = bool(queue)
+                        queue.clear()
+                    while queue and len(in_flight) < self.concurrency:
+                        ticket = queue.pop()
+                        in_flight[pool.submit(self._summarize, ticket)] = ticket
+                    if not in_flight:
+                        break
+                        
+                    finished, _ = wait(in_flight, timeout=self.LEASE_TTL_SECONDS / 3,
+                                       return_when=FIRST_COMPLETED)
+                    if not self.summaries.acquire_lease(self.LEASE_NAME, self.owner, self.LEASE_TTL_SECONDS):
+                        logger.warning("Ticket summary job lost its lease; not starting more summaries")
+                        stats["stopped_early"] = bool(queue)
+                        queue.clear()
+                    for future in finished:
+                        ticket = in_flight.pop(future)
+                        try:
+                            future.result()
+                            stats["summarized"] += 1
+                        except Exception as e:
+                            stats["failed"] += 1
+                            logger.error(f"Error summarizing ticket {ticket['key']}: {e}")
+                    done = stats["summarized"] + stats["failed"]
+                    if finished and done % 10 == 0:
+                        logger.info(f"Ticket summary job: {done}/{len(pending)} done")
+                        
+            elapsed = time.perf_counter() - start
+            stats["elapsed_seconds"] = round(elapsed, 1)
+            stats["tickets_per_minute"] = round(stats["summarized"] / elapsed * 60, 1) if elapsed else 0.0
+            self.last_run = stats
+            logger.info(
+                f"Ticket summary job finished: {stats['summarized']} summarized, {stats['failed']} failed "
+                f"in {stats['elapsed_seconds']}s ({stats['tickets_per_minute']} tickets/min)"
+                + (", stopped at the end of the off-peak window" if stats["stopped_early"] else "")
+            )
+            return stats
+        finally:
+            self.summaries.release_lease(self.LEASE_NAME, self.owner)
+            self._run_lock.release()
+    
+    def stop(self) -> None:
+        """Stop starting new summaries; in-flight ones still finish."""
+        self._stop.set()
+
+
+_summary_store: Optional[TicketSummaryStore] = None
+_summary_job: Optional[SummaryJob] = None
+_summary_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+_worker_checked = False
+
+
+def get_summary_store() -> TicketSummaryStore:
+    """
+    Get the process-wide ticket summary cache.
+    
+    Returns:
+        The shared summary store
+    """
+    global _summary_store
+    with _summary_lock:
+        if _summary_store is None:
+            _summary_store = TicketSummaryStore(config.get("TICKET_SUMMARY_PATH", "data/ticket_summaries.sqlite3"))
+        return _summary_store
+
+
+def get_summary_job() -> SummaryJob:
+    """
+    Get the process-wide ticket summary job.
+    
+    Returns:
+        The shared summary job over the shared ticket store
+    """
+    global _summary_job
+    store = get_summary_store()
+    with _summary_lock:
+        if _summary_job is None:
+            # Imported here so the ticket page does not pull in the LLM client stack
+            from utils.chat import LlmService
+            
+            llm = LlmService(model=config.get("SUMMARY_JOB_MODEL") or config.get("LLM_SUMMARY_MODEL") or None)
+            max_tokens = int(config.get("SUMMARY_JOB_MAX_TOKENS", 120))
+            
+            def summarize(ticket: Dict[str, Any]) -> str:
+                # Low priority: the job only uses backend slots chat does not need
+                with get_scheduler().slot("background:ticket-summary", low_priority=True):
+                    return llm.summarize_ticket(ticket, max_tokens)
+                    
+            job = SummaryJob(
+                get_ticket_store(),
+                store,
+                summarizer=summarize,
+                model=llm.model,
+                concurrency=int(config.get("SUMMARY_JOB_CONCURRENCY", 2)),
+                off_peak_hours=config.get("SUMMARY_JOB_OFF_PEAK_HOURS", "22-6")
+            )
+            
+            # Picked up by the next run
+            def reconfigure(changed: Dict[str, Any]) -> None:
+                job.concurrency = max(1, int(config.get("SUMMARY_JOB_CONCURRENCY", 2)))
+                job.off_peak_hours = config.get("SUMMARY_JOB_OFF_PEAK_HOURS", "22-6")
+                
+            config.subscribe(reconfigure, ("SUMMARY_JOB_CONCURRENCY", "SUMMARY_JOB_OFF_PEAK_HOURS"))
+            _summary_job = job
+        return _summary_job
+
+
+def start_summary_worker() -> None:
+    """
+    Start the background worker that runs the summary job in off-peak hours.
+    
+    Safe to call on every script run; only the first call starts the worker.
+    Every app process starts one, but the job's lease lets only one of them
+    summarize at a time.
+    """
+    global _worker, _worker_checked
+    if not config.get("SUMMARY_JOB_ENABLED", True):
+        return
+    with _summary_lock:
+        if _worker is not None or _worker_checked:
+            return
+        _worker_checked = True
+        if not dataset_is_stable():
+            logger.warning(
+                "Ticket summary job not started: set TICKET_DATASET_SEED or TICKET_SHARED_DATASET "
+                "so every process summarizes the same tickets"
+            )
+            return
+        def run() -> None:
+            while True:
+                # Any failure only skips this round; the worker keeps running
+                try:
+                    job = get_summary_job()
+                    if in_hours(job.off_peak_hours, datetime.now()):
+                        job.run()
+                except Exception as e:
+                    logger.error(f"Ticket summary job failed: {e}")
+                time.sleep(float(config.get("SUMMARY_JOB_INTERVAL_SECONDS", 900.0)))
+                
+        _worker = threading.Thread(target=run, name="ticket-summary-worker", daemon=True)
+        _worker.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize tickets that have no cached summary.")
+    parser.add_argument("--now", action="store_true", help="run even outside the off-peak hours")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of tickets to summarize")
+    args = parser.parse_args()
+    if not dataset_is_stable():
+        parser.error("set TICKET_DATASET_SEED or TICKET_SHARED_DATASET so the app shows the tickets summarized here")
+    print(get_summary_job().run(ignore_hours=args.now, limit=args.limit))
@@ -3,64 +3,28 @@ Ticket management utilities for the TicketAssist application.
 
 This module provides ticket data generation, formatting, and display functionality.
 """
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 import random
+import threading
 import uuid
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import json
 
-import pandas as pd
-from pydantic import BaseModel, Field
+from utils.config import config
+from utils.shared_dataset import SharedTicketDataset
 
+# The pydantic models live in utils.ticket_models and are only imported when used
+_MODEL_NAMES = ("Project", "TicketComment", "TicketAnswer", "Ticket")
 
-class Project(BaseModel):
-    """Model representing a project in the ticket system."""
-    project_name: str
-    project_id: str
 
-
-class TicketComment(BaseModel):
-    """Model representing a comment on a ticket."""
-    detected_language: str = "en"
-    content: str
-    url: str
-
-
-class TicketAnswer(BaseModel):
-    """Model representing an answer or solution for a ticket."""
-    summary_of_analysis: str
-    planned_release: str
-    answer_text: str
-    included_build: str
-    answer_code: str
-    answer_category: str
-
-
-class Ticket(BaseModel):
-    """Model representing a ticket in the system."""
-    url: str
-    key: str
-    created: str
-    last_updated: str
-    environment: Optional[str] = None
-    status_name: str
-    labels: List[str] = Field(default_factory=list)
-    project_id: str
-    project_key: str
-    project_name: str
-    priority_id: str
-    priority_name: str
-    linked_issues: List[str] = Field(default_factory=list)
-    components: List[str]
-    attachments: List[str] = Field(default_factory=list)
-    title: str
-    description: str
-    detected_language: str = "en"
-    comments: List[TicketComment]
-    Answer: TicketAnswer
-    project_options: List[str]
+def __getattr__(name: str) -> Any:
+    """Import the ticket models on first access."""
+    if name in _MODEL_NAMES:
+        from utils import ticket_models
+        return getattr(ticket_models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class TicketGenerator:
@@ -153,8 +117,8 @@ class TicketGenerator:
                 "This led to congestion in the listener thread pool, especially during gNB handovers. A fix was applied to include active timeout cleanup and connection recycling. "
                 "Memory profiling confirmed improved behavior post-patch, and stress test under 10k sessions was passed successfully."
             ),
-            "included_build": lambda: f"build_{random.randint(7000, 9999)}",
-            "answer_code": lambda: f"FIX-{random.randint(10000, 99999)}",
+            "included_build": lambda rng: f"build_{rng.randint(7000, 9999)}",
+            "answer_code": lambda rng: f"FIX-{rng.randint(10000, 99999)}",
             "answer_category": "Bug Fix"
         },
         {
@@ -165,8 +129,8 @@ class TicketGenerator:
                 "eventually triggering container OOM kills. The fix includes a guard to detect retry exhaustion and gracefully drop the session. "
                 "Tested under varied fail conditions and passed with stability for over 48h soak runs."
             ),
-            "included_build": lambda: f"build_{random.randint(7000, 9999)}",
-            "answer_code": lambda: f"FIX-{random.randint(10000, 99999)}",
+            "included_build": lambda rng: f"build_{rng.randint(7000, 9999)}",
+            "answer_code": lambda rng: f"FIX-{rng.randint(10000, 99999)}",
             "answer_category": "Root Cause Identified"
         },
         {
@@ -177,8 +141,8 @@ class TicketGenerator:
                 "Latency crossed 200ms on average, impacting all NF registration attempts. We added a sorted index, rewrote the lookup logic, and introduced back-pressure controls "
                 "at the service mesh to prevent flood during failover. Confirmed 4x improvement in registration speed."
             ),
-            "included_build": lambda: f"build_{random.randint(7000, 9999)}",
-            "answer_code": lambda: f"FIX-{random.randint(10000, 99999)}",
+            "included_build": lambda rng: f"build_{rng.randint(7000, 9999)}",
+            "answer_code": lambda rng: f"FIX-{rng.randint(10000, 99999)}",
             "answer_category": "Performance Enhancement"
         },
         {
@@ -190,8 +154,8 @@ class TicketGenerator:
                 "mechanism in both the SMF and UPF to ensure strict slice isolation is maintained even during peak loads. "
                 "Validation testing under multiple slice configurations confirmed the fix effectiveness."
             ),
-            "included_build": lambda: f"build_{random.randint(7000, 9999)}",
-            "answer_code": lambda: f"FIX-{random.randint(10000, 99999)}",
+            "included_build": lambda rng: f"build_{rng.randint(7000, 9999)}",
+            "answer_code": lambda rng: f"FIX-{rng.randint(10000, 99999)}",
             "answer_category": "Design Limitation"
         },
         {
@@ -204,62 +168,70 @@ class TicketGenerator:
                 "all nodes converge to the same policy state. Additionally, a policy reconciliation job was added to "
                 "detect and resolve any lingering inconsistencies during operation."
             ),
-            "included_build": lambda: f"build_{random.randint(7000, 9999)}",
-            "answer_code": lambda: f"FIX-{random.randint(10000, 99999)}",
+            "included_build": lambda rng: f"build_{rng.randint(7000, 9999)}",
+            "answer_code": lambda rng: f"FIX-{rng.randint(10000, 99999)}",
             "answer_category": "Architecture Update"
         }
     ]
     
     @classmethod
-    def generate_fake_5g_tickets(cls, count: int = 5) -> Dict[str, Any]:
+    def generate_fake_5g_tickets(cls, count: int = 5, seed: Optional[int] = None) -> Dict[str, Any]:
         """
         Generate a specified number of fake 5G tickets.
         
+        With a seed, every process generates the same tickets. Their dates
+        are relative to the current day, so caches should key on content
+        rather than on last_updated.
+        
         Args:
             count: Number of tickets to generate
+            seed: Seed for repeatable output, or None for fresh random tickets
             
         Returns:
             Dictionary of generated tickets with numeric IDs as keys
         """
+        rng = random.Random(seed)
+        now = datetime.now().replace(microsecond=0)
+        if seed is not None:
+            now = now.replace(hour=0, minute=0, second=0)
         project_options = list(cls.PROJECTS.keys())
         tickets = {}
         
         for _ in range(count):
             # Select random project
-            project_key = random.choice(project_options)
+            project_key = rng.choice(project_options)
             project_info = cls.PROJECTS[project_key]
             project_name = project_info["project_name"]
             project_id = project_info["project_id"]
             
             # Generate ticket identifiers
-            numeric_ticket_id = str(random.randint(4000000, 9999999))
-            issue_number = random.randint(80000, 99999)
+            numeric_ticket_id = str(rng.randint(4000000, 9999999))
+            issue_number = rng.randint(80000, 99999)
             key_str = f"{project_key}-{issue_number}"
             
             # Generate dates
-            created_dt = datetime.now().replace(microsecond=0)
-            created_dt = created_dt - pd.Timedelta(days=random.randint(5, 30))
-            updated_dt = created_dt + pd.Timedelta(days=random.randint(1, 5))
+            created_dt = now - timedelta(days=rng.randint(5, 30))
+            updated_dt = created_dt + timedelta(days=rng.randint(1, 5))
             
             # Select random content
-            description = random.choice(cls.SHORT_DESCRIPTIONS + cls.LONG_DESCRIPTIONS)
-            title = random.choice(cls.SHORT_TITLES)
-            status = random.choice(cls.STATUS_OPTIONS)
-            priority = random.choice(cls.PRIORITY_NAMES)
+            description = rng.choice(cls.SHORT_DESCRIPTIONS + cls.LONG_DESCRIPTIONS)
+            title = rng.choice(cls.SHORT_TITLES)
+            status = rng.choice(cls.STATUS_OPTIONS)
+            priority = rng.choice(cls.PRIORITY_NAMES)
             
             # Process answer template
-            answer_template = random.choice(cls.LONG_ANSWERS)
+            answer_template = rng.choice(cls.LONG_ANSWERS)
             answer = {
                 "summary_of_analysis": answer_template["summary_of_analysis"],
                 "planned_release": answer_template["planned_release"],
                 "answer_text": answer_template["answer_text"],
-                "included_build": answer_template["included_build"]() if callable(answer_template["included_build"]) else answer_template["included_build"],
-                "answer_code": answer_template["answer_code"]() if callable(answer_template["answer_code"]) else answer_template["answer_code"],
+                "included_build": answer_template["included_build"](rng) if callable(answer_template["included_build"]) else answer_template["included_build"],
+                "answer_code": answer_template["answer_code"](rng) if callable(answer_template["answer_code"]) else answer_template["answer_code"],
                 "answer_category": answer_template["answer_category"]
             }
             
             # Generate random comments
-            comments_list = random.sample(cls.COMMENTS_BANK, k=random.randint(1, 3))
+            comments_list = rng.sample(cls.COMMENTS_BANK, k=rng.randint(1, 3))
             base_url = "localhost:8080/browse"
             
             # Create ticket object
@@ -277,7 +249,7 @@ class TicketGenerator:
                 "priority_id": str(10500 + cls.PRIORITY_NAMES.index(priority)),
                 "priority_name": priority,
                 "linked_issues": [],
-                "components": random.sample(cls.COMPONENTS_LIST, k=random.randint(1, 2)),
+                "components": rng.sample(cls.COMPONENTS_LIST, k=rng.randint(1, 2)),
                 "attachments": [],
                 "title": title,
                 "description": description,
@@ -286,7 +258,7 @@ class TicketGenerator:
                     {
                         "detected_language": "en",
                         "content": comment,
-                        "url": f"{base_url}/{key_str}?focusedId={random.randint(19000000, 19999999)}#comment-{random.randint(19000000, 19999999)}"
+                        "url": f"{base_url}/{key_str}?focusedId={rng.randint(19000000, 19999999)}#comment-{rng.randint(19000000, 19999999)}"
                     }
                     for comment in comments_list
                 ],
@@ -299,6 +271,122 @@ class TicketGenerator:
         return tickets
 
 
+class TicketStore:
+    """
+    Versioned ticket dataset shared by every session of the ticket page.
+    
+    The dataset is generated once at its full size; callers slice a prefix
+    or a page out of it instead of regenerating data when the number of
+    displayed tickets changes. Tickets are shared read-only and must not be
+    mutated by callers.
+    
+    With a shared dataset, the tickets live in a memory-mapped file used by
+    every Streamlit process instead of in this process's memory. Whichever
+    process finds nothing published generates and publishes the data, and a
+    reload anywhere publishes a new version that all processes pick up.
+    """
+    
+    def __init__(self, size: int = 50, seed: Optional[int] = None,
+                 shared: Optional[SharedTicketDataset] = None) -> None:
+        """
+        Initialize the store and generate the first dataset version.
+        
+        Args:
+            size: Total number of tickets held by the store
+            seed: Seed for a repeatable dataset, or None for random tickets
+            shared: Shared dataset to publish to and read from, or None to
+                keep the tickets in this process
+        """
+        self.size = size
+        self.seed = seed
+        self.shared = shared
+        self._version = 0
+        self._tickets: Tuple[Dict[str, Any], ...] = ()
+        self._lock = threading.Lock()
+        if shared is not None:
+            shared.attach_or_publish(
+                lambda: list(TicketGenerator.generate_fake_5g_tickets(size, seed=seed).values())
+            )
+        else:
+            self.reload()
+    
+    @property
+    def version(self) -> int:
+        """Version number of the current dataset."""
+        return self.shared.version if self.shared is not None else self._version
+    
+    def reload(self) -> int:
+        """
+        Regenerate the dataset and publish it as a new version.
+        
+        Returns:
+            The version number of the newly published dataset
+        """
+        tickets = TicketGenerator.generate_fake_5g_tickets(self.size, seed=self.seed)
+        if self.shared is not None:
+            return self.shared.publish(list(tickets.values()))
+        with self._lock:
+            self._tickets = tuple(tickets.values())
+            self._version += 1
+            return self._version
+    
+    def __len__(self) -> int:
+        """Return the number of tickets in the current dataset."""
+        if self.shared is not None:
+            return len(self.shared)
+        return len(self._tickets)
+    
+    def slice(self, count: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get a page of tickets from the current dataset.
+        
+        Args:
+            count: Maximum number of tickets to return
+            offset: Index of the first ticket to return
+            
+        Returns:
+            List of ticket dictionaries shared with the store, or decoded
+            from the shared dataset
+        """
+        if self.shared is not None:
+            return self.shared.slice(count, offset)
+        tickets = self._tickets
+        return list(tickets[offset:offset + count])
+
+
+_ticket_store: Optional[TicketStore] = None
+_ticket_store_lock = threading.Lock()
+
+
+def get_ticket_store() -> TicketStore:
+    """
+    Get the ticket store shared by all sessions and pages.
+    
+    Returns:
+        The process-wide ticket store
+    """
+    global _ticket_store
+    with _ticket_store_lock:
+        if _ticket_store is None:
+            seed = str(config.get("TICKET_DATASET_SEED") or "").strip()
+            shared = None
+            if config.get("TICKET_SHARED_DATASET", False):
+                directory = config.get("TICKET_SHARED_DIR") or (
+                    "/dev/shm/ticketassist" if Path("/dev/shm").is_dir() else "data/shared_tickets"
+                )
+                shared = SharedTicketDataset(
+                    directory,
+                    refresh_interval=float(config.get("TICKET_SHARED_REFRESH_SECONDS", 1.0)),
+                    decode_cache_size=int(config.get("TICKET_SHARED_DECODE_CACHE_SIZE", 4096))
+                )
+            _ticket_store = TicketStore(
+                size=int(config.get("TICKET_DATASET_SIZE", 50)),
+                seed=int(seed) if seed else None,
+                shared=shared
+            )
+        return _ticket_store
+
+
 class TicketDisplay:
     """
     Utilities for displaying tickets and related UI elements.
@@ -415,5 +503,7 @@ class TicketExporter:
             }
             export_data.append(flat_ticket)
         
+        import pandas as pd
+        
         export_df = pd.DataFrame(export_data)
         return export_df.to_csv(index=False)
\ No newline at end of file
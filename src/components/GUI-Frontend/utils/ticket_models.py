@@ -0,0 +1,58 @@
+"""
+Ticket data models for the TicketAssist application.
+
+This module defines the pydantic schema of the ticket records produced by
+utils.ticket. It is kept separate so pages that only display tickets do
+not import pydantic.
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Project(BaseModel):
+    """Model representing a project in the ticket system."""
+    project_name: str
+    project_id: str
+
+
+class TicketComment(BaseModel):
+    """Model representing a comment on a ticket."""
+    detected_language: str = "en"
+    content: str
+    url: str
+
+
+class TicketAnswer(BaseModel):
+    """Model representing an answer or solution for a ticket."""
+    summary_of_analysis: str
+    planned_release: str
+    answer_text: str
+    included_build: str
+    answer_code: str
+    answer_category: str
+
+
+class Ticket(BaseModel):
+    """Model representing a ticket in the system."""
+    url: str
+    key: str
+    created: str
+    last_updated: str
+    environment: Optional[str] = None
+    status_name: str
+    labels: List[str] = Field(default_factory=list)
+    project_id: str
+    project_key: str
+    project_name: str
+    priority_id: str
+    priority_name: str
+    linked_issues: List[str] = Field(default_factory=list)
+    components: List[str]
+    attachments: List[str] = Field(default_factory=list)
+    title: str
+    description: str
+    detected_language: str = "en"
+    comments: List[TicketComment]
+    Answer: TicketAnswer
+    project_options: List[str]
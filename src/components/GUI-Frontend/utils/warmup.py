@@ -0,0 +1,195 @@
+"""
+Model warm-up for the TicketAssist application.
+
+This module loads the default chat model and the SLO fallback model when
+the app starts and reloads them if Ollama unloaded them after idling, so
+users do not pay the model load time on their first message. Each model is
+warmed on the one host the router would send its requests to, so routing
+keeps its model affinity and small hosts are not asked to hold every model.
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+import time
+
+from utils.config import config
+from utils.health import get_health_monitor
+from utils.llm_clients import get_ollama_client
+from utils.router import OllamaRouter, get_router
+from utils.scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWarmer:
+    """
+    Background warm-up of Ollama models.
+    
+    Assigns each model to a host through the router, issues a one-token
+    generation there with the configured keep_alive, then periodically
+    checks the host's loaded models and re-warms the ones that idled out.
+    A model whose host goes away is assigned to another one.
+    """
+    
+    def __init__(self, router: OllamaRouter, models: List[str], keep_alive: str = "30m",
+                 rewarm_interval: float = 300.0) -> None:
+        """
+        Initialize the warmer.
+        
+        Args:
+            router: Router that picks the host for each model
+            models: Model names to keep loaded
+            keep_alive: How long Ollama keeps a model loaded after a request
+            rewarm_interval: Seconds between checks for unloaded models
+        """
+        self.router = router
+        self.models = models
+        self.keep_alive = keep_alive
+        self.rewarm_interval = rewarm_interval
+        self.assignments: Dict[str, str] = {}
+        self.load_times: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def configure(self, models: List[str], keep_alive: str, rewarm_interval: float) -> None:
+        """
+        Change what is kept warm and check it right away.
+        
+        Models that are no longer listed are left to expire with their keep_alive.
+        
+        Args:
+            models: Model names to keep loaded
+            keep_alive: How long Ollama keeps a model loaded after a request
+            rewarm_interval: Seconds between checks for unloaded models
+        """
+        self.models = models
+        self.keep_alive = keep_alive
+        self.rewarm_interval = rewarm_interval
+        self._wake.set()
+    
+    def warm(self, model: str, host: str) -> bool:
+        """
+        Load a model on a host with a one-token generation.
+        
+        Args:
+            model: Model name to load
+            host: Host to load it on
+            
+        Returns:
+            True if the model answered
+        """
+        try:
+            # Loading a model can take a while; chat turns go first
+            with get_scheduler().slot("background:warmup", low_priority=True):
+                start = time.perf_counter()
+                response = get_ollama_client(host).generate(
+                    model=model,
+                    prompt="hi",
+                    options={"num_predict": 1},
+                    keep_alive=self.keep_alive
+                )
+        except Exception as e:
+            logger.warning(f"Could not warm up model {model} on {host}: {e}")
+            return False
+            
+        elapsed = time.perf_counter() - start
+        load_seconds = (response.get("load_duration") or 0) / 1e9
+        self.load_times[model] = load_seconds
+        logger.info(f"Warmed up model {model} on {host}: load {load_seconds:.2f}s, total {elapsed:.2f}s")
+        return True
+    
+    def _assign(self, model: str) -> Optional[str]:
+        """
+        Get the host a model is kept warm on.
+        
+        Keeps the previous host while it is routed to and available,
+        otherwise asks the router, which prefers a host that already has
+        the model loaded.
+        
+        Args:
+            model: Model name
+            
+        Returns:
+            The host, or None if no host is available
+        """
+        host = self.assignments.get(model)
+        if host in self.router.hosts and get_health_monitor(host).is_available():
+            return host
+        host = self.router.choose(model)
+        if host is None:
+            return None
+        self.router.release(host)
+        self.assignments[model] = host
+        return host
+    
+    def _run(self) -> None:
+        """Warm the models, then re-warm unloaded ones until stopped."""
+        # Let every host report its loaded models first, so affinity can pick
+        # a host that already has a model instead of loading a second copy
+        deadline = time.monotonic() + 10.0
+        while any(get_health_monitor(host).last_probe == 0 for host in self.router.hosts):
+            if time.monotonic() > deadline or self._stop.wait(0.1):
+                break
+                
+        while not self._stop.is_set():
+            for model in list(self.models):
+                if self._stop.is_set():
+                    return
+                host = self._assign(model)
+                if host and not get_health_monitor(host).has_model_loaded(model):
+                    self.warm(model, host)
+            self._wake.wait(self.rewarm_interval)
+            self._wake.clear()
+    
+    def start(self) -> None:
+        """Start warming in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-warmer", daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop re-warming models."""
+        self._stop.set()
+        self._wake.set()
+
+
+_warmer: Optional[ModelWarmer] = None
+_warmer_lock = threading.Lock()
+
+_WARMUP_KEYS = (
+    "LLM_MODEL", "LLM_MODEL_OPTIONS", "LLM_MODEL_MAPPING", "LLM_DEFAULT_MODEL", "LLM_FALLBACK_MODEL",
+    "LLM_KEEP_ALIVE", "LLM_REWARM_INTERVAL_SECONDS", "OLLAMA_API_HOSTS", "OLLAMA_API_HOST",
+)
+
+
+def _warmup_settings() -> Dict[str, Any]:
+    """Read the warm-up settings from the configuration."""
+    return {
+        "models": config.warm_models(),
+        "keep_alive": config.get("LLM_KEEP_ALIVE", "30m"),
+        "rewarm_interval": float(config.get("LLM_REWARM_INTERVAL_SECONDS", 300.0)),
+    }
+
+
+def start_model_warmer() -> Optional[ModelWarmer]:
+    """
+    Start the process-wide model warmer once.
+    
+    Safe to call on every script run; only the first call starts warming.
+    The warmer follows configuration changes to the models and hosts.
+    
+    Returns:
+        The shared warmer, or None if warm-up is disabled
+    """
+    global _warmer
+    if not config.get("LLM_WARMUP_ENABLED", True):
+        return None
+    with _warmer_lock:
+        if _warmer is None:
+            warmer = ModelWarmer(get_router(), **_warmup_settings())
+            # Host changes reach the router first, since it subscribed first
+            config.subscribe(lambda changed: warmer.configure(**_warmup_settings()), _WARMUP_KEYS)
+            warmer.start()
+            _warmer = warmer
+        return _warmer